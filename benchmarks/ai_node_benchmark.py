@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from src.synthetic_data_generator.ai_graph.ai.base_ai_config import AIModelType, OpenAIModelVersion
+from src.synthetic_data_generator.ai_graph.graph_compiler import GraphCompiler
+from src.synthetic_data_generator.ai_graph.key_value_store import KeyValueStore
+from src.synthetic_data_generator.ai_graph.nodes.executable_node import ExecutableNode
+from synthetic_data_generator.ai_graph.ai.base_ai_analysis import AssistantAnalyzer
+from synthetic_data_generator.ai_graph.ai.fake_open_ai import ConstantLatency, FakeAsyncOpenAI, LatencyDistribution, \
+    LogNormalLatency
+from synthetic_data_generator.ai_graph.ai.open_ai_client import OpenAiClient
+from synthetic_data_generator.ai_graph.ai.plain_response_ai import PlainResponseAI
+
+
+class TicketText(str):
+    pass
+
+
+class TicketTextNode(ExecutableNode):
+    def __init__(self, parents, assistant: PlainResponseAI):
+        self.assistant = assistant
+        super().__init__(parents)
+
+    async def _execute_node(self, shared_storage: KeyValueStore) -> KeyValueStore:
+        shared_storage.save(TicketText(await self.assistant.get_response_with_retry("Write a ticket")))
+        return shared_storage
+
+
+def create_assistant(latency: LatencyDistribution = ConstantLatency(), rate_limit_error_rate: float = 0,
+                     retry_attempts: int = 1) -> PlainResponseAI:
+    fake_open_ai = FakeAsyncOpenAI(latency=latency, rate_limit_error_rate=rate_limit_error_rate)
+    return PlainResponseAI(assistant_name="Ticket Writer", client=OpenAiClient(fake_open_ai),
+                           model=OpenAIModelVersion(AIModelType.GPT_4o_MINI.value), retry_wait_min=0,
+                           retry_wait_max=0, retry_attempts=retry_attempts)
+
+
+@pytest.mark.parametrize("sample_count", [100, 1000])
+def test_ai_node_batch_throughput(benchmark, sample_count):
+    compiled_graph = GraphCompiler().compile(TicketTextNode([], create_assistant()))
+    storages = benchmark.pedantic(lambda: asyncio.run(compiled_graph.execute_batch(sample_count)), rounds=5)
+    assert len(storages) == sample_count
+    AssistantAnalyzer().reset()
+
+
+@pytest.mark.parametrize("sample_count", [1000, 5000])
+def test_ai_node_concurrent_calls_with_latency_and_rate_limits(benchmark, sample_count):
+    compiled_graph = GraphCompiler().compile(
+        TicketTextNode([], create_assistant(LogNormalLatency(median_seconds=0.05), rate_limit_error_rate=0.05,
+                                            retry_attempts=10)))
+    storages = benchmark.pedantic(lambda: asyncio.run(compiled_graph.execute_batch(sample_count)), rounds=3)
+    assert len(storages) == sample_count
+    AssistantAnalyzer().reset()
@@ -0,0 +1,40 @@
+from enum import Enum
+
+import numpy as np
+import pytest
+
+from src.synthetic_data_generator.random_generators.random_collection import RandomCollectionFactory
+from src.synthetic_data_generator.random_nodes.random_collection_node import RandomCollectionNode
+
+
+class Category(Enum):
+    BILLING = "billing"
+    TECHNICAL = "technical"
+    ACCOUNT = "account"
+
+
+class Priority(Enum):
+    LOW = "low"
+    MEDIUM = "medium"
+    HIGH = "high"
+
+
+class Language(Enum):
+    ENGLISH = "en"
+    GERMAN = "de"
+    FRENCH = "fr"
+    SPANISH = "es"
+    ITALIAN = "it"
+
+
+def build_random_graph():
+    # Module level, so that worker processes can unpickle it
+    collection_factory = RandomCollectionFactory(seed_sequence=np.random.SeedSequence(0))
+    node = RandomCollectionNode(Category, [], collection_factory.build_from_enum(Category))
+    node = RandomCollectionNode(Priority, [node], collection_factory.build_from_enum(Priority))
+    return RandomCollectionNode(Language, [node], collection_factory.build_from_enum(Language))
+
+
+@pytest.fixture
+def create_random_graph():
+    return build_random_graph
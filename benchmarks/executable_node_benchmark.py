@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+from benchmarks.graph_shapes import GRAPH_SHAPES
+from src.synthetic_data_generator.ai_graph.graph_compiler import GraphCompiler
+
+GRAPH_SIZES = [1, 10, 50]
+
+
+@pytest.mark.parametrize("graph_size", GRAPH_SIZES)
+@pytest.mark.parametrize("graph_shape", GRAPH_SHAPES)
+def test_graph_latency(benchmark, graph_shape, graph_size):
+    benchmark.pedantic(lambda node: asyncio.run(node.execute()),
+                       setup=lambda: ((GRAPH_SHAPES[graph_shape](graph_size),), { }),
+                       rounds=20)
+
+
+@pytest.mark.parametrize("graph_size", GRAPH_SIZES)
+@pytest.mark.parametrize("graph_shape", GRAPH_SHAPES)
+def test_compiled_graph_latency(benchmark, graph_shape, graph_size):
+    compiled_graph = GraphCompiler().compile(GRAPH_SHAPES[graph_shape](graph_size))
+    benchmark.pedantic(lambda: asyncio.run(compiled_graph.execute()), rounds=20)
+
+
+@pytest.mark.parametrize("graph_shape", GRAPH_SHAPES)
+def test_compiled_graph_batch_throughput(benchmark, graph_shape):
+    compiled_graph = GraphCompiler().compile(GRAPH_SHAPES[graph_shape](10))
+    storages = benchmark.pedantic(lambda: asyncio.run(compiled_graph.execute_batch(1000)), rounds=5)
+    assert len(storages) == 1000
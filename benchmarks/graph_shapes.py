@@ -0,0 +1,33 @@
+from src.synthetic_data_generator.ai_graph.key_value_store import KeyValueStore
+from src.synthetic_data_generator.ai_graph.nodes.executable_node import ExecutableNode
+
+
+class PassThroughNode(ExecutableNode):
+    async def _execute_node(self, shared_storage: KeyValueStore) -> KeyValueStore:
+        return shared_storage
+
+
+def build_chain_graph(size: int) -> ExecutableNode:
+    node = PassThroughNode([])
+    for _ in range(size - 1):
+        node = PassThroughNode([node])
+    return node
+
+
+def build_fan_in_graph(size: int) -> ExecutableNode:
+    return PassThroughNode([PassThroughNode([]) for _ in range(size - 1)])
+
+
+def build_diamond_graph(size: int) -> ExecutableNode:
+    # Stacked diamonds sharing their top and bottom nodes, size is the number of diamonds
+    node = PassThroughNode([])
+    for _ in range(size):
+        node = PassThroughNode([PassThroughNode([node]), PassThroughNode([node])])
+    return node
+
+
+GRAPH_SHAPES = {
+    "chain": build_chain_graph,
+    "fan_in": build_fan_in_graph,
+    "diamond": build_diamond_graph,
+}
@@ -0,0 +1,103 @@
+import asyncio
+import tracemalloc
+
+import pydantic
+import pytest
+
+from src.synthetic_data_generator.ai_graph.key_value_store import BaseKeyValueStore, KeyValueStore, \
+    TypedKeyValueStore
+from src.synthetic_data_generator.ai_graph.nodes.executable_node import ExecutableNode
+
+
+class Payload(pydantic.BaseModel):
+    texts: list[str]
+
+
+class PayloadNode(ExecutableNode):
+    def __init__(self, parents, key: str, payload_size: int):
+        self.key = key
+        self.payload_size = payload_size
+        super().__init__(parents)
+
+    async def _execute_node(self, shared_storage: KeyValueStore) -> KeyValueStore:
+        shared_storage.save_by_key(self.key, Payload(texts=["ticket text"] * self.payload_size))
+        return shared_storage
+
+
+def build_ladder_graph(node_count: int, payload_size: int) -> ExecutableNode:
+    nodes = [PayloadNode([], "node_0", payload_size)]
+    for index in range(1, node_count):
+        nodes.append(PayloadNode(nodes[-2:], f"node_{index}", payload_size))
+    return nodes[-1]
+
+
+@pytest.mark.parametrize("copy_on_write", [False, True], ids=["deepcopy", "copy_on_write"])
+def test_fifty_node_graph_storage(benchmark, copy_on_write):
+    def execute(node):
+        return asyncio.run(node.execute(KeyValueStore(copy_on_write=copy_on_write)))
+
+    storage = benchmark.pedantic(execute, setup=lambda: ((build_ladder_graph(50, 100),), { }), rounds=5)
+    assert len(storage.storage) == 50
+
+
+def build_payload_storage(key_count: int, payload_size: int, prefix: str,
+                          copy_on_write: bool = False) -> KeyValueStore:
+    storage = KeyValueStore(copy_on_write=copy_on_write)
+    for index in range(key_count):
+        storage.save_by_key(f"{prefix}_{index}", Payload(texts=["ticket text"] * payload_size))
+    return storage
+
+
+@pytest.mark.parametrize("payload_size", [1, 100, 10_000])
+def test_merge(benchmark, payload_size):
+    def merge(storage, other_storage):
+        storage.merge(other_storage)
+
+    benchmark.pedantic(merge, setup=lambda: ((build_payload_storage(10, payload_size, "left"),
+                                              build_payload_storage(10, payload_size, "right")), { }),
+                       rounds=20)
+
+
+@pytest.mark.parametrize("payload_size", [1, 100, 10_000])
+@pytest.mark.parametrize("copy_on_write", [False, True], ids=["deepcopy", "copy_on_write"])
+def test_fork(benchmark, copy_on_write, payload_size):
+    storage = build_payload_storage(10, payload_size, "node", copy_on_write=copy_on_write)
+    benchmark(storage.fork)
+
+
+STORE_TYPES = [KeyValueStore, TypedKeyValueStore]
+VALUE_TYPES = [type(f"Value{index}", (str,), { }) for index in range(20)]
+
+
+def fill_store(store_type: type[BaseKeyValueStore]) -> BaseKeyValueStore:
+    store = store_type()
+    for value_type in VALUE_TYPES:
+        store.save(value_type("value"))
+    return store
+
+
+@pytest.mark.parametrize("store_type", STORE_TYPES, ids=lambda store_type: store_type.__name__)
+def test_save(benchmark, store_type):
+    benchmark(fill_store, store_type)
+
+
+@pytest.mark.parametrize("store_type", STORE_TYPES, ids=lambda store_type: store_type.__name__)
+def test_get_and_contains(benchmark, store_type):
+    store = fill_store(store_type)
+    benchmark(lambda: [store.get(value_type) for value_type in VALUE_TYPES if value_type in store])
+
+
+@pytest.mark.parametrize("store_type", STORE_TYPES, ids=lambda store_type: store_type.__name__)
+def test_memory_per_sample(benchmark, store_type):
+    # One store per sample and node, measured for 10k stores holding the same three values
+    values = [VALUE_TYPES[index]("value") for index in range(3)]
+
+    def allocate_stores():
+        tracemalloc.start()
+        stores = [store_type(*values) for _ in range(10_000)]
+        allocated_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return stores, allocated_bytes
+
+    _, allocated_bytes = benchmark.pedantic(allocate_stores, rounds=3)
+    benchmark.extra_info["bytes_per_store"] = allocated_bytes / 10_000
@@ -0,0 +1,33 @@
+import pytest
+
+from src.synthetic_data_generator.random_generators.random_collection import AliasRandomCollection, RandomCollection, \
+    RandomCollectionFactory
+
+COLLECTION_TYPES = [RandomCollection, AliasRandomCollection]
+VALUE_COUNTS = [10, 1_000, 100_000]
+
+
+def build_collection(collection_type: type[RandomCollection], value_count: int) -> RandomCollection:
+    return collection_type(list(range(value_count)), [1 + value % 7 for value in range(value_count)])
+
+
+@pytest.mark.parametrize("value_count", VALUE_COUNTS)
+@pytest.mark.parametrize("collection_type", COLLECTION_TYPES, ids=lambda collection_type: collection_type.__name__)
+def test_get_random_value(benchmark, collection_type, value_count):
+    random_collection = build_collection(collection_type, value_count)
+    benchmark(random_collection.get_random_value)
+
+
+@pytest.mark.parametrize("value_count", VALUE_COUNTS)
+@pytest.mark.parametrize("collection_type", COLLECTION_TYPES, ids=lambda collection_type: collection_type.__name__)
+def test_sample_one_million_values(benchmark, collection_type, value_count):
+    random_collection = build_collection(collection_type, value_count)
+    random_values = benchmark(random_collection.sample, 1_000_000)
+    assert len(random_values) == 1_000_000
+
+
+def test_sample_one_million_values_excluding(benchmark):
+    values = list(range(1000))
+    random_collection = RandomCollectionFactory().build_from_list_of_values(values)
+    random_values = benchmark(random_collection.sample, 1_000_000, excluding=values[:990])
+    assert min(random_values) >= 990
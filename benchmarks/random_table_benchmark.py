@@ -0,0 +1,27 @@
+from enum import Enum
+
+import numpy as np
+import pytest
+
+from src.synthetic_data_generator.random_generators.random_collection_table import RandomTableBuilder
+
+TABLE_SIZES = [2, 20, 200]
+
+
+def build_random_table(size: int):
+    key_enum = Enum("KeyEnum", [f"K{index}" for index in range(size)])
+    value_enum = Enum("ValueEnum", [f"V{index}" for index in range(size)])
+    value_weight_dict = {key: {value: 1 + (key.value * value.value) % 5 for value in value_enum} for key in key_enum}
+    return RandomTableBuilder().build_from_dict(key_enum, value_enum, value_weight_dict), list(key_enum)
+
+
+@pytest.mark.parametrize("table_size", TABLE_SIZES)
+def test_get_random_value(benchmark, table_size):
+    random_table, keys = build_random_table(table_size)
+    rng = np.random.default_rng(0)
+    benchmark(lambda: [random_table.get_random_value(key, rng=rng) for key in keys])
+
+
+@pytest.mark.parametrize("table_size", TABLE_SIZES)
+def test_build_from_dict(benchmark, table_size):
+    benchmark(build_random_table, table_size)
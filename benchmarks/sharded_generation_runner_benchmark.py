@@ -0,0 +1,10 @@
+import numpy as np
+import pytest
+
+from src.synthetic_data_generator.ai_graph.sharded_generation_runner import ShardedGenerationRunner
+
+
+@pytest.mark.parametrize("worker_count", [1, 2, 4])
+def test_random_graph_throughput(benchmark, create_random_graph, worker_count):
+    runner = ShardedGenerationRunner(create_random_graph, worker_count=worker_count, chunk_size=500)
+    benchmark.pedantic(lambda: sum(1 for _ in runner.run(5_000, np.random.SeedSequence(0))), rounds=3)
@@ -1,8 +1,12 @@
+import json
+from typing import Optional
+
 import pydantic
 from openai.types.chat import ParsedChatCompletion
 
 from src.synthetic_data_generator.ai_graph.ai.base_ai_config import OpenAIModelVersion
 from src.synthetic_data_generator.ai_graph.ai.base_ai_model import BaseAIModel
+from synthetic_data_generator.ai_graph.ai.budget_controller import BudgetController
 from synthetic_data_generator.ai_graph.ai.model_describer import ModelDescriber
 from synthetic_data_generator.ai_graph.ai.open_ai_client import OpenAiClient
 
@@ -12,22 +16,33 @@ class AIModelGenerator[OM: BaseAIModel](BaseAIModel):
                  temperature: float,
                  max_tokens: int, instructions: str,
                  input_describer: ModelDescriber,
-                 retry_wait_min: int = 4, retry_wait_max: int = 128, retry_attempts: int = 20, ):
+                 retry_wait_min: int = 4, retry_wait_max: int = 128, retry_attempts: int = 20,
+                 budget_controller: Optional[BudgetController] = None, choices_per_request: int = 1):
         super().__init__(assistant_name=assistant_name, client=client, model=open_ai_model_version,
                          temperature=temperature, max_tokens=max_tokens, instructions=instructions,
                          retry_wait_min=retry_wait_min, retry_wait_max=retry_wait_max, retry_attempts=retry_attempts,
-                         input_describer=input_describer)
+                         input_describer=input_describer, budget_controller=budget_controller,
+                         choices_per_request=choices_per_request)
 
     async def _get_chat_completion(self, input_instance, output_type: type[pydantic.BaseModel], *args,
                                    **kwargs) -> ParsedChatCompletion:
         prompt = self._input_describer.generate_description(input_instance)
-        return await self._client.get_parsed_chat_completion(prompt=prompt,
-                                                             model_version=self._model.get_model_version(),
-                                                             temperature=self._temperature,
-                                                             max_tokens=self._max_tokens,
-                                                             instruction=self._instructions,
-                                                             response_format=output_type)
+        async with self._reserve_budget(prompt):
+            return await self._trace_chat_completion(
+                self._client.get_parsed_chat_completion(prompt=prompt,
+                                                        model_version=self._model.get_model_version(),
+                                                        temperature=self._temperature,
+                                                        max_tokens=self._max_tokens,
+                                                        instruction=self._instructions,
+                                                        response_format=output_type,
+                                                        n=self._choices_per_request))
 
     async def get_parsed_completion(self, input_instance: pydantic.BaseModel, output_type: type[pydantic.BaseModel],
                                     *args, **kwargs) -> OM:
+        if self._choices_per_request > 1:
+            fingerprint = json.dumps([self._input_describer.generate_description(input_instance), output_type.__name__])
+            return await self._take_choice(fingerprint,
+                                           lambda: self._get_chat_completion(input_instance, output_type, *args,
+                                                                             **kwargs),
+                                           lambda choice: choice.message.parsed)
         return (await self._get_chat_completion(input_instance, output_type, *args, **kwargs)).choices[0].message.parsed
@@ -1,9 +1,16 @@
+import copy
 import enum
 import logging
+import multiprocessing
+import threading
+import time
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from bisect import bisect_left
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from functools import cached_property
 from enum import Enum
-from typing import Dict, List
+from typing import Dict, List, Optional, Self
 
 import pydantic
 from openai.types import CompletionUsage
@@ -11,6 +18,8 @@ from openai.types.chat import ChatCompletion
 
 from src.synthetic_data_generator.ai_graph.ai.base_ai_config import AIModelType, OpenAIModelVersion
 from src.synthetic_data_generator.ai_graph.ai.i_ai_model import IAIModel
+from synthetic_data_generator.ai_graph.ai.batch_open_ai_client import reset_batch_completion, was_batch_completion
+from synthetic_data_generator.ai_graph.ai.response_cache import reset_cache_hit, was_cache_hit
 
 
 def cost_analyzer(warning_limit: float = 1e-4, error_limit=1e-2):
@@ -19,21 +28,35 @@ def cost_analyzer(warning_limit: float = 1e-4, error_limit=1e-2):
 
         def new_init(self: IAIModel, *args, **kwargs):
             original_init(self, *args, **kwargs)
-            _get_chat_completion = self._get_chat_completion
+            self._get_chat_completion = analyze_chat_completion(self, self._get_chat_completion)
+            # Streamed completions are recorded once the stream has finished and its usage is known
+            if hasattr(self, "_get_streamed_chat_completion"):
+                self._get_streamed_chat_completion = analyze_chat_completion(self,
+                                                                             self._get_streamed_chat_completion)
 
+        def analyze_chat_completion(self: IAIModel, _get_chat_completion):
             async def wrapped_chat_completion(*_args, **_kwargs):
+                AssistantAnalyzer().raise_if_job_cost_limit_exceeded()
+                reset_cache_hit()
+                reset_batch_completion()
+                start_time = time.perf_counter()
                 chat_completion: ChatCompletion = await _get_chat_completion(*_args, **_kwargs)
+                latency_seconds = time.perf_counter() - start_time
                 new_assistant_run = AssistantRun(assistant_name=self.assistant_name,
                                                  run=ChatCompletionAssistantRunAdapter(
-                                                     chat_completion=chat_completion))
+                                                     chat_completion=chat_completion),
+                                                 is_batch=was_batch_completion())
+                if was_cache_hit():
+                    AssistantAnalyzer().append_cache_hit_run(new_assistant_run)
+                    return chat_completion
                 if new_assistant_run.cost > warning_limit:
                     logging.warning(f"Cost of run is {new_assistant_run.cost}")
                 if new_assistant_run.cost > error_limit:
                     logging.error(f"Cost of run is {new_assistant_run.cost}")
-                AssistantAnalyzer().append_assistant_run(new_assistant_run)
+                AssistantAnalyzer().append_assistant_run(new_assistant_run, latency_seconds=latency_seconds)
                 return chat_completion
 
-            self._get_chat_completion = wrapped_chat_completion
+            return wrapped_chat_completion
 
         cls.__init__ = new_init
         return cls
@@ -117,7 +140,11 @@ class CostCalculable(ABC):
         )
 
 
-def calculate_cost(prompt_tokens, completion_tokens, model_type):
+# Batch API requests are billed at half the price of synchronous requests
+BATCH_COST_FACTOR = 0.5
+
+
+def calculate_cost(prompt_tokens, completion_tokens, model_type, is_batch: bool = False):
     cost_map = {
         CostType.INPUT: {
             AIModelType.GPT_4o: 5e-6,
@@ -130,46 +157,192 @@ def calculate_cost(prompt_tokens, completion_tokens, model_type):
     }
     input_cost = cost_map[CostType.INPUT][model_type] * prompt_tokens
     output_cost = cost_map[CostType.OUTPUT][model_type] * completion_tokens
-    return input_cost + output_cost
+    return (input_cost + output_cost) * (BATCH_COST_FACTOR if is_batch else 1)
 
 
 class AssistantRun(CostCalculable):
-    def __init__(self, assistant_name: str, run: ChatCompletionAssistantRunAdapter):
+    def __init__(self, assistant_name: str, run: ChatCompletionAssistantRunAdapter, is_batch: bool = False):
         self.assistant_name = assistant_name
         self.run = run
+        self.is_batch = is_batch
 
-    @property
+    @cached_property
     def model(self) -> OpenAIModelVersion:
         return self.run.get_model()
 
+    @cached_property
+    def _usage(self) -> IUsage:
+        return self.run.get_usage()
+
     @property
     def prompt_tokens(self) -> int:
-        return self.run.get_usage().prompt_tokens
+        return self._usage.prompt_tokens
 
     @property
     def completion_tokens(self) -> int:
-        return self.run.get_usage().completion_tokens
+        return self._usage.completion_tokens
 
-    @property
+    @cached_property
     def cost(self) -> float:
-        return calculate_cost(self.prompt_tokens, self.completion_tokens, self.model.get_model_type())
+        return calculate_cost(self.prompt_tokens, self.completion_tokens, self.model.get_model_type(), self.is_batch)
 
 
 @dataclass
-class AssistantRuns(CostCalculable):
-    _runs: List[AssistantRun]
+class UsageTotals(CostCalculable):
+    cost: float = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    call_count: int = 0
+    sample_count: int = 0
 
     @property
-    def cost(self) -> float:
-        return sum(run.cost for run in self._runs)
+    def cost_per_sample(self) -> float:
+        # Amortized over all responses handed out, so multi-choice completions count once for every choice that
+        # answered a request
+        return self.cost / self.sample_count if self.sample_count else 0
+
+    def add(self, assistant_run: CostCalculable) -> None:
+        self.cost += assistant_run.cost
+        self.prompt_tokens += assistant_run.prompt_tokens
+        self.completion_tokens += assistant_run.completion_tokens
+        self.call_count += 1
+        self.sample_count += 1
+
+    def add_pooled_choice(self) -> None:
+        self.sample_count += 1
+
+    def merge(self, other: Self) -> None:
+        self.cost += other.cost
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.call_count += other.call_count
+        self.sample_count += other.sample_count
+
+
+LATENCY_BUCKET_BOUNDS_SECONDS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128)
+
+
+@dataclass
+class LatencyHistogram:
+    bucket_counts: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKET_BOUNDS_SECONDS) + 1))
+    total_seconds: float = 0
+    max_seconds: float = 0
 
     @property
-    def prompt_tokens(self):
-        return sum(run.prompt_tokens for run in self._runs)
+    def count(self) -> int:
+        return sum(self.bucket_counts)
 
     @property
-    def completion_tokens(self):
-        return sum(run.completion_tokens for run in self._runs)
+    def mean_seconds(self) -> float:
+        return self.total_seconds / self.count if self.count else 0
+
+    def add(self, seconds: float) -> None:
+        self.bucket_counts[bisect_left(LATENCY_BUCKET_BOUNDS_SECONDS, seconds)] += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def merge(self, other: Self) -> None:
+        self.bucket_counts = [count + other_count for count, other_count in
+                              zip(self.bucket_counts, other.bucket_counts)]
+        self.total_seconds += other.total_seconds
+        self.max_seconds = max(self.max_seconds, other.max_seconds)
+
+    def quantile_upper_bound(self, quantile: float) -> float:
+        # Upper bound of the bucket that contains the quantile, the maximum latency for the last bucket
+        required_count = quantile * self.count
+        cumulative_count = 0
+        for bucket_index, bucket_count in enumerate(self.bucket_counts):
+            cumulative_count += bucket_count
+            if bucket_count and cumulative_count >= required_count:
+                if bucket_index < len(LATENCY_BUCKET_BOUNDS_SECONDS):
+                    return min(LATENCY_BUCKET_BOUNDS_SECONDS[bucket_index], self.max_seconds)
+                return self.max_seconds
+        return 0
+
+
+@dataclass
+class AnalyzerSnapshot:
+    total: UsageTotals = field(default_factory=UsageTotals)
+    assistants: Dict[str, UsageTotals] = field(default_factory=dict)
+    models: Dict[str, UsageTotals] = field(default_factory=dict)
+    cache_hit_total: UsageTotals = field(default_factory=UsageTotals)
+    cache_hit_assistants: Dict[str, UsageTotals] = field(default_factory=dict)
+    latencies: Dict[str, LatencyHistogram] = field(default_factory=dict)
+
+    def add_run(self, assistant_run: AssistantRun, latency_seconds: Optional[float] = None) -> None:
+        self.total.add(assistant_run)
+        self.assistants.setdefault(assistant_run.assistant_name, UsageTotals()).add(assistant_run)
+        self.models.setdefault(assistant_run.model.get_model_version(), UsageTotals()).add(assistant_run)
+        if latency_seconds is not None:
+            self.latencies.setdefault(assistant_run.assistant_name, LatencyHistogram()).add(latency_seconds)
+
+    def add_cache_hit(self, assistant_run: AssistantRun) -> None:
+        self.cache_hit_total.add(assistant_run)
+        self.cache_hit_assistants.setdefault(assistant_run.assistant_name, UsageTotals()).add(assistant_run)
+
+    def add_pooled_choice(self, assistant_name: str, model_version: str, is_cache_hit: bool = False) -> None:
+        # A choice of an earlier multi-choice completion answered another request without a run of its own
+        if is_cache_hit:
+            self.cache_hit_total.add_pooled_choice()
+            self.cache_hit_assistants.setdefault(assistant_name, UsageTotals()).add_pooled_choice()
+            return
+        self.total.add_pooled_choice()
+        self.assistants.setdefault(assistant_name, UsageTotals()).add_pooled_choice()
+        self.models.setdefault(model_version, UsageTotals()).add_pooled_choice()
+
+    def merge(self, other: Self) -> None:
+        self.total.merge(other.total)
+        self.cache_hit_total.merge(other.cache_hit_total)
+        for own_values, other_values, value_type in [(self.assistants, other.assistants, UsageTotals),
+                                                     (self.models, other.models, UsageTotals),
+                                                     (self.cache_hit_assistants, other.cache_hit_assistants,
+                                                      UsageTotals),
+                                                     (self.latencies, other.latencies, LatencyHistogram)]:
+            for name, value in other_values.items():
+                own_values.setdefault(name, value_type()).merge(value)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, snapshot_dict: dict) -> Self:
+        return cls(
+            total=UsageTotals(**snapshot_dict["total"]),
+            assistants={ name: UsageTotals(**totals) for name, totals in snapshot_dict["assistants"].items() },
+            models={ name: UsageTotals(**totals) for name, totals in snapshot_dict["models"].items() },
+            cache_hit_total=UsageTotals(**snapshot_dict["cache_hit_total"]),
+            cache_hit_assistants={ name: UsageTotals(**totals) for name, totals in
+                                   snapshot_dict["cache_hit_assistants"].items() },
+            latencies={ name: LatencyHistogram(**histogram) for name, histogram in
+                        snapshot_dict["latencies"].items() },
+        )
+
+
+class CostLimitExceededError(Exception):
+    pass
+
+
+class JobCostLimit:
+    # Shares the cost of the whole job between processes, create it before starting the worker processes
+    def __init__(self, error_limit: float, mp_context=None):
+        mp_context = mp_context or multiprocessing.get_context()
+        self.error_limit = error_limit
+        self._spent_cost = mp_context.Value("d", 0.0)
+        self._exceeded = mp_context.Event()
+
+    @property
+    def spent_cost(self) -> float:
+        return self._spent_cost.value
+
+    def add_cost(self, cost: float) -> None:
+        with self._spent_cost.get_lock():
+            self._spent_cost.value += cost
+            if self._spent_cost.value > self.error_limit and not self._exceeded.is_set():
+                logging.error(f"Cost of job is {self._spent_cost.value}, stopping all workers")
+                self._exceeded.set()
+
+    def is_exceeded(self) -> bool:
+        return self._exceeded.is_set()
 
 
 @dataclass
@@ -208,32 +381,88 @@ class AssistantAnalyzer:
 
     def __init__(self):
         if not hasattr(self, '_initialized'):
-            self._runs = []
+            self._lock = threading.Lock()
+            self._runs: deque[AssistantRun] = deque(maxlen=0)
+            self._snapshot = AnalyzerSnapshot()
+            self._job_cost_limit: Optional[JobCostLimit] = None
             self._initialized = True
 
     def __repr__(self):
         assistant_summaries = self.generate_assistant_summaries()
-        return f"Assistant Usage Summary: {"\n".join(list(map(str, assistant_summaries)))}"
+        cache_hit_total = self._snapshot.cache_hit_total
+        return (f"Assistant Usage Summary: {"\n".join(list(map(str, assistant_summaries)))}"
+                f"\nCache Hits: {cache_hit_total.call_count}, Saved Cost: {cache_hit_total.cost}$")
+
+    def configure(self, max_stored_runs: int = 0):
+        # Only the aggregated totals are kept by default, the latest max_stored_runs raw runs are kept optionally
+        with self._lock:
+            self._runs = deque(self._runs, maxlen=max_stored_runs)
+
+    def set_job_cost_limit(self, job_cost_limit: Optional[JobCostLimit]):
+        self._job_cost_limit = job_cost_limit
+
+    def raise_if_job_cost_limit_exceeded(self):
+        if self._job_cost_limit is not None and self._job_cost_limit.is_exceeded():
+            raise CostLimitExceededError(f"Job cost limit of {self._job_cost_limit.error_limit}$ exceeded")
+
+    def spent_cost(self) -> float:
+        # The job cost limit also counts the cost spent by other processes
+        if self._job_cost_limit is not None:
+            return self._job_cost_limit.spent_cost
+        return self._snapshot.total.cost
+
+    @property
+    def runs(self) -> List[AssistantRun]:
+        return list(self._runs)
 
     def reset(self):
-        self._runs.clear()
+        with self._lock:
+            self._runs.clear()
+            self._snapshot = AnalyzerSnapshot()
+
+    def append_assistant_run(self, assistant_run: AssistantRun, latency_seconds: Optional[float] = None):
+        with self._lock:
+            self._snapshot.add_run(assistant_run, latency_seconds)
+            self._runs.append(assistant_run)
+        if self._job_cost_limit is not None:
+            self._job_cost_limit.add_cost(assistant_run.cost)
+
+    def append_cache_hit_run(self, assistant_run: AssistantRun):
+        # Cache hits are not paid for, their cost is the cost saved by the cache
+        with self._lock:
+            self._snapshot.add_cache_hit(assistant_run)
+
+    def append_pooled_choice(self, assistant_name: str, model_version: str, is_cache_hit: bool = False):
+        with self._lock:
+            self._snapshot.add_pooled_choice(assistant_name, model_version, is_cache_hit)
+
+    def snapshot(self) -> AnalyzerSnapshot:
+        with self._lock:
+            return copy.deepcopy(self._snapshot)
+
+    def merge_snapshot(self, snapshot: AnalyzerSnapshot):
+        with self._lock:
+            self._snapshot.merge(snapshot)
+
+    def total_summary(self) -> UsageTotals:
+        return self._snapshot.total
+
+    def cache_hit_summary(self) -> UsageTotals:
+        return self._snapshot.cache_hit_total
+
+    def get_cache_hit_summary_for_assistant(self, assistant_name) -> UsageTotals:
+        return self._snapshot.cache_hit_assistants.get(assistant_name, UsageTotals())
 
-    def append_assistant_run(self, assistant_run: AssistantRun):
-        self._runs.append(assistant_run)
+    def get_summary_for_assistant(self, assistant_name) -> UsageTotals:
+        return self._snapshot.assistants.get(assistant_name, UsageTotals())
 
-    def total_summary(self):
-        return AssistantRuns(_runs=self._runs)
+    def get_summary_for_model(self, model_version: str) -> UsageTotals:
+        return self._snapshot.models.get(model_version, UsageTotals())
 
-    def get_summary_for_assistant(self, assistant_name):
-        assistant_runs = [run for run in self._runs if run.assistant_name == assistant_name]
-        return AssistantRuns(_runs=assistant_runs)
+    def get_latency_for_assistant(self, assistant_name) -> LatencyHistogram:
+        return self._snapshot.latencies.get(assistant_name, LatencyHistogram())
 
     def generate_assistant_summaries(self):
-        assistant_name_runs = self._group_runs_by_assistant()
-        return [AssistantRuns(_runs=runs).create_summary(assistant_name, self.total_summary().cost) for
-                assistant_name, runs in
-                assistant_name_runs.items()]
-
-    def _group_runs_by_assistant(self) -> Dict[str, List[AssistantRun]]:
-        assistant_names = {run.assistant_name for run in self._runs}
-        return {name: [run for run in self._runs if run.assistant_name == name] for name in assistant_names}
+        total_cost = self._snapshot.total.cost
+        return [totals.create_summary(assistant_name, total_cost) for assistant_name, totals in
+                self._snapshot.assistants.items()]
@@ -1,11 +1,17 @@
+import asyncio
+import json
 import logging
 from abc import ABC
-from typing import Optional
+from contextlib import aclosing, nullcontext
+from typing import AsyncIterator, Awaitable, Callable, Optional
 
 import openai
-from openai.types.chat import ChatCompletion
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from openai.types.chat.chat_completion import Choice
 from tenacity import (
+    RetryCallState,
     retry,
+    retry_if_exception,
     retry_if_exception_type,
     stop_after_attempt,
     wait_random_exponential,
@@ -13,9 +19,16 @@ from tenacity import (
 
 from src.synthetic_data_generator.ai_graph.ai.base_ai_config import OpenAIModelVersion
 from src.synthetic_data_generator.ai_graph.ai.i_ai_model import IAIModel
-from synthetic_data_generator.ai_graph.ai.base_ai_analysis import cost_analyzer
+from src.synthetic_data_generator.ai_graph.tracing import get_tracer
+from synthetic_data_generator.ai_graph.ai.base_ai_analysis import AssistantAnalyzer, cost_analyzer
+from synthetic_data_generator.ai_graph.ai.budget_controller import BudgetController
+from synthetic_data_generator.ai_graph.ai.choice_pool import ChoicePool
 from synthetic_data_generator.ai_graph.ai.model_describer import ModelDescriber
 from synthetic_data_generator.ai_graph.ai.open_ai_client import OpenAiClient
+from synthetic_data_generator.ai_graph.ai.response_cache import was_cache_hit
+from synthetic_data_generator.ai_graph.ai.text_stream import TextStream
+
+_RETRIED_EXCEPTIONS = (openai.APITimeoutError, openai.RateLimitError, openai.APIConnectionError)
 
 
 @cost_analyzer()
@@ -30,7 +43,10 @@ class BaseAIModel[ResultType](IAIModel, ABC):
                  instructions: Optional[str] = None,
                  retry_wait_min: int = 4,
                  retry_wait_max: int = 128,
-                 retry_attempts: int = 20):
+                 retry_attempts: int = 20,
+                 budget_controller: Optional[BudgetController] = None,
+                 stream_idle_timeout_seconds: float = 60,
+                 choices_per_request: int = 1):
         if not isinstance(assistant_name, str):
             raise TypeError("assistant_name must be a string")
         if not isinstance(client, OpenAiClient):
@@ -49,6 +65,12 @@ class BaseAIModel[ResultType](IAIModel, ABC):
             raise TypeError("retry_wait_max must be an integer")
         if not isinstance(retry_attempts, int):
             raise TypeError("retry_attempts must be an integer")
+        if budget_controller is not None and not isinstance(budget_controller, BudgetController):
+            raise TypeError("budget_controller must be of type BudgetController or None")
+        if not isinstance(stream_idle_timeout_seconds, int | float):
+            raise TypeError("stream_idle_timeout_seconds must be a float")
+        if not isinstance(choices_per_request, int) or choices_per_request < 1:
+            raise TypeError("choices_per_request must be a positive integer")
 
         self._assistant_name = assistant_name
         self._client: OpenAiClient = client
@@ -60,30 +82,159 @@ class BaseAIModel[ResultType](IAIModel, ABC):
         self._retry_wait_max = retry_wait_max
         self._retry_attempts = retry_attempts
         self._input_describer = input_describer
+        self._budget_controller = budget_controller
+        self._stream_idle_timeout_seconds = stream_idle_timeout_seconds
+        # With more than one choice per request, the choices of a completion answer several requests with the same
+        # prompt, which pays the prompt tokens and the request only once for all of them
+        self._choices_per_request = choices_per_request
+        self._choice_pool: ChoicePool[tuple[ResultType, bool]] = ChoicePool()
 
     async def _get_chat_completion(self, *args, **kwargs) -> ChatCompletion:
         prompt = self._input_describer.generate_description(*args, **kwargs)
-        return await self._client.get_chat_completion(
-            model_version=self._model.get_model_version(),
-            prompt=prompt,
-            instruction=self._instructions,
-            temperature=self._temperature,
-            max_tokens=self._max_tokens,
-        )
+        async with self._reserve_budget(prompt):
+            return await self._trace_chat_completion(self._client.get_chat_completion(
+                model_version=self._model.get_model_version(),
+                prompt=prompt,
+                instruction=self._instructions,
+                temperature=self._temperature,
+                max_tokens=self._max_tokens,
+                n=self._choices_per_request,
+            ))
+
+    async def _get_streamed_chat_completion(self, text_stream: TextStream, *args, **kwargs) -> ChatCompletion:
+        prompt = self._input_describer.generate_description(*args, **kwargs)
+        async with self._reserve_budget(prompt):
+            chunks = self._client.stream_chat_completion(
+                model_version=self._model.get_model_version(),
+                prompt=prompt,
+                instruction=self._instructions,
+                temperature=self._temperature,
+                max_tokens=self._max_tokens,
+            )
+            return await self._trace_chat_completion(self._consume_stream(text_stream, chunks))
+
+    async def _consume_stream(self, text_stream: TextStream,
+                              chunks: AsyncIterator[ChatCompletionChunk]) -> ChatCompletion:
+        # Hands the deltas to the text stream as they arrive and assembles the completion, with the usage of the
+        # last chunk, for the cost analysis. A stream without a chunk for stream_idle_timeout_seconds times out.
+        last_chunk: Optional[ChatCompletionChunk] = None
+        finish_reason = None
+        async with aclosing(chunks):
+            while True:
+                try:
+                    async with asyncio.timeout(self._stream_idle_timeout_seconds):
+                        last_chunk = await anext(chunks)
+                except StopAsyncIteration:
+                    break
+                for choice in last_chunk.choices:
+                    if choice.delta.content:
+                        text_stream.append(choice.delta.content)
+                    finish_reason = choice.finish_reason or finish_reason
+        if last_chunk is None:
+            raise ValueError("The completion stream ended without a chunk")
+        return ChatCompletion.model_validate({
+            "id": last_chunk.id, "object": "chat.completion", "created": last_chunk.created, "model": last_chunk.model,
+            "choices": [{"index": 0, "finish_reason": finish_reason or "stop",
+                         "message": {"role": "assistant", "content": text_stream.partial_text}}],
+            "usage": last_chunk.usage.model_dump() if last_chunk.usage is not None else None
+        })
+
+    async def _trace_chat_completion(self, chat_completion_request: Awaitable[ChatCompletion]) -> ChatCompletion:
+        tracer = get_tracer()
+        if tracer is None:
+            return await chat_completion_request
+        with tracer.span(self._assistant_name, "ai", model=self._model.get_model_version()) as span_attributes:
+            chat_completion = await chat_completion_request
+            if getattr(chat_completion, "usage", None) is not None:
+                span_attributes["prompt_tokens"] = chat_completion.usage.prompt_tokens
+                span_attributes["completion_tokens"] = chat_completion.usage.completion_tokens
+            return chat_completion
+
+    def _reserve_budget(self, prompt):
+        if self._budget_controller is None:
+            return nullcontext()
+        return self._budget_controller.reserve(self._budget_controller.estimate_cost(
+            prompt, self._instructions, self._model, self._max_tokens * self._choices_per_request))
+
+    def clear_unused_choices(self) -> None:
+        self._choice_pool.clear()
+
+    async def _take_choice(self, fingerprint: str, request_completion: Callable[[], Awaitable[ChatCompletion]],
+                           get_choice_value: Callable[[Choice], ResultType]) -> ResultType:
+        is_requester = False
+
+        async def request_choice_values() -> list[tuple[ResultType, bool]]:
+            nonlocal is_requester
+            is_requester = True
+            chat_completion = await request_completion()
+            return [(get_choice_value(choice), was_cache_hit()) for choice in chat_completion.choices]
+
+        choice_value, is_cache_hit = await self._choice_pool.take(fingerprint, request_choice_values)
+        # The run of the completion already counts the sample of its requester
+        if not is_requester:
+            AssistantAnalyzer().append_pooled_choice(self._assistant_name, self._model.get_model_version(),
+                                                     is_cache_hit)
+        return choice_value
 
     async def _get_string_response(self, *args, **kwargs) -> ResultType:
+        if self._choices_per_request > 1:
+            return await self._take_choice(self._input_describer.generate_description(*args, **kwargs),
+                                           lambda: self._get_chat_completion(*args, **kwargs),
+                                           lambda choice: choice.message.content)
         response = await self._get_chat_completion(*args, **kwargs)
         logging.info(f"Response: {response}")
         return response.choices[0].message.content
 
     async def get_response_with_retry(self, *args, **kwargs) -> ResultType:
-        response_retry_func = retry(
+        response_retry_func = self._with_retry(self._get_string_response, retry_if_exception_type(_RETRIED_EXCEPTIONS))
+        return await response_retry_func(*args, **kwargs)
+
+    def stream_response_with_retry(self, *args, **kwargs) -> TextStream:
+        # Returns at once, the completion is streamed into the text stream by a task on the running event loop.
+        # Attempts are only retried until the first delta arrived, later failures fail the text stream.
+        text_stream = TextStream()
+
+        def is_retried(exception: BaseException) -> bool:
+            return not text_stream.has_started and isinstance(exception, (*_RETRIED_EXCEPTIONS, TimeoutError))
+
+        stream_retry_func = self._with_retry(self._get_streamed_chat_completion, retry_if_exception(is_retried))
+
+        async def stream_response():
+            try:
+                chat_completion = await stream_retry_func(text_stream, *args, **kwargs)
+            except asyncio.CancelledError as exception:
+                text_stream.fail(exception)
+                raise
+            except Exception as exception:
+                text_stream.fail(exception)
+                return
+            text_stream.finish(chat_completion.usage)
+
+        text_stream.producer_task = asyncio.create_task(stream_response())
+        return text_stream
+
+    def _with_retry(self, func, retry_condition):
+        return retry(
             wait=wait_random_exponential(min=self._retry_wait_min, max=self._retry_wait_max),
             stop=stop_after_attempt(self._retry_attempts),
-            retry=retry_if_exception_type((openai.APITimeoutError, openai.RateLimitError, openai.APIConnectionError))
-        )(self._get_string_response)
-        return await response_retry_func(*args, **kwargs)
+            retry=retry_condition,
+            before_sleep=self._trace_retry if get_tracer() is not None else None
+        )(func)
+
+    def _trace_retry(self, retry_state: RetryCallState) -> None:
+        tracer = get_tracer()
+        if tracer is not None:
+            tracer.record_instant_event(f"{self._assistant_name} retry", "ai_retry",
+                                        attempt_number=retry_state.attempt_number,
+                                        exception=type(retry_state.outcome.exception()).__name__,
+                                        sleep_seconds=retry_state.next_action.sleep)
 
     @property
     def assistant_name(self):
         return self._assistant_name
+
+    @property
+    def config_fingerprint(self) -> str:
+        # Everything that changes the responses, nodes calling the model make it part of their config fingerprint
+        return json.dumps([type(self).__name__, self._assistant_name, self._model.get_model_version(),
+                           self._instructions, self._temperature, self._max_tokens])
@@ -0,0 +1,247 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable, Optional
+
+import pydantic
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion, ParsedChatCompletion
+
+from synthetic_data_generator.ai_graph.ai.open_ai_client import OpenAiClient
+
+CHAT_COMPLETIONS_ENDPOINT = "/v1/chat/completions"
+
+_last_completion_from_batch: ContextVar[bool] = ContextVar("last_completion_from_batch", default=False)
+
+
+def reset_batch_completion() -> None:
+    _last_completion_from_batch.set(False)
+
+
+def was_batch_completion() -> bool:
+    # Whether the last completion requested by the current task was processed by the Batch API, which bills it at
+    # a discount
+    return _last_completion_from_batch.get()
+
+
+class BatchRequestError(Exception):
+    pass
+
+
+def create_response_format(response_format: type[pydantic.BaseModel]) -> dict:
+    # Same request parameter as the one the OpenAI client builds for parse, which is not part of its public API
+    json_schema = response_format.model_json_schema()
+    return { "type": "json_schema",
+             "json_schema": { "name": response_format.__name__, "strict": True,
+                              "schema": _to_strict_json_schema(json_schema, json_schema.get("$defs", { })) } }
+
+
+def _to_strict_json_schema(json_schema: dict, definitions: dict[str, dict]) -> dict:
+    # Structured outputs require closed objects whose properties are all required, and references without siblings
+    if "$ref" in json_schema and len(json_schema) > 1:
+        definition = definitions[json_schema["$ref"].removeprefix("#/$defs/")]
+        json_schema = { **definition, **{ key: value for key, value in json_schema.items() if key != "$ref" } }
+    strict_schema = dict(json_schema)
+    if strict_schema.get("type") == "object":
+        strict_schema.setdefault("additionalProperties", False)
+    for key in ("$defs", "properties"):
+        if key in strict_schema:
+            strict_schema[key] = { name: _to_strict_json_schema(schema, definitions)
+                                   for name, schema in strict_schema[key].items() }
+    if "properties" in strict_schema:
+        strict_schema["required"] = list(strict_schema["properties"])
+    if isinstance(strict_schema.get("items"), dict):
+        strict_schema["items"] = _to_strict_json_schema(strict_schema["items"], definitions)
+    for key in ("anyOf", "allOf"):
+        if key in strict_schema:
+            strict_schema[key] = [_to_strict_json_schema(schema, definitions) for schema in strict_schema[key]]
+    return strict_schema
+
+
+class BatchBackend(ABC):
+    # Processes the requests of the input JSONL file and writes one result line per request to the output file
+    @abstractmethod
+    async def run_batch(self, input_path: Path, output_path: Path) -> None:
+        pass
+
+
+class LocalBatchBackend(BatchBackend):
+    def __init__(self, create_response_body: Callable[[dict], dict]):
+        self._create_response_body = create_response_body
+        self.batch_count = 0
+
+    async def run_batch(self, input_path: Path, output_path: Path) -> None:
+        self.batch_count += 1
+        with open(input_path) as input_file, open(output_path, "w") as output_file:
+            for line in input_file:
+                request = json.loads(line)
+                try:
+                    response = { "status_code": 200, "body": self._create_response_body(request["body"]) }
+                    error = None
+                except Exception as exception:
+                    response, error = None, { "message": str(exception) }
+                output_file.write(json.dumps({ "custom_id": request["custom_id"], "response": response,
+                                               "error": error }) + "\n")
+
+
+class OpenAiBatchBackend(BatchBackend):
+    def __init__(self, async_open_ai: AsyncOpenAI, poll_interval_seconds: float = 60,
+                 completion_window: str = "24h"):
+        self._async_open_ai = async_open_ai
+        self._poll_interval_seconds = poll_interval_seconds
+        self._completion_window = completion_window
+
+    async def run_batch(self, input_path: Path, output_path: Path) -> None:
+        with open(input_path, "rb") as input_file:
+            input_file_object = await self._async_open_ai.files.create(file=input_file, purpose="batch")
+        batch = await self._async_open_ai.batches.create(input_file_id=input_file_object.id,
+                                                         endpoint=CHAT_COMPLETIONS_ENDPOINT,
+                                                         completion_window=self._completion_window)
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(self._poll_interval_seconds)
+            batch = await self._async_open_ai.batches.retrieve(batch.id)
+        if batch.status != "completed":
+            raise BatchRequestError(f"Batch {batch.id} ended with status {batch.status}")
+
+        with open(output_path, "wb") as output_file:
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if file_id is not None:
+                    output_file.write((await self._async_open_ai.files.content(file_id)).content)
+
+
+class BatchOpenAiClient(OpenAiClient):
+    # Requests are collected until max_batch_size requests are pending, no request arrived for flush_delay_seconds
+    # or the first pending request waited for max_flush_delay_seconds. Then they are submitted as one batch and the
+    # waiting callers resume.
+    def __init__(self, backend: BatchBackend, batch_directory: str | Path, max_batch_size: int = 50_000,
+                 flush_delay_seconds: float = 1.0, max_flush_delay_seconds: float = 60.0):
+        super().__init__(async_open_ai=None)
+        self._backend = backend
+        self._batch_directory = Path(batch_directory)
+        self._batch_directory.mkdir(parents=True, exist_ok=True)
+        self._max_batch_size = max_batch_size
+        self._flush_delay_seconds = flush_delay_seconds
+        self._max_flush_delay_seconds = max_flush_delay_seconds
+        self._pending_requests: dict[str, tuple[dict, asyncio.Future]] = { }
+        self._request_count = 0
+        self._batch_count = 0
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+        self._flush_deadline = 0.0
+        self._flush_tasks: set[asyncio.Task] = set()
+
+    async def get_chat_completion(self, prompt, instruction, model_version, temperature, max_tokens,
+                                  n: int = 1) -> ChatCompletion:
+        response_body = await self._submit_request(self._create_request_body(prompt, instruction, model_version,
+                                                                             temperature, max_tokens, n))
+        _last_completion_from_batch.set(True)
+        return ChatCompletion.model_validate(response_body)
+
+    async def get_parsed_chat_completion(self, prompt, instruction, model_version, temperature, max_tokens,
+                                         response_format: type[pydantic.BaseModel], n: int = 1) -> ParsedChatCompletion:
+        request_body = self._create_request_body(prompt, instruction, model_version, temperature, max_tokens, n)
+        request_body["response_format"] = create_response_format(response_format)
+        response_body = await self._submit_request(request_body)
+        _last_completion_from_batch.set(True)
+        for choice in response_body["choices"]:
+            content = choice["message"].get("content")
+            choice["message"]["parsed"] = response_format.model_validate_json(content) if content else None
+        return ParsedChatCompletion[response_format].model_validate(response_body)
+
+    async def flush(self) -> None:
+        await self._run_batch(self._take_pending_requests())
+
+    async def _submit_request(self, request_body: dict) -> dict:
+        self._request_count += 1
+        custom_id = f"request-{self._request_count}"
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self._pending_requests:
+            self._flush_deadline = loop.time() + self._max_flush_delay_seconds
+        self._pending_requests[custom_id] = (request_body, future)
+
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+        if len(self._pending_requests) >= self._max_batch_size:
+            self._start_flush()
+        else:
+            # A steady trickle of requests postpones the flush until the deadline of the first request at most
+            flush_time = min(loop.time() + self._flush_delay_seconds, self._flush_deadline)
+            self._flush_timer = loop.call_at(flush_time, self._start_flush)
+        return await future
+
+    def _start_flush(self) -> None:
+        requests = self._take_pending_requests()
+        flush_task = asyncio.create_task(self._run_batch(requests))
+        self._flush_tasks.add(flush_task)
+        flush_task.add_done_callback(self._flush_tasks.discard)
+        # Also fails the requests of a flush that was cancelled before it started
+        flush_task.add_done_callback(lambda _: self._fail_requests(requests, BatchRequestError("Batch was cancelled")))
+
+    def _take_pending_requests(self) -> dict[str, tuple[dict, asyncio.Future]]:
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        requests, self._pending_requests = self._pending_requests, { }
+        return requests
+
+    async def _run_batch(self, requests: dict[str, tuple[dict, asyncio.Future]]) -> None:
+        if not requests:
+            return
+        self._batch_count += 1
+        batch_number = self._batch_count
+        input_path = self._batch_directory / f"batch_{batch_number}_input.jsonl"
+        output_path = self._batch_directory / f"batch_{batch_number}_output.jsonl"
+        try:
+            self._write_batch_input(input_path, requests)
+            await self._backend.run_batch(input_path, output_path)
+            self._resolve_requests(output_path, requests)
+        except Exception as exception:
+            self._fail_requests(requests, exception)
+        finally:
+            # A cancelled flush must not leave the callers of its requests waiting forever
+            self._fail_requests(requests, BatchRequestError(f"Batch {batch_number} was cancelled"))
+
+    @staticmethod
+    def _fail_requests(requests: dict[str, tuple[dict, asyncio.Future]], exception: Exception) -> None:
+        for _, future in requests.values():
+            if not future.done():
+                future.set_exception(exception)
+
+    def _create_request_body(self, prompt, instruction, model_version, temperature, max_tokens, n: int = 1) -> dict:
+        request_body = {
+            "model": model_version,
+            "messages": [
+                { "role": "system", "content": instruction },
+                { "role": "user", "content": prompt },
+            ],
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        if n != 1:
+            request_body["n"] = n
+        return request_body
+
+    def _write_batch_input(self, input_path: Path, requests: dict[str, tuple[dict, asyncio.Future]]) -> None:
+        with open(input_path, "w") as input_file:
+            for custom_id, (request_body, _) in requests.items():
+                input_file.write(json.dumps({ "custom_id": custom_id, "method": "POST",
+                                              "url": CHAT_COMPLETIONS_ENDPOINT, "body": request_body }) + "\n")
+
+    def _resolve_requests(self, output_path: Path, requests: dict[str, tuple[dict, asyncio.Future]]) -> None:
+        with open(output_path) as output_file:
+            for line in output_file:
+                result = json.loads(line)
+                if result["custom_id"] not in requests or requests[result["custom_id"]][1].done():
+                    continue
+                future = requests[result["custom_id"]][1]
+                response = result.get("response")
+                if result.get("error") is None and response is not None and response["status_code"] == 200:
+                    future.set_result(response["body"])
+                else:
+                    future.set_exception(BatchRequestError(f"Request {result["custom_id"]} failed: "
+                                                           f"{result.get("error") or response}"))
+        for custom_id, (_, future) in requests.items():
+            if not future.done():
+                future.set_exception(BatchRequestError(f"No result for request {custom_id}"))
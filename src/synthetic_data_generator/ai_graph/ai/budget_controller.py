@@ -0,0 +1,69 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import Optional
+
+from src.synthetic_data_generator.ai_graph.ai.base_ai_config import OpenAIModelVersion
+from synthetic_data_generator.ai_graph.ai.base_ai_analysis import AssistantAnalyzer, calculate_cost
+
+
+class BudgetPolicy(Enum):
+    # STOP rejects calls that would exceed the budget, WAIT holds them back until the calls in flight are paid for
+    STOP = "stop"
+    WAIT = "wait"
+
+
+class BudgetExceededError(Exception):
+    pass
+
+
+class BudgetController:
+    def __init__(self, budget: float, policy: BudgetPolicy = BudgetPolicy.WAIT, characters_per_token: float = 4,
+                 analyzer: Optional[AssistantAnalyzer] = None):
+        if budget <= 0:
+            raise ValueError("budget must be positive")
+        self.budget = budget
+        self.policy = policy
+        self._characters_per_token = characters_per_token
+        self._analyzer = analyzer or AssistantAnalyzer()
+        self._reserved_cost = 0.0
+        self._reservation_released = asyncio.Event()
+
+    @property
+    def spent_cost(self) -> float:
+        return self._analyzer.spent_cost()
+
+    @property
+    def reserved_cost(self) -> float:
+        return self._reserved_cost
+
+    @property
+    def remaining_budget(self) -> float:
+        return self.budget - self.spent_cost - self._reserved_cost
+
+    def estimate_cost(self, prompt: Optional[str], instruction: Optional[str], model: OpenAIModelVersion,
+                      max_tokens: int) -> float:
+        # Upper bound of the cost, the completion can use at most max_tokens
+        prompt_tokens = round((len(prompt or "") + len(instruction or "")) / self._characters_per_token)
+        model_type = OpenAIModelVersion(model.get_model_version()).get_model_type()
+        return calculate_cost(prompt_tokens, max_tokens, model_type)
+
+    @asynccontextmanager
+    async def reserve(self, estimated_cost: float):
+        while estimated_cost > self.remaining_budget:
+            # Without calls in flight, waiting can not free any budget
+            if self.policy == BudgetPolicy.STOP or self._reserved_cost == 0:
+                raise BudgetExceededError(
+                    f"Estimated cost {estimated_cost}$ exceeds the remaining budget of {self.remaining_budget}$"
+                    f" (budget {self.budget}$, spent {self.spent_cost}$)")
+            logging.info(f"Waiting for calls in flight, remaining budget {self.remaining_budget}$")
+            await self._reservation_released.wait()
+        self._reserved_cost += estimated_cost
+        try:
+            yield
+        finally:
+            self._reserved_cost -= estimated_cost
+            # Waiters of the released event re-check the budget, later waiters wait for the next release
+            self._reservation_released.set()
+            self._reservation_released = asyncio.Event()
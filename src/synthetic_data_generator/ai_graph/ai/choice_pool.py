@@ -0,0 +1,59 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable
+
+
+class ChoicePool[ChoiceType]:
+    # Hands out the choices of multi-choice completions to requests with the same fingerprint. A new completion is
+    # only requested when no unused choice is left, requests arriving meanwhile wait for it instead of sending one.
+    # Unused choices are dropped after max_age_seconds, and the oldest ones once more than max_fingerprints prompts
+    # have unused choices, so prompts that are never repeated do not keep their choices forever.
+    def __init__(self, max_age_seconds: float = 600, max_fingerprints: int = 10_000):
+        self.max_age_seconds = max_age_seconds
+        self.max_fingerprints = max_fingerprints
+        # Creation time and unused choices of each fingerprint. A fingerprint is only added again once its choices
+        # are used up, so the entries are ordered by their creation time.
+        self._choices: dict[str, tuple[float, deque[ChoiceType]]] = { }
+        self._pending_requests: dict[str, asyncio.Future] = { }
+
+    def unused_choice_count(self, fingerprint: str) -> int:
+        self._drop_stale_choices()
+        return len(self._choices[fingerprint][1]) if fingerprint in self._choices else 0
+
+    def clear(self) -> None:
+        self._choices.clear()
+
+    async def take(self, fingerprint: str, request_choices: Callable[[], Awaitable[list[ChoiceType]]]) -> ChoiceType:
+        self._drop_stale_choices()
+        while fingerprint not in self._choices and fingerprint in self._pending_requests:
+            await asyncio.shield(self._pending_requests[fingerprint])
+        if fingerprint in self._choices:
+            return self._pop_choice(fingerprint)
+
+        pending_request = self._pending_requests[fingerprint] = asyncio.get_running_loop().create_future()
+        try:
+            first_choice, *other_choices = await request_choices()
+            if other_choices:
+                self._choices[fingerprint] = time.monotonic(), deque(other_choices)
+                self._drop_stale_choices()
+            return first_choice
+        finally:
+            # Waiters of a failed request send their own request
+            del self._pending_requests[fingerprint]
+            pending_request.set_result(None)
+
+    def _pop_choice(self, fingerprint: str) -> ChoiceType:
+        choices = self._choices[fingerprint][1]
+        choice = choices.popleft()
+        if not choices:
+            del self._choices[fingerprint]
+        return choice
+
+    def _drop_stale_choices(self) -> None:
+        min_creation_time = time.monotonic() - self.max_age_seconds
+        while self._choices:
+            oldest_fingerprint, (creation_time, _) = next(iter(self._choices.items()))
+            if len(self._choices) <= self.max_fingerprints and creation_time >= min_creation_time:
+                return
+            del self._choices[oldest_fingerprint]
@@ -0,0 +1,203 @@
+import asyncio
+import enum
+import json
+import types
+import typing
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+from typing import AsyncIterator, Callable, Optional
+
+import httpx
+import numpy as np
+import openai
+import pydantic
+from openai.types.chat import ChatCompletion, ChatCompletionChunk, ParsedChatCompletion
+
+_CHAT_COMPLETIONS_URL = "https://api.openai.com/v1/chat/completions"
+
+
+class LatencyDistribution(ABC):
+    @abstractmethod
+    def sample(self, rng: np.random.Generator) -> float:
+        pass
+
+
+class ConstantLatency(LatencyDistribution):
+    def __init__(self, seconds: float = 0):
+        self.seconds = seconds
+
+    def sample(self, rng: np.random.Generator) -> float:
+        return self.seconds
+
+
+class UniformLatency(LatencyDistribution):
+    def __init__(self, min_seconds: float, max_seconds: float):
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+
+    def sample(self, rng: np.random.Generator) -> float:
+        return rng.uniform(self.min_seconds, self.max_seconds)
+
+
+class LogNormalLatency(LatencyDistribution):
+    # Long tailed like real completion latencies, half of the calls are faster than the median
+    def __init__(self, median_seconds: float, sigma: float = 0.5):
+        self.median_seconds = median_seconds
+        self.sigma = sigma
+
+    def sample(self, rng: np.random.Generator) -> float:
+        return self.median_seconds * float(np.exp(rng.normal(0, self.sigma)))
+
+
+class FakeChatCompletions:
+    def __init__(self, fake_open_ai: "FakeAsyncOpenAI"):
+        self._fake_open_ai = fake_open_ai
+
+    async def create(self, model: str, messages: list[dict], max_tokens: Optional[int] = None, stream: bool = False,
+                     stream_options: Optional[dict] = None, n: int = 1, **kwargs):
+        if stream:
+            completion_id = await self._fake_open_ai.wait_for_response()
+            include_usage = bool(stream_options and stream_options.get("include_usage"))
+            return self._fake_open_ai.stream(completion_id, model, messages, max_tokens, include_usage)
+        return await self._fake_open_ai.complete(model, messages, max_tokens, n=n)
+
+    async def parse(self, model: str, messages: list[dict], response_format: type[pydantic.BaseModel],
+                    max_tokens: Optional[int] = None, n: int = 1, **kwargs):
+        return await self._fake_open_ai.complete(model, messages, max_tokens, response_format, n)
+
+
+class FakeAsyncOpenAI:
+    # Deterministic in-process stand-in for the chat completion endpoints of AsyncOpenAI, use it as
+    # OpenAiClient(FakeAsyncOpenAI(...)). Token counts are estimated from the message lengths.
+    def __init__(self, latency: Optional[LatencyDistribution] = None, rate_limit_error_rate: float = 0,
+                 timeout_error_rate: float = 0, seed: Optional[int] = 0, characters_per_token: float = 4,
+                 response_factory: Optional[Callable[[str, Optional[type[pydantic.BaseModel]]], str]] = None,
+                 chunk_latency: Optional[LatencyDistribution] = None):
+        if not 0 <= rate_limit_error_rate + timeout_error_rate <= 1:
+            raise ValueError("The error rates must add up to a value between 0 and 1")
+        self.latency = latency or ConstantLatency()
+        # Streamed completions wait for latency before the first chunk and for chunk_latency before every other one
+        self.chunk_latency = chunk_latency or ConstantLatency()
+        self.rate_limit_error_rate = rate_limit_error_rate
+        self.timeout_error_rate = timeout_error_rate
+        self.characters_per_token = characters_per_token
+        self.response_factory = response_factory or create_fake_response
+        self._rng = np.random.default_rng(seed)
+        self.call_count = 0
+        self.rate_limit_error_count = 0
+        self.timeout_error_count = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        completions = FakeChatCompletions(self)
+        self.chat = SimpleNamespace(completions=completions)
+        self.beta = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    async def complete(self, model: str, messages: list[dict], max_tokens: Optional[int] = None,
+                       response_format: Optional[type[pydantic.BaseModel]] = None, n: int = 1) -> ChatCompletion:
+        completion_id = await self.wait_for_response()
+        completion_data = self._create_completion_data(completion_id, model, messages, max_tokens, response_format, n)
+        if response_format is None:
+            return ChatCompletion.model_validate(completion_data)
+        for choice in completion_data["choices"]:
+            choice["message"]["parsed"] = response_format.model_validate_json(choice["message"]["content"])
+        return ParsedChatCompletion[response_format].model_validate(completion_data)
+
+    async def stream(self, completion_id: int, model: str, messages: list[dict], max_tokens: Optional[int] = None,
+                     include_usage: bool = False) -> AsyncIterator[ChatCompletionChunk]:
+        # Streams the completion started by wait_for_response in chunks of about one token
+        completion_data = self._create_completion_data(completion_id, model, messages, max_tokens)
+        content = completion_data["choices"][0]["message"]["content"]
+        chunk_size = max(1, round(self.characters_per_token))
+        chunk_data = {key: completion_data[key] for key in ("id", "created", "model")}
+        for chunk_start in range(0, len(content), chunk_size):
+            if chunk_start > 0 and (chunk_latency_seconds := self.chunk_latency.sample(self._rng)) > 0:
+                await asyncio.sleep(chunk_latency_seconds)
+            yield ChatCompletionChunk.model_validate({
+                **chunk_data, "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "finish_reason": None,
+                             "delta": {"role": "assistant", "content": content[chunk_start:chunk_start + chunk_size]}}]
+            })
+        yield ChatCompletionChunk.model_validate({
+            **chunk_data, "object": "chat.completion.chunk",
+            "choices": [{"index": 0, "delta": { }, "finish_reason": completion_data["choices"][0]["finish_reason"]}]
+        })
+        if include_usage:
+            yield ChatCompletionChunk.model_validate({**chunk_data, "object": "chat.completion.chunk", "choices": [],
+                                                      "usage": completion_data["usage"]})
+
+    async def wait_for_response(self) -> int:
+        # Simulates the latency and the failures of a request, returns the id of the completion
+        self.call_count += 1
+        completion_id = self.call_count
+        latency_seconds = self.latency.sample(self._rng)
+        failure_draw = self._rng.random()
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if failure_draw < self.rate_limit_error_rate:
+                self.rate_limit_error_count += 1
+                raise openai.RateLimitError("Rate limit reached", body=None,
+                                            response=httpx.Response(429, request=self._create_request()))
+            if latency_seconds > 0:
+                await asyncio.sleep(latency_seconds)
+            if failure_draw < self.rate_limit_error_rate + self.timeout_error_rate:
+                self.timeout_error_count += 1
+                raise openai.APITimeoutError(request=self._create_request())
+        finally:
+            self.in_flight -= 1
+        return completion_id
+
+    def _create_completion_data(self, completion_id: int, model: str, messages: list[dict],
+                                max_tokens: Optional[int] = None,
+                                response_format: Optional[type[pydantic.BaseModel]] = None, n: int = 1) -> dict:
+        prompt = "\n".join(message["content"] or "" for message in messages)
+        content = self.response_factory(prompt, response_format)
+        completion_tokens = self._count_tokens(content)
+        finish_reason = "stop"
+        if max_tokens is not None and completion_tokens > max_tokens:
+            completion_tokens, finish_reason = max_tokens, "length"
+        # Every message costs a few tokens for its role and separators, the prompt is only paid once for all choices
+        prompt_tokens = self._count_tokens(prompt) + 4 * len(messages)
+        return {
+            "id": f"chatcmpl-fake-{completion_id}", "object": "chat.completion", "created": 0, "model": model,
+            "choices": [{"index": index, "finish_reason": finish_reason,
+                         "message": {"role": "assistant", "content": content}} for index in range(n)],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": n * completion_tokens,
+                      "total_tokens": prompt_tokens + n * completion_tokens}
+        }
+
+    def _count_tokens(self, text: str) -> int:
+        return max(1, round(len(text) / self.characters_per_token))
+
+    @staticmethod
+    def _create_request() -> httpx.Request:
+        return httpx.Request("POST", _CHAT_COMPLETIONS_URL)
+
+
+def create_fake_response(prompt: str, response_format: Optional[type[pydantic.BaseModel]] = None) -> str:
+    if response_format is None:
+        return f"Fake response to: {prompt[:200]}"
+    return json.dumps(_create_placeholder(response_format))
+
+
+def _create_placeholder(annotation) -> any:
+    # Smallest valid value of a response format field, nested models are filled recursively
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union or origin is types.UnionType:
+        return _create_placeholder(next(arg for arg in typing.get_args(annotation) if arg is not type(None)))
+    if origin is typing.Literal:
+        return typing.get_args(annotation)[0]
+    if origin in (list, set, tuple, frozenset):
+        return []
+    if origin is dict:
+        return { }
+    if isinstance(annotation, type) and issubclass(annotation, pydantic.BaseModel):
+        return {name: _create_placeholder(field_info.annotation) for name, field_info in
+                annotation.model_fields.items()}
+    if isinstance(annotation, type) and issubclass(annotation, enum.Enum):
+        return next(iter(annotation)).value
+    if annotation is bool:
+        return False
+    if annotation in (int, float):
+        return 0
+    return "text"
@@ -1,31 +1,65 @@
+from contextlib import nullcontext
+from typing import AsyncIterator, Optional
+
 from openai import AsyncOpenAI
-from openai.types.chat import ChatCompletion, ParsedChatCompletion
+from openai.types.chat import ChatCompletion, ChatCompletionChunk, ParsedChatCompletion
+
+from synthetic_data_generator.ai_graph.ai.request_scheduler import RequestScheduler
 
 
 class OpenAiClient:
-    def __init__(self, async_open_ai: AsyncOpenAI):
+    def __init__(self, async_open_ai: AsyncOpenAI, scheduler: Optional[RequestScheduler] = None):
         self.async_open_ai = async_open_ai
+        self.scheduler = scheduler
 
-    async def get_chat_completion(self, prompt, instruction, model_version, temperature, max_tokens) -> ChatCompletion:
-        return await self.async_open_ai.chat.completions.create(
-            model=model_version,
-            messages=[
-                {"role": "system", "content": instruction},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=temperature,
-            max_tokens=max_tokens
-        )
+    async def get_chat_completion(self, prompt, instruction, model_version, temperature, max_tokens,
+                                  n: int = 1) -> ChatCompletion:
+        async with self._schedule(prompt, instruction, max_tokens * n):
+            return await self.async_open_ai.chat.completions.create(
+                model=model_version,
+                messages=[
+                    {"role": "system", "content": instruction},
+                    {"role": "user", "content": prompt},
+                ],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                n=n
+            )
+
+    async def stream_chat_completion(self, prompt, instruction, model_version, temperature,
+                                     max_tokens) -> AsyncIterator[ChatCompletionChunk]:
+        # The last chunk has no choices and carries the usage of the whole completion
+        async with self._schedule(prompt, instruction, max_tokens):
+            stream = await self.async_open_ai.chat.completions.create(
+                model=model_version,
+                messages=[
+                    {"role": "system", "content": instruction},
+                    {"role": "user", "content": prompt},
+                ],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            async for chunk in stream:
+                yield chunk
 
     async def get_parsed_chat_completion(self, prompt, instruction, model_version, temperature, max_tokens,
-                                         response_format) -> ParsedChatCompletion:
-        return (await self.async_open_ai.beta.chat.completions.parse(
-            model=model_version,
-            messages=[
-                {"role": "system", "content": instruction},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=temperature,
-            response_format=response_format,
-            max_tokens=max_tokens
-        ))
+                                         response_format, n: int = 1) -> ParsedChatCompletion:
+        async with self._schedule(prompt, instruction, max_tokens * n):
+            return (await self.async_open_ai.beta.chat.completions.parse(
+                model=model_version,
+                messages=[
+                    {"role": "system", "content": instruction},
+                    {"role": "user", "content": prompt},
+                ],
+                temperature=temperature,
+                response_format=response_format,
+                max_tokens=max_tokens,
+                n=n
+            ))
+
+    def _schedule(self, prompt, instruction, max_tokens):
+        if self.scheduler is None:
+            return nullcontext()
+        return self.scheduler.schedule(self.scheduler.estimate_tokens(prompt, instruction, max_tokens))
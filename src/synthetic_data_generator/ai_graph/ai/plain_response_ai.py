@@ -2,6 +2,7 @@ from typing import Optional
 
 from synthetic_data_generator.ai_graph.ai.base_ai_config import OpenAIModelVersion
 from synthetic_data_generator.ai_graph.ai.base_ai_model import BaseAIModel
+from synthetic_data_generator.ai_graph.ai.budget_controller import BudgetController
 from synthetic_data_generator.ai_graph.ai.model_describer import ModelDescriber
 from synthetic_data_generator.ai_graph.ai.open_ai_client import OpenAiClient
 
@@ -22,7 +23,10 @@ class PlainResponseAI(BaseAIModel[str]):
                  instructions: Optional[str] = None,
                  retry_wait_min: int = 4,
                  retry_wait_max: int = 128,
-                 retry_attempts: int = 20):
+                 retry_attempts: int = 20,
+                 budget_controller: Optional[BudgetController] = None,
+                 stream_idle_timeout_seconds: float = 60,
+                 choices_per_request: int = 1):
         super().__init__(
             assistant_name=assistant_name,
             client=client,
@@ -33,5 +37,8 @@ class PlainResponseAI(BaseAIModel[str]):
             retry_wait_min=retry_wait_min,
             retry_wait_max=retry_wait_max,
             retry_attempts=retry_attempts,
-            input_describer=BasicPromptGenerator()
+            input_describer=BasicPromptGenerator(),
+            budget_controller=budget_controller,
+            stream_idle_timeout_seconds=stream_idle_timeout_seconds,
+            choices_per_request=choices_per_request
         )
@@ -0,0 +1,70 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, refill_rate_per_second: float):
+        if capacity <= 0 or refill_rate_per_second <= 0:
+            raise ValueError("capacity and refill_rate_per_second must be positive")
+        self.capacity = capacity
+        self.refill_rate_per_second = refill_rate_per_second
+        self._tokens = capacity
+        self._last_refill = time.monotonic()
+
+    @classmethod
+    def per_minute(cls, amount_per_minute: float):
+        return cls(capacity=amount_per_minute, refill_rate_per_second=amount_per_minute / 60)
+
+    async def acquire(self, amount: float = 1) -> None:
+        # Requests larger than the capacity wait for a full bucket instead of waiting forever. The tokens are taken
+        # at once, a negative balance is the wait of the requests before, so that waiters do not hold up each other
+        # and are served in order.
+        amount = min(amount, self.capacity)
+        self._refill()
+        self._tokens -= amount
+        if self._tokens >= 0:
+            return
+        try:
+            await asyncio.sleep(-self._tokens / self.refill_rate_per_second)
+        except asyncio.CancelledError:
+            self._tokens += amount
+            raise
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.refill_rate_per_second)
+        self._last_refill = now
+
+
+class RequestScheduler:
+    def __init__(self, max_concurrent_requests: int = 50, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None, characters_per_token: float = 4):
+        self.max_concurrent_requests = max_concurrent_requests
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._request_bucket = TokenBucket.per_minute(requests_per_minute) if requests_per_minute else None
+        self._token_bucket = TokenBucket.per_minute(tokens_per_minute) if tokens_per_minute else None
+        self._characters_per_token = characters_per_token
+
+    def estimate_tokens(self, prompt: Optional[str], instruction: Optional[str], max_tokens: int) -> int:
+        # The rate limit counts the requested completion tokens as well
+        prompt_characters = len(prompt or "") + len(instruction or "")
+        return round(prompt_characters / self._characters_per_token) + max_tokens
+
+    @asynccontextmanager
+    async def schedule(self, estimated_tokens: int):
+        if self._request_bucket is not None:
+            await self._request_bucket.acquire(1)
+        if self._token_bucket is not None:
+            await self._token_bucket.acquire(estimated_tokens)
+        async with self._get_semaphore():
+            yield
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created for the running event loop, so that a scheduler can be used by several asyncio.run calls
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore, self._semaphore_loop = asyncio.Semaphore(self.max_concurrent_requests), loop
+        return self._semaphore
@@ -0,0 +1,155 @@
+import asyncio
+import hashlib
+import heapq
+import json
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+import pydantic
+from openai.types.chat import ChatCompletion, ParsedChatCompletion
+
+from src.synthetic_data_generator.ai_graph.tracing import get_current_sample_index
+from synthetic_data_generator.ai_graph.ai.open_ai_client import OpenAiClient
+
+_last_completion_from_cache: ContextVar[bool] = ContextVar("last_completion_from_cache", default=False)
+
+
+def reset_cache_hit() -> None:
+    _last_completion_from_cache.set(False)
+
+
+def was_cache_hit() -> bool:
+    # Whether the last completion requested by the current task was served from a response cache
+    return _last_completion_from_cache.get()
+
+
+class ResponseCache:
+    def __init__(self, path: str | Path, max_size_bytes: int = 1024 ** 3):
+        self.max_size_bytes = max_size_bytes
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS responses ("
+                                 "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+                                 "last_access REAL NOT NULL)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._connection.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._connection.commit()
+            return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO responses (key, response, size, last_access) "
+                                     "VALUES (?, ?, ?, ?)", (key, response, len(response.encode()), time.time()))
+            self._evict_least_recently_used()
+            self._connection.commit()
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _evict_least_recently_used(self) -> None:
+        excess_size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[
+                          0] - self.max_size_bytes
+        if excess_size <= 0:
+            return
+        evicted_keys = []
+        for key, size in self._connection.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            if excess_size <= 0:
+                break
+            evicted_keys.append((key,))
+            excess_size -= size
+        self._connection.executemany("DELETE FROM responses WHERE key = ?", evicted_keys)
+
+
+class CachedOpenAiClient(OpenAiClient):
+    # Repeated identical requests of a sample are cached separately, so that re-running a job reproduces the same
+    # distinct responses instead of answering every request with the first one. The responses are keyed by the
+    # sample and the occurrence of the request in it, which does not depend on the order the samples run in.
+    def __init__(self, client: OpenAiClient, cache: ResponseCache, distinct_repeated_requests: bool = True):
+        super().__init__(client.async_open_ai, client.scheduler)
+        self._client = client
+        self._cache = cache
+        self._distinct_repeated_requests = distinct_repeated_requests
+        self._request_occurrences = Counter()
+        # Occurrences of failed requests, which are reused by the next identical request, e.g. a retry
+        self._released_occurrences: dict[tuple[str, int], list[int]] = { }
+
+    async def get_chat_completion(self, prompt, instruction, model_version, temperature, max_tokens,
+                                  n: int = 1) -> ChatCompletion:
+        request_values = ("chat_completion", prompt, instruction, model_version, temperature, max_tokens,
+                          *self._get_choice_count_key(n))
+        return await self._get_cached_completion(
+            request_values, ChatCompletion.model_validate_json,
+            lambda: self._client.get_chat_completion(prompt=prompt, instruction=instruction,
+                                                     model_version=model_version, temperature=temperature,
+                                                     max_tokens=max_tokens, n=n))
+
+    async def get_parsed_chat_completion(self, prompt, instruction, model_version, temperature, max_tokens,
+                                         response_format: type[pydantic.BaseModel], n: int = 1) -> ParsedChatCompletion:
+        response_format_schema = json.dumps(response_format.model_json_schema(), sort_keys=True)
+        request_values = ("parsed_chat_completion", prompt, instruction, model_version, temperature, max_tokens,
+                          response_format.__name__, response_format_schema, *self._get_choice_count_key(n))
+        return await self._get_cached_completion(
+            request_values, ParsedChatCompletion[response_format].model_validate_json,
+            lambda: self._client.get_parsed_chat_completion(prompt=prompt, instruction=instruction,
+                                                            model_version=model_version, temperature=temperature,
+                                                            max_tokens=max_tokens, response_format=response_format,
+                                                            n=n))
+
+    async def _get_cached_completion[CompletionType: ChatCompletion](
+            self, request_values: tuple, parse_completion: Callable[[str], CompletionType],
+            request_completion: Callable[[], Awaitable[CompletionType]]) -> CompletionType:
+        request_key = json.dumps(request_values, default=str), get_current_sample_index()
+        occurrence = self._reserve_occurrence(request_key)
+        try:
+            key = hashlib.sha256(f"{request_key[0]}#{request_key[1]}#{occurrence}".encode()).hexdigest()
+            cached_response = await asyncio.to_thread(self._cache.get, key)
+            _last_completion_from_cache.set(cached_response is not None)
+            if cached_response is not None:
+                return parse_completion(cached_response)
+
+            chat_completion = await request_completion()
+            await asyncio.to_thread(self._cache.put, key, chat_completion.model_dump_json())
+            return chat_completion
+        except BaseException:
+            self._release_occurrence(request_key, occurrence)
+            raise
+
+    @staticmethod
+    def _get_choice_count_key(n: int) -> list[int]:
+        # Keeps the keys of single choice requests unchanged
+        return [n] if n != 1 else []
+
+    def _reserve_occurrence(self, request_key: tuple[str, int]) -> int:
+        if not self._distinct_repeated_requests:
+            return 0
+        released_occurrences = self._released_occurrences.get(request_key)
+        if released_occurrences:
+            return heapq.heappop(released_occurrences)
+        occurrence = self._request_occurrences[request_key]
+        self._request_occurrences[request_key] += 1
+        return occurrence
+
+    def _release_occurrence(self, request_key: tuple[str, int], occurrence: int) -> None:
+        if self._distinct_repeated_requests:
+            heapq.heappush(self._released_occurrences.setdefault(request_key, []), occurrence)
@@ -0,0 +1,100 @@
+import asyncio
+from typing import AsyncIterator, Iterable, Optional, Self
+
+from openai.types import CompletionUsage
+
+
+class TextStream:
+    # Text of a completion that is still being generated. Every consumer iterates over all deltas from the start,
+    # so downstream nodes and sinks can start working on the text before the completion has finished.
+    def __init__(self):
+        self.usage: Optional[CompletionUsage] = None
+        # Task streaming into this text stream, kept here so that it is not garbage collected while it runs
+        self.producer_task: Optional[asyncio.Task] = None
+        self._deltas: list[str] = []
+        self._changed = asyncio.Event()
+        self._done = False
+        self._exception: Optional[BaseException] = None
+
+    @classmethod
+    def from_text(cls, text: str, usage: Optional[CompletionUsage] = None) -> Self:
+        text_stream = cls()
+        if text:
+            text_stream.append(text)
+        text_stream.finish(usage)
+        return text_stream
+
+    @property
+    def has_started(self) -> bool:
+        return bool(self._deltas)
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    @property
+    def partial_text(self) -> str:
+        return "".join(self._deltas)
+
+    def append(self, delta: str) -> None:
+        if self._done:
+            raise ValueError("Text stream is already finished")
+        self._deltas.append(delta)
+        self._notify()
+
+    def finish(self, usage: Optional[CompletionUsage] = None) -> None:
+        self.usage = usage
+        self._done = True
+        self._notify()
+
+    def fail(self, exception: BaseException) -> None:
+        self._exception = exception
+        self._done = True
+        self._notify()
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        delta_index = 0
+        while True:
+            changed = self._changed
+            while delta_index < len(self._deltas):
+                yield self._deltas[delta_index]
+                delta_index += 1
+            if self._exception is not None:
+                raise self._exception
+            if self._done:
+                return
+            await changed.wait()
+
+    async def text(self) -> str:
+        async for _ in self:
+            pass
+        return self.partial_text
+
+    def get_finished_text(self) -> str:
+        if self._exception is not None:
+            raise self._exception
+        if not self._done:
+            raise ValueError("Text stream has not finished yet")
+        return self.partial_text
+
+    def __deepcopy__(self, memo: dict) -> Self:
+        # Forked storages share the stream, it is only ever appended to by its producer
+        return self
+
+    def __reduce__(self):
+        # Finished streams are pickled as their text, e.g. for checkpoints and the results of worker processes
+        if not self._done or self._exception is not None:
+            raise TypeError("Only successfully finished text streams can be pickled")
+        return TextStream.from_text, (self.partial_text, self.usage)
+
+    def _notify(self) -> None:
+        # Waiting consumers hold the previous event, which is set once and then replaced
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+async def wait_for_text_streams(values: Iterable[any]) -> None:
+    # Values are pickled for checkpoints, caches and worker results, which is only possible for finished streams
+    for value in values:
+        if isinstance(value, TextStream):
+            await value.text()
@@ -0,0 +1,113 @@
+import json
+import pickle
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+
+from src.synthetic_data_generator.ai_graph.key_value_store import BaseKeyValueStore, KeyValueStore
+from src.synthetic_data_generator.ai_graph.node_output_store import NodeOutputStore
+
+
+class GenerationCheckpoint(NodeOutputStore):
+    # Durable record of a generation run: the run seed, every completed sample with its seed and outputs, and the
+    # outputs of checkpointed nodes of unfinished samples. Worker processes open their own checkpoint on the path.
+    def __init__(self, path: str | Path, timeout_seconds: float = 60):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, timeout=timeout_seconds, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS run (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS samples ("
+                                 "sample_index INTEGER PRIMARY KEY, seed TEXT NOT NULL, storage BLOB NOT NULL)")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS node_outputs ("
+                                 "sample_index INTEGER NOT NULL, node_key TEXT NOT NULL, storage BLOB NOT NULL, "
+                                 "PRIMARY KEY (sample_index, node_key))")
+        self._connection.commit()
+
+    def resolve_run_seed_sequence(self, seed_sequence: Optional[np.random.SeedSequence] = None
+                                  ) -> np.random.SeedSequence:
+        # A resumed run continues with the seed of the checkpointed run, a different seed would mix two datasets
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM run WHERE name = 'seed'").fetchone()
+            if row is not None:
+                stored_seed_sequence = self._deserialize_seed_sequence(row[0])
+                if seed_sequence is not None and (seed_sequence.entropy, seed_sequence.spawn_key) != (
+                        stored_seed_sequence.entropy, stored_seed_sequence.spawn_key):
+                    raise ValueError(f"Checkpoint {self.path} was created with a different seed")
+                return stored_seed_sequence
+            seed_sequence = seed_sequence or np.random.SeedSequence()
+            self._connection.execute("INSERT INTO run (name, value) VALUES ('seed', ?)",
+                                     (self._serialize_seed_sequence(seed_sequence),))
+            self._connection.commit()
+            return seed_sequence
+
+    def completed_sample_indices(self) -> set[int]:
+        with self._lock:
+            return {row[0] for row in self._connection.execute("SELECT sample_index FROM samples")}
+
+    def save_sample(self, sample_index: int, seed_sequence: np.random.SeedSequence,
+                    storage: BaseKeyValueStore) -> None:
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO samples (sample_index, seed, storage) VALUES (?, ?, ?)",
+                                     (sample_index, self._serialize_seed_sequence(seed_sequence),
+                                      pickle.dumps(storage.storage)))
+            self._connection.execute("DELETE FROM node_outputs WHERE sample_index = ?", (sample_index,))
+            self._connection.commit()
+
+    def load_samples(self, sample_indices: Optional[set[int]] = None, page_size: int = 1000,
+                     storage_factory: Callable[[], BaseKeyValueStore] = KeyValueStore
+                     ) -> Iterator[tuple[int, BaseKeyValueStore]]:
+        # Reads the samples page by page, so that large checkpoints are not loaded into memory at once
+        last_sample_index = -1
+        while True:
+            with self._lock:
+                rows = self._connection.execute("SELECT sample_index, storage FROM samples WHERE sample_index > ? "
+                                                "ORDER BY sample_index LIMIT ?",
+                                                (last_sample_index, page_size)).fetchall()
+            if not rows:
+                return
+            for sample_index, pickled_storage in rows:
+                if sample_indices is None or sample_index in sample_indices:
+                    storage = storage_factory()
+                    storage.restore(pickle.loads(pickled_storage))
+                    yield sample_index, storage
+            last_sample_index = rows[-1][0]
+
+    def load_sample_seed_sequence(self, sample_index: int) -> Optional[np.random.SeedSequence]:
+        with self._lock:
+            row = self._connection.execute("SELECT seed FROM samples WHERE sample_index = ?",
+                                           (sample_index,)).fetchone()
+        return self._deserialize_seed_sequence(row[0]) if row is not None else None
+
+    def load_node_output(self, sample_index: int, node_key: str) -> Optional[dict[str, any]]:
+        with self._lock:
+            row = self._connection.execute("SELECT storage FROM node_outputs WHERE sample_index = ? AND node_key = ?",
+                                           (sample_index, node_key)).fetchone()
+        return pickle.loads(row[0]) if row is not None else None
+
+    def save_node_output(self, sample_index: int, node_key: str, storage_values: dict[str, any]) -> None:
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO node_outputs (sample_index, node_key, storage) "
+                                     "VALUES (?, ?, ?)", (sample_index, node_key, pickle.dumps(storage_values)))
+            self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    @staticmethod
+    def _serialize_seed_sequence(seed_sequence: np.random.SeedSequence) -> str:
+        # The entropy can exceed 64 bits, it is stored as decimal strings
+        entropy = seed_sequence.entropy
+        serialized_entropy = [str(value) for value in entropy] if isinstance(entropy, (list, tuple)) else str(entropy)
+        return json.dumps({"entropy": serialized_entropy, "spawn_key": list(seed_sequence.spawn_key)})
+
+    @staticmethod
+    def _deserialize_seed_sequence(serialized_seed_sequence: str) -> np.random.SeedSequence:
+        seed = json.loads(serialized_seed_sequence)
+        entropy = seed["entropy"]
+        entropy = [int(value) for value in entropy] if isinstance(entropy, list) else int(entropy)
+        return np.random.SeedSequence(entropy, spawn_key=tuple(seed["spawn_key"]))
@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import pickle
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+
+from src.synthetic_data_generator.ai_graph.key_value_store import KeyValueStore
+from src.synthetic_data_generator.ai_graph.node_output_cache import (
+    NodeOutputCache,
+    create_node_fingerprint,
+    create_sample_fingerprint,
+)
+from src.synthetic_data_generator.ai_graph.node_output_store import NodeOutputStore
+from src.synthetic_data_generator.ai_graph.nodes.executable_node import INode
+from src.synthetic_data_generator.ai_graph.tracing import get_tracer, set_current_sample_index
+from src.synthetic_data_generator.random_generators.random_streams import get_sample_rng
+from synthetic_data_generator.ai_graph.ai.text_stream import wait_for_text_streams
+
+
+class GraphCycleError(ValueError):
+    pass
+
+
+class CompiledGraph:
+    def __init__(self, sinks: list[INode], waves: list[list[INode]], parents: dict[int, list[INode]]):
+        self.sinks = sinks
+        self.waves = waves
+        self._parents = parents
+        # Nodes with checkpoint_outputs set reuse their stored output of a sample instead of running again
+        self.node_output_store: Optional[NodeOutputStore] = None
+        # Nodes with a config fingerprint reuse the output of an earlier run for the same sample and inputs
+        self.node_output_cache: Optional[NodeOutputCache] = None
+        self._node_keys = self._create_node_keys(self.nodes)
+        # Number of storages each node output is handed to, the last consumer takes the output without a fork
+        self._consumer_counts: dict[int, int] = {id(sink): 1 for sink in sinks}
+        for node_parents in parents.values():
+            for parent in node_parents:
+                self._consumer_counts[id(parent)] = self._consumer_counts.get(id(parent), 0) + 1
+
+    @property
+    def nodes(self) -> list[INode]:
+        return [node for wave in self.waves for node in wave]
+
+    async def execute(self, shared_storage: KeyValueStore = None, sample_index: int = 0) -> KeyValueStore:
+        shared_storage = shared_storage or KeyValueStore()
+        outputs: dict[int, KeyValueStore] = { }
+        remaining_consumers = dict(self._consumer_counts)
+
+        def take_output(node: INode) -> KeyValueStore:
+            remaining_consumers[id(node)] -= 1
+            if remaining_consumers[id(node)] == 0:
+                return outputs.pop(id(node))
+            return outputs[id(node)].fork()
+
+        sample_fingerprint = None
+        if self.node_output_cache is not None:
+            sample_fingerprint = create_sample_fingerprint(shared_storage, sample_index)
+        set_current_sample_index(sample_index)
+        tracer = get_tracer()
+        sample_start_seconds = time.perf_counter() if tracer is not None else 0
+        node_end_seconds: dict[int, float] = { }
+
+        async def execute_node(node: INode) -> KeyValueStore:
+            start_seconds = time.perf_counter() if tracer is not None else 0
+            parent_storages = [take_output(parent) for parent in self._parents[id(node)]]
+            if not parent_storages:
+                node_storage = shared_storage.fork()
+            else:
+                node_storage = parent_storages[0]
+                node_storage.merge(*parent_storages[1:])
+            if tracer is None:
+                return await self._run_node(node, node_storage, sample_index, sample_fingerprint)
+
+            # Time between the last parent finishing and this node starting, spent waiting for the wave
+            ready_seconds = max((node_end_seconds[id(parent)] for parent in self._parents[id(node)]),
+                                default=sample_start_seconds)
+            with tracer.span(type(node).__name__, "node", sample_index=sample_index,
+                             queue_wait_seconds=start_seconds - ready_seconds,
+                             storage_seconds=time.perf_counter() - start_seconds):
+                output = await self._run_node(node, node_storage, sample_index, sample_fingerprint)
+            node_end_seconds[id(node)] = time.perf_counter()
+            return output
+
+        for wave in self.waves:
+            logging.info(f"Executing wave of {len(wave)} nodes")
+            wave_outputs = await asyncio.gather(*(execute_node(node) for node in wave))
+            for node, output in zip(wave, wave_outputs):
+                outputs[id(node)] = output
+
+        sink_storages = [take_output(sink) for sink in self.sinks]
+        sink_storages[0].merge(*sink_storages[1:])
+        return sink_storages[0]
+
+    async def execute_batch(self, sample_count: int, shared_storage: KeyValueStore = None,
+                            max_concurrent_samples: Optional[int] = None,
+                            seed_sequence: Optional[np.random.SeedSequence] = None) -> list[KeyValueStore]:
+        shared_storage = shared_storage or KeyValueStore()
+        semaphore = asyncio.Semaphore(max_concurrent_samples or sample_count or 1)
+
+        async def execute_sample(sample_index: int) -> KeyValueStore:
+            sample_storage = shared_storage.fork()
+            if seed_sequence is not None:
+                sample_storage.rng = get_sample_rng(seed_sequence, sample_index)
+            async with semaphore:
+                return await self.execute(sample_storage, sample_index)
+
+        return list(await asyncio.gather(*(execute_sample(sample_index) for sample_index in range(sample_count))))
+
+    async def _run_node(self, node: INode, node_storage: KeyValueStore, sample_index: int,
+                        sample_fingerprint: Optional[str] = None) -> KeyValueStore:
+        if sample_fingerprint is not None and getattr(node, "config_fingerprint", None) is not None:
+            return await self._execute_memoized_node(node, node_storage, sample_index, sample_fingerprint)
+        return await self._run_stored_node(node, node_storage, sample_index)
+
+    async def _run_stored_node(self, node: INode, node_storage: KeyValueStore, sample_index: int) -> KeyValueStore:
+        if self.node_output_store is None or not getattr(node, "checkpoint_outputs", False):
+            return await node._execute_node(node_storage)
+        return await self._execute_checkpointed_node(node, node_storage, sample_index)
+
+    def get_node_key(self, node: INode) -> str:
+        return self._node_keys[id(node)]
+
+    @staticmethod
+    def _create_node_keys(nodes: list[INode]) -> dict[int, str]:
+        # Checkpointed outputs are stored by the node key, which therefore must not depend on the other nodes
+        node_keys: dict[int, str] = { }
+        key_counts: dict[str, int] = { }
+        for node in nodes:
+            node_key = getattr(node, "node_key", type(node).__name__)
+            key_counts[node_key] = key_counts.get(node_key, 0) + 1
+            if key_counts[node_key] > 1:
+                if getattr(node, "checkpoint_outputs", False):
+                    raise ValueError(f"Several nodes have the key {node_key}, checkpointed nodes need distinct names")
+                node_key = f"{node_key}#{key_counts[node_key]}"
+            node_keys[id(node)] = node_key
+        return node_keys
+
+    async def _execute_checkpointed_node(self, node: INode, node_storage: KeyValueStore,
+                                         sample_index: int) -> KeyValueStore:
+        node_key = self.get_node_key(node)
+        stored_values = await asyncio.to_thread(self.node_output_store.load_node_output, sample_index, node_key)
+        if stored_values is not None:
+            logging.info(f"Reusing stored output of {node_key} for sample {sample_index}")
+            node_storage.restore(stored_values)
+            return node_storage
+        output_storage = await node._execute_node(node_storage)
+        await wait_for_text_streams(output_storage.storage.values())
+        await asyncio.to_thread(self.node_output_store.save_node_output, sample_index, node_key,
+                                output_storage.storage)
+        return output_storage
+
+    async def _execute_memoized_node(self, node: INode, node_storage: KeyValueStore, sample_index: int,
+                                     sample_fingerprint: str) -> KeyValueStore:
+        await wait_for_text_streams(node_storage.storage.values())
+        try:
+            fingerprint = create_node_fingerprint(node.config_fingerprint, sample_fingerprint, node_storage)
+        except (pickle.PicklingError, TypeError, AttributeError, ValueError) as exception:
+            logging.warning(f"Not memoizing {self.get_node_key(node)}, its inputs can not be pickled: {exception}")
+            return await self._run_stored_node(node, node_storage, sample_index)
+        stored_values = await asyncio.to_thread(self.node_output_cache.load, fingerprint)
+        if stored_values is not None:
+            logging.info(f"Reusing memoized output of {self.get_node_key(node)} for sample {sample_index}")
+            node_storage.restore(stored_values)
+            return node_storage
+        output_storage = await self._run_stored_node(node, node_storage, sample_index)
+        await wait_for_text_streams(output_storage.storage.values())
+        await asyncio.to_thread(self.node_output_cache.save, fingerprint, output_storage.storage)
+        return output_storage
+
+
+class GraphCompiler:
+    def compile(self, *sinks: INode, requested_types: Optional[Iterable[type]] = None) -> CompiledGraph:
+        # With requested_types only the nodes producing these types and their ancestors are executed
+        if not sinks:
+            raise ValueError("At least one sink node is required")
+        sinks = list({id(sink): sink for sink in sinks}.values())
+        ordered_nodes, parents = self._collect_nodes(sinks)
+        if requested_types is not None:
+            sinks = self._find_producers(ordered_nodes, requested_types)
+            ordered_nodes, parents = self._collect_nodes(sinks)
+            logging.info(f"Pruned graph to {len(ordered_nodes)} nodes producing the requested types")
+        return CompiledGraph(sinks, self._build_waves(ordered_nodes, parents), parents)
+
+    @staticmethod
+    def _find_producers(ordered_nodes: list[INode], requested_types: Iterable[type]) -> list[INode]:
+        producers: dict[int, INode] = { }
+        for requested_type in requested_types:
+            type_producers = [node for node in ordered_nodes if requested_type in getattr(node, "output_types", ())]
+            if not type_producers:
+                raise ValueError(f"No node in the graph declares {requested_type.__name__} as output type")
+            producers.update((id(producer), producer) for producer in type_producers)
+        if not producers:
+            raise ValueError("At least one type must be requested")
+        return list(producers.values())
+
+    def _collect_nodes(self, sinks: list[INode]) -> tuple[list[INode], dict[int, list[INode]]]:
+        # Iterative depth first search, nodes are ordered after all of their parents.
+        # A node that is reached again while it is on the current path closes a cycle.
+        ordered_nodes: list[INode] = []
+        parents: dict[int, list[INode]] = { }
+        path: list[INode] = []
+        path_node_ids: set[int] = set()
+        stack: list[tuple[INode, bool]] = [(sink, False) for sink in reversed(sinks)]
+        while stack:
+            node, is_finished = stack.pop()
+            if is_finished:
+                path_node_ids.discard(id(path.pop()))
+                ordered_nodes.append(node)
+                continue
+            if id(node) in path_node_ids:
+                cycle = path[[id(path_node) for path_node in path].index(id(node)):] + [node]
+                raise GraphCycleError(f"Graph contains a cycle: {" -> ".join(type(n).__name__ for n in cycle)}")
+            if id(node) in parents:
+                continue
+            node_parents = list({id(parent): parent for parent in getattr(node, "parents", [])}.values())
+            parents[id(node)] = node_parents
+            path.append(node)
+            path_node_ids.add(id(node))
+            stack.append((node, True))
+            stack.extend((parent, False) for parent in reversed(node_parents))
+        return ordered_nodes, parents
+
+    def _build_waves(self, ordered_nodes: list[INode], parents: dict[int, list[INode]]) -> list[list[INode]]:
+        # A node runs in the wave after its deepest parent
+        levels: dict[int, int] = { }
+        waves: list[list[INode]] = []
+        for node in ordered_nodes:
+            level = levels[id(node)] = max((levels[id(parent)] + 1 for parent in parents[id(node)]), default=0)
+            if level == len(waves):
+                waves.append([])
+            waves[level].append(node)
+        return waves
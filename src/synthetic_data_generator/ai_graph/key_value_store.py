@@ -1,59 +1,137 @@
-from typing import Self
+import copy
+from abc import ABC, abstractmethod
+from typing import Optional, Self
 
+import numpy as np
 
-class KeyValueStore:
-    def __init__(self, *values: any):
-        self.storage: dict[str, any] = { }
+
+class BaseKeyValueStore(ABC):
+    # Subclasses decide how a value type is turned into its storage key
+    __slots__ = ("storage", "rng", "_copy_on_write", "_is_shared", "_origins")
+
+    def __init__(self, *values: any, copy_on_write: bool = False, rng: Optional[np.random.Generator] = None):
+        self.storage: dict[any, any] = { }
+        self.rng = rng
+        self._copy_on_write = copy_on_write
+        self._is_shared = False
+        # Save each stored value comes from, forks inherit it. A merge keeps values inherited from a common
+        # ancestor once, e.g. in a diamond-shaped graph, and combines values saved independently.
+        self._origins: dict[any, object] = { }
         self.save(*values)
 
     def __contains__(self, key: type) -> bool:
         if not isinstance(key, type):
             raise ValueError(f"Key must be a type, not {type(key).__name__}")
-        return key.__name__ in self.storage
+        return self._get_key(key) in self.storage
+
+    @property
+    def copy_on_write(self) -> bool:
+        return self._copy_on_write
+
+    def fork(self) -> Self:
+        # In copy-on-write mode forks share the stored values, which therefore must not be mutated in place.
+        # The random number generator of a sample is always shared.
+        forked_store = type(self)(copy_on_write=self._copy_on_write, rng=self.rng)
+        if not self._copy_on_write:
+            forked_store.storage = copy.deepcopy(self.storage)
+            forked_store._origins = dict(self._origins)
+            return forked_store
+        forked_store.storage = self.storage
+        forked_store._origins = self._origins
+        forked_store._is_shared = self._is_shared = True
+        return forked_store
 
     def save(self, *values: any) -> None:
         for value in values:
-            key = type(value).__name__
+            key = self._get_key(type(value))
             self.save_by_key(key, value)
 
     def get(self, value_type: type) -> any:
-        key = value_type.__name__
+        key = self._get_key(value_type)
         return self.get_by_key(key)
 
-    def save_by_key(self, key: str, value: any) -> None:
+    def save_by_key(self, key: any, value: any) -> None:
         if key in self.storage:
             raise ValueError(f"Key {key} already exists in storage")
+        self._detach_shared_storage()
         self.storage[key] = value
+        self._origins[key] = object()
+
+    def restore(self, values: dict[any, any]) -> None:
+        # Replaces the stored values, e.g. with a stored node output. Values the store had before keep their origin.
+        self._origins = {key: self._origins.get(key) or object() for key in values}
+        self.storage = values
+        self._is_shared = False
 
-    def get_by_key(self, key: str) -> any:
+    def get_by_key(self, key: any) -> any:
         if key not in self.storage:
             raise KeyError(f"Key {key} not found in storage")
         return self.storage[key]
 
     def merge(self, *storages: Self) -> None:
         for storage in storages:
+            if storage.storage is self.storage:
+                continue
             for key, value in storage.storage.items():
+                origin = storage._origins.get(key)
                 if key not in self.storage:
+                    self._detach_shared_storage()
                     self.storage[key] = value
-                else:
+                    self._origins[key] = origin
+                elif origin is None or origin is not self._origins.get(key):
                     self._merge_value(key, value)
 
-    def _merge_value(self, key: str, value: any) -> None:
+    def _merge_value(self, key: any, value: any) -> None:
         stored_value = self.storage[key]
         if isinstance(stored_value, list) and isinstance(value, list):
-            stored_value += value
+            merged_value = stored_value + value
         elif isinstance(stored_value, set) and isinstance(value, set):
-            stored_value.update(value)
+            merged_value = stored_value | value
+        elif stored_value == value:
+            return
         else:
             raise ValueError(f"Conflict merging key {key}: incompatible types")
+        self._detach_shared_storage()
+        self.storage[key] = merged_value
+        self._origins[key] = object()
+
+    def _detach_shared_storage(self) -> None:
+        if self._is_shared:
+            self.storage = dict(self.storage)
+            self._origins = dict(self._origins)
+            self._is_shared = False
+
+    @staticmethod
+    @abstractmethod
+    def _get_key(value_type: type) -> any:
+        pass
+
+
+class KeyValueStore(BaseKeyValueStore):
+    # Keyed by type name, values of types with the same name from different modules share a key
+    @staticmethod
+    def _get_key(value_type: type) -> str:
+        return value_type.__name__
+
+
+class TypedKeyValueStore(BaseKeyValueStore):
+    # Keyed by the type itself, which avoids building the name on every access and name collisions between
+    # modules
+    __slots__ = ()
+
+    @staticmethod
+    def _get_key(value_type: type) -> type:
+        return value_type
 
 
 def inject_storage_objects(*types: type):
     def decorator(func):
-        def wrapper(self, shared_storage: KeyValueStore):
+        def wrapper(self, shared_storage: BaseKeyValueStore):
             loaded_types = [shared_storage.get(type_) for type_ in types]
             return func(self, shared_storage, *loaded_types)
 
+        # Lets callers request exactly these types from a graph, see GraphCompiler.compile
+        wrapper.injected_types = types
         return wrapper
 
     return decorator
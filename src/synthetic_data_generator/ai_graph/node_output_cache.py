@@ -0,0 +1,63 @@
+import hashlib
+import io
+import json
+import pickle
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+from src.synthetic_data_generator.ai_graph.key_value_store import BaseKeyValueStore
+
+
+def create_sample_fingerprint(storage: BaseKeyValueStore, sample_index: int) -> str:
+    # Sample generators are seeded by the run seed and the sample index, so their initial state identifies the
+    # sample across runs. Without a generator the sample index is all there is.
+    if storage.rng is None:
+        return str(sample_index)
+    return json.dumps(storage.rng.bit_generator.state, sort_keys=True, default=str)
+
+
+def create_node_fingerprint(config_fingerprint: str, sample_fingerprint: str, storage: BaseKeyValueStore) -> str:
+    # The input values are sorted by key, so the fingerprint does not depend on the order the parents finished in
+    input_values = sorted(storage.storage.items(), key=lambda item: str(item[0]))
+    buffer = io.BytesIO()
+    pickler = pickle.Pickler(buffer)
+    # Without the memo equal values pickle the same, no matter which of their objects are shared.
+    # Cyclic values raise a ValueError.
+    pickler.fast = True
+    pickler.dump((config_fingerprint, sample_fingerprint, input_values))
+    return hashlib.sha256(buffer.getvalue()).hexdigest()
+
+
+class NodeOutputCache:
+    # Outputs of memoized nodes keyed by their fingerprint, kept across runs. Worker processes open their own cache
+    # on the path.
+    def __init__(self, path: str | Path, timeout_seconds: float = 60):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, timeout=timeout_seconds, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS memoized_outputs ("
+                                 "fingerprint TEXT PRIMARY KEY, storage BLOB NOT NULL)")
+        self._connection.commit()
+
+    def load(self, fingerprint: str) -> Optional[dict[str, any]]:
+        with self._lock:
+            row = self._connection.execute("SELECT storage FROM memoized_outputs WHERE fingerprint = ?",
+                                           (fingerprint,)).fetchone()
+        return pickle.loads(row[0]) if row is not None else None
+
+    def save(self, fingerprint: str, storage_values: dict[str, any]) -> None:
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO memoized_outputs (fingerprint, storage) VALUES (?, ?)",
+                                     (fingerprint, pickle.dumps(storage_values)))
+            self._connection.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM memoized_outputs").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,13 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+
+
+class NodeOutputStore(ABC):
+    # Keeps the storage values a node produced for a sample, so that the node does not run again for it
+    @abstractmethod
+    def load_node_output(self, sample_index: int, node_key: str) -> Optional[dict[str, any]]:
+        pass
+
+    @abstractmethod
+    def save_node_output(self, sample_index: int, node_key: str, storage_values: dict[str, any]) -> None:
+        pass
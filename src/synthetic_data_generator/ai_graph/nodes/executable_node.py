@@ -1,15 +1,25 @@
 import asyncio
-import copy
+import hashlib
 import logging
+import time
 from abc import ABC, abstractmethod
+from contextvars import ContextVar
 from typing import Optional
 
+import numpy as np
+
 from src.synthetic_data_generator.ai_graph.key_value_store import KeyValueStore
+from src.synthetic_data_generator.ai_graph.tracing import Tracer, get_tracer, set_current_sample_index
+from src.synthetic_data_generator.random_generators.random_streams import get_sample_rng
+
+# Executions of a batch are keyed by the batch and the sample index, so that batches neither share executions
+# with each other nor with plain execute calls
+_current_batch: ContextVar[Optional[object]] = ContextVar("current_batch", default=None)
 
 
 class INode(ABC):
     @abstractmethod
-    async def execute(self, shared_storage: KeyValueStore) -> KeyValueStore:
+    async def execute(self, shared_storage: KeyValueStore, sample_index: int = 0) -> KeyValueStore:
         pass
 
     @abstractmethod
@@ -18,32 +28,127 @@ class INode(ABC):
 
 
 class ExecutableNode(INode, ABC):
-    def __init__(self, parents: list[INode]):
+    # Expensive nodes, like nodes calling an AI model, set this to store their output in a compiled graph's
+    # node output store, so that a resumed run does not execute them again
+    checkpoint_outputs: bool = False
+
+    def __init__(self, parents: list[INode], name: Optional[str] = None):
         self._parents = parents
-        self._has_execution_started = False
-        self._shared_storage_state: Optional[KeyValueStore] = None
+        # Tells apart nodes of the same class and config, e.g. in checkpoints
+        self.name = name
+        self._executions: dict[tuple[Optional[object], int], asyncio.Future] = { }
+
+    @property
+    def parents(self) -> list[INode]:
+        return self._parents
 
-    async def execute(self, shared_storage: KeyValueStore = None) -> KeyValueStore:
+    @property
+    def node_key(self) -> str:
+        # Identifies the node across runs, processes and pruned graphs, unlike its position in a graph
+        if self.name is not None:
+            return self.name
+        config_fingerprint = self.config_fingerprint
+        if config_fingerprint is None:
+            return type(self).__name__
+        return f"{type(self).__name__}:{hashlib.sha256(config_fingerprint.encode()).hexdigest()[:16]}"
+
+    @property
+    def output_types(self) -> tuple[type, ...]:
+        # Types of the values the node saves, used to prune graphs to the nodes needed for requested types
+        return ()
+
+    @property
+    def config_fingerprint(self) -> Optional[str]:
+        # Nodes returning a fingerprint of everything that affects their output, besides their input values, are
+        # memoized in a compiled graph's node output cache
+        return None
+
+    async def execute(self, shared_storage: KeyValueStore = None, sample_index: int = 0) -> KeyValueStore:
         logging.info(f"{self.__class__.__name__} Execute Function called")
 
-        while self._has_execution_started and self._shared_storage_state is None:
-            await asyncio.sleep(0.1)
-        if self._shared_storage_state is not None:
+        execution_key = _current_batch.get(), sample_index
+        execution = self._executions.get(execution_key)
+        is_first_caller = execution is None
+        if is_first_caller:
+            logging.info(f"{self.__class__.__name__} Executing")
+            # Runs in its own task, so that a cancelled caller does not cancel the execution for the other callers
+            execution = self._executions[execution_key] = asyncio.ensure_future(
+                self._execute_shared(shared_storage or KeyValueStore(), sample_index))
+            # The callers receive the exception, it is retrieved even if all of them were cancelled
+            execution.add_done_callback(lambda task: task.cancelled() or task.exception())
+        else:
             logging.info("Already Executed, Returning Changed State")
-            return self._shared_storage_state
+        updated_shared_storage, waiter_storage = await asyncio.shield(execution)
+        return updated_shared_storage if is_first_caller else waiter_storage
 
-        logging.info(f"{self.__class__.__name__} Executing")
-        self._has_execution_started = True
+    async def execute_batch(self, sample_count: int, shared_storage: KeyValueStore = None,
+                            max_concurrent_samples: Optional[int] = None,
+                            seed_sequence: Optional[np.random.SeedSequence] = None) -> list[KeyValueStore]:
         shared_storage = shared_storage or KeyValueStore()
+        semaphore = asyncio.Semaphore(max_concurrent_samples or sample_count or 1)
+        batch = object()
+
+        async def execute_sample(sample_index: int) -> KeyValueStore:
+            # Runs in its own task, the batch is only set for the executions of this sample
+            _current_batch.set(batch)
+            sample_storage = shared_storage.fork()
+            if seed_sequence is not None:
+                sample_storage.rng = get_sample_rng(seed_sequence, sample_index)
+            async with semaphore:
+                try:
+                    return await self.execute(sample_storage, sample_index)
+                finally:
+                    self.release_sample(sample_index)
+
+        return list(await asyncio.gather(*(execute_sample(sample_index) for sample_index in range(sample_count))))
+
+    async def _execute_shared(self, shared_storage: KeyValueStore,
+                              sample_index: int) -> tuple[KeyValueStore, KeyValueStore]:
+        # The first caller takes the updated storage, the other callers share a fork of it
+        updated_shared_storage = await self._execute_with_parents(shared_storage, sample_index)
+        return updated_shared_storage, updated_shared_storage.fork()
+
+    def release_sample(self, sample_index: int) -> None:
+        visited_node_ids = set()
+        nodes: list[INode] = [self]
+        while nodes:
+            node = nodes.pop()
+            if id(node) in visited_node_ids or not isinstance(node, ExecutableNode):
+                continue
+            visited_node_ids.add(id(node))
+            node._executions.pop((_current_batch.get(), sample_index), None)
+            nodes.extend(node.parents)
+
+    async def _execute_with_parents(self, shared_storage: KeyValueStore, sample_index: int) -> KeyValueStore:
+        set_current_sample_index(sample_index)
+        tracer = get_tracer()
+        if tracer is not None:
+            return await self._execute_with_parents_traced(shared_storage, sample_index, tracer)
+
         parent_node_tasks = []
         for parent in self._parents:
-            parent_node_tasks.append(parent.execute(copy.deepcopy(shared_storage)))
+            parent_node_tasks.append(parent.execute(shared_storage.fork(), sample_index))
         parent_storages = list(await asyncio.gather(*parent_node_tasks))
         shared_storage.merge(*parent_storages)
 
-        updated_shared_storage = await self._execute_node(shared_storage)
-        self._shared_storage_state = copy.deepcopy(updated_shared_storage)
-        return updated_shared_storage
+        return await self._execute_node(shared_storage)
+
+    async def _execute_with_parents_traced(self, shared_storage: KeyValueStore, sample_index: int,
+                                           tracer: Tracer) -> KeyValueStore:
+        start_seconds = time.perf_counter()
+        parent_storage_copies = [shared_storage.fork() for _ in self._parents]
+        fork_end_seconds = time.perf_counter()
+        parent_storages = list(await asyncio.gather(*(parent.execute(parent_storage_copy, sample_index)
+                                                      for parent, parent_storage_copy in
+                                                      zip(self._parents, parent_storage_copies))))
+        merge_start_seconds = time.perf_counter()
+        shared_storage.merge(*parent_storages)
+        merge_end_seconds = time.perf_counter()
+
+        with tracer.span(type(self).__name__, "node", sample_index=sample_index,
+                         parent_wait_seconds=merge_start_seconds - fork_end_seconds,
+                         storage_seconds=fork_end_seconds - start_seconds + merge_end_seconds - merge_start_seconds):
+            return await self._execute_node(shared_storage)
 
     @abstractmethod
     async def _execute_node(self, shared_storage: KeyValueStore) -> KeyValueStore:
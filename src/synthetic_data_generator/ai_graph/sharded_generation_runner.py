@@ -0,0 +1,191 @@
+import asyncio
+import heapq
+import logging
+import multiprocessing
+import os
+import queue
+import traceback
+from itertools import chain
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+
+from src.synthetic_data_generator.ai_graph.generation_checkpoint import GenerationCheckpoint
+from src.synthetic_data_generator.ai_graph.graph_compiler import CompiledGraph, GraphCompiler
+from src.synthetic_data_generator.ai_graph.key_value_store import KeyValueStore
+from src.synthetic_data_generator.ai_graph.node_output_cache import NodeOutputCache
+from src.synthetic_data_generator.ai_graph.nodes.executable_node import INode
+from src.synthetic_data_generator.random_generators.random_streams import get_sample_seed_sequence
+from synthetic_data_generator.ai_graph.ai.base_ai_analysis import AnalyzerSnapshot, AssistantAnalyzer, JobCostLimit
+from synthetic_data_generator.ai_graph.ai.text_stream import wait_for_text_streams
+
+_RESULTS = "results"
+_DONE = "done"
+_ERROR = "error"
+
+
+class ShardedGenerationError(Exception):
+    pass
+
+
+def _build_compiled_graph(graph_factory: Callable[[], CompiledGraph | INode]) -> CompiledGraph:
+    graph = graph_factory()
+    if isinstance(graph, CompiledGraph):
+        return graph
+    return GraphCompiler().compile(graph)
+
+
+async def _generate_chunk(compiled_graph: CompiledGraph, shared_storage: KeyValueStore,
+                          seed_sequence: np.random.SeedSequence, sample_indices: list[int],
+                          max_concurrent_samples: int,
+                          checkpoint: Optional[GenerationCheckpoint] = None) -> list[tuple[int, KeyValueStore]]:
+    semaphore = asyncio.Semaphore(max_concurrent_samples)
+
+    async def generate_sample(sample_index: int) -> tuple[int, KeyValueStore]:
+        sample_seed_sequence = get_sample_seed_sequence(seed_sequence, sample_index)
+        sample_storage = shared_storage.fork()
+        sample_storage.rng = np.random.default_rng(sample_seed_sequence)
+        async with semaphore:
+            storage = await compiled_graph.execute(sample_storage, sample_index)
+            await wait_for_text_streams(storage.storage.values())
+        # The generator state is not part of the sample and would only bloat the result message
+        storage.rng = None
+        if checkpoint is not None:
+            await asyncio.to_thread(checkpoint.save_sample, sample_index, sample_seed_sequence, storage)
+        return sample_index, storage
+
+    return list(await asyncio.gather(*(generate_sample(sample_index) for sample_index in sample_indices)))
+
+
+def _run_worker(worker_id: int, graph_factory: Callable[[], CompiledGraph | INode],
+                shared_storage_factory: Callable[[], KeyValueStore], seed_sequence: np.random.SeedSequence,
+                chunk_queue, result_queue, max_concurrent_samples: int,
+                job_cost_limit: Optional[JobCostLimit], checkpoint_path: Optional[Path],
+                node_output_cache_path: Optional[Path] = None) -> None:
+    checkpoint = GenerationCheckpoint(checkpoint_path) if checkpoint_path is not None else None
+    node_output_cache = NodeOutputCache(node_output_cache_path) if node_output_cache_path is not None else None
+    try:
+        assistant_analyzer = AssistantAnalyzer()
+        assistant_analyzer.reset()
+        assistant_analyzer.set_job_cost_limit(job_cost_limit)
+        compiled_graph = _build_compiled_graph(graph_factory)
+        compiled_graph.node_output_store = checkpoint
+        compiled_graph.node_output_cache = node_output_cache
+        shared_storage = shared_storage_factory()
+
+        async def generate_chunks():
+            while (chunk := chunk_queue.get()) is not None:
+                results = await _generate_chunk(compiled_graph, shared_storage, seed_sequence, chunk,
+                                                max_concurrent_samples, checkpoint)
+                result_queue.put((_RESULTS, worker_id, results))
+
+        asyncio.run(generate_chunks())
+        result_queue.put((_DONE, worker_id, assistant_analyzer.snapshot().to_dict()))
+    except BaseException:
+        result_queue.put((_ERROR, worker_id, traceback.format_exc()))
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+        if node_output_cache is not None:
+            node_output_cache.close()
+
+
+class ShardedGenerationRunner:
+    # Each worker process builds its own graph with graph_factory and runs it on its own event loop.
+    # Samples are seeded by their index, so the output does not depend on the number of workers as long as
+    # graph_factory builds the same graph in every worker, e.g. with a seeded RandomCollectionFactory.
+    def __init__(self, graph_factory: Callable[[], CompiledGraph | INode], worker_count: Optional[int] = None,
+                 chunk_size: int = 64, max_concurrent_samples: Optional[int] = None,
+                 shared_storage_factory: Callable[[], KeyValueStore] = KeyValueStore,
+                 job_cost_limit: Optional[JobCostLimit] = None, mp_context=None,
+                 result_poll_interval_seconds: float = 1.0, checkpoint_path: Optional[str | Path] = None,
+                 node_output_cache_path: Optional[str | Path] = None):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        self.graph_factory = graph_factory
+        self.worker_count = worker_count or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.max_concurrent_samples = max_concurrent_samples or chunk_size
+        self.shared_storage_factory = shared_storage_factory
+        self.job_cost_limit = job_cost_limit
+        self._mp_context = mp_context or multiprocessing.get_context()
+        self._result_poll_interval_seconds = result_poll_interval_seconds
+        # With a checkpoint, samples completed by an earlier run are read from it instead of being generated again
+        self.checkpoint_path = Path(checkpoint_path) if checkpoint_path is not None else None
+        # With a node output cache, a new run with the same seed only executes nodes whose configuration or inputs
+        # changed since an earlier run
+        self.node_output_cache_path = Path(node_output_cache_path) if node_output_cache_path is not None else None
+
+    def run(self, sample_count: int, seed_sequence: Optional[np.random.SeedSequence] = None,
+            ordered: bool = True) -> Iterator[tuple[int, KeyValueStore]]:
+        checkpoint = GenerationCheckpoint(self.checkpoint_path) if self.checkpoint_path is not None else None
+        completed_sample_indices = set()
+        if checkpoint is not None:
+            seed_sequence = checkpoint.resolve_run_seed_sequence(seed_sequence)
+            completed_sample_indices = {sample_index for sample_index in checkpoint.completed_sample_indices()
+                                        if sample_index < sample_count}
+        seed_sequence = seed_sequence or np.random.SeedSequence()
+        pending_sample_indices = [sample_index for sample_index in range(sample_count)
+                                  if sample_index not in completed_sample_indices]
+        chunk_queue = self._mp_context.Queue()
+        result_queue = self._mp_context.Queue()
+        for chunk_start in range(0, len(pending_sample_indices), self.chunk_size):
+            chunk_queue.put(pending_sample_indices[chunk_start:chunk_start + self.chunk_size])
+        worker_count = max(1, min(self.worker_count, -(-len(pending_sample_indices) // self.chunk_size)))
+        for _ in range(worker_count):
+            chunk_queue.put(None)
+
+        workers = [
+            self._mp_context.Process(target=_run_worker, daemon=True,
+                                     args=(worker_id, self.graph_factory, self.shared_storage_factory, seed_sequence,
+                                           chunk_queue, result_queue, self.max_concurrent_samples,
+                                           self.job_cost_limit, self.checkpoint_path, self.node_output_cache_path))
+            for worker_id in range(worker_count)]
+        for worker in workers:
+            worker.start()
+        logging.info(f"Generating {len(pending_sample_indices)} of {sample_count} samples "
+                     f"in {worker_count} worker processes")
+
+        try:
+            results = self._receive_results(workers, result_queue)
+            if completed_sample_indices:
+                results = chain(checkpoint.load_samples(completed_sample_indices,
+                                                        storage_factory=self.shared_storage_factory), results)
+            yield from self._order_results(results) if ordered else results
+        finally:
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+                worker.join()
+            if checkpoint is not None:
+                checkpoint.close()
+
+    def _receive_results(self, workers: list, result_queue) -> Iterator[tuple[int, KeyValueStore]]:
+        running_worker_ids = set(range(len(workers)))
+        while running_worker_ids:
+            try:
+                message_type, worker_id, payload = result_queue.get(timeout=self._result_poll_interval_seconds)
+            except queue.Empty:
+                if not any(workers[worker_id].is_alive() for worker_id in running_worker_ids):
+                    raise ShardedGenerationError("Worker processes exited without finishing their samples")
+                continue
+            if message_type == _RESULTS:
+                yield from payload
+            elif message_type == _DONE:
+                running_worker_ids.discard(worker_id)
+                AssistantAnalyzer().merge_snapshot(AnalyzerSnapshot.from_dict(payload))
+            else:
+                raise ShardedGenerationError(f"Worker {worker_id} failed:\n{payload}")
+
+    @staticmethod
+    def _order_results(results: Iterator[tuple[int, KeyValueStore]]) -> Iterator[tuple[int, KeyValueStore]]:
+        # Buffers results that finished early until all samples before them have been yielded
+        pending_results: list[tuple[int, KeyValueStore]] = []
+        next_sample_index = 0
+        for result in results:
+            heapq.heappush(pending_results, result)
+            while pending_results and pending_results[0][0] == next_sample_index:
+                _, ready_storage = heapq.heappop(pending_results)
+                yield next_sample_index, ready_storage
+                next_sample_index += 1
@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+_current_sample_index: ContextVar[int] = ContextVar("current_sample_index", default=0)
+
+
+@dataclass
+class Span:
+    name: str
+    category: str
+    start_seconds: float
+    duration_seconds: float
+    sample_index: int
+    attributes: dict[str, any] = field(default_factory=dict)
+
+
+class Tracer:
+    # Records spans in memory, instrumented code checks get_tracer() and does nothing while no tracer is set
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._origin_seconds = time.perf_counter()
+        self._spans: list[Span] = []
+        self._instant_events: list[Span] = []
+
+    @property
+    def spans(self) -> list[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    @property
+    def instant_events(self) -> list[Span]:
+        with self._lock:
+            return list(self._instant_events)
+
+    def record_span(self, name: str, category: str, start_seconds: float, end_seconds: float,
+                    **attributes) -> None:
+        span = Span(name=name, category=category, start_seconds=start_seconds - self._origin_seconds,
+                    duration_seconds=end_seconds - start_seconds, sample_index=_current_sample_index.get(),
+                    attributes=attributes)
+        with self._lock:
+            self._spans.append(span)
+
+    def record_instant_event(self, name: str, category: str, **attributes) -> None:
+        event = Span(name=name, category=category, start_seconds=time.perf_counter() - self._origin_seconds,
+                     duration_seconds=0, sample_index=_current_sample_index.get(), attributes=attributes)
+        with self._lock:
+            self._instant_events.append(event)
+
+    @contextmanager
+    def span(self, name: str, category: str, **attributes):
+        # Attributes added to the yielded dict while the span is open are recorded with it
+        start_seconds = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            self.record_span(name, category, start_seconds, time.perf_counter(), **attributes)
+
+    def to_chrome_trace(self) -> dict:
+        # Chrome trace event format, samples are shown as threads of the generating process
+        process_id = os.getpid()
+        trace_events = [{"name": span.name, "cat": span.category, "ph": "X", "ts": span.start_seconds * 1e6,
+                         "dur": span.duration_seconds * 1e6, "pid": process_id, "tid": span.sample_index,
+                         "args": span.attributes} for span in self.spans]
+        trace_events.extend({"name": event.name, "cat": event.category, "ph": "i", "s": "t",
+                             "ts": event.start_seconds * 1e6, "pid": process_id, "tid": event.sample_index,
+                             "args": event.attributes} for event in self.instant_events)
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path: str | Path) -> None:
+        Path(path).write_text(json.dumps(self.to_chrome_trace(), default=str))
+
+
+_tracer: Optional[Tracer] = None
+
+
+def set_tracer(tracer: Optional[Tracer]) -> None:
+    global _tracer
+    _tracer = tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+def set_current_sample_index(sample_index: int) -> None:
+    # Spans recorded and requests sent by the current task and the tasks it starts belong to this sample
+    _current_sample_index.set(sample_index)
+
+
+def get_current_sample_index() -> int:
+    return _current_sample_index.get()
@@ -1,10 +1,21 @@
 import logging
 import math
 from abc import ABC
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Optional
 
 import numpy as np
 
+# Coefficients of Acklam's rational approximation of the inverse normal CDF, with a relative error below 1.2e-9
+_CENTRAL_NUMERATOR = [-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02, 1.383577518672690e+02,
+                      -3.066479806614716e+01, 2.506628277459239e+00]
+_CENTRAL_DENOMINATOR = [-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02, 6.680131188771972e+01,
+                        -1.328068155288572e+01, 1]
+_TAIL_NUMERATOR = [-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00, -2.549732539343734e+00,
+                   4.374664141464968e+00, 2.938163982698783e+00]
+_TAIL_DENOMINATOR = [7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00, 3.754408661907416e+00, 1]
+_LOWER_TAIL_PROBABILITY = 0.02425
+
 
 class NumberInterval:
     def __init__(self, lower_bound: float, upper_bound: float):
@@ -27,11 +38,22 @@ class NumberGenerator(ABC):
     def generate_bounded_number(self, mean: float, standard_deviation: float, number_bounds: NumberInterval) -> int:
         pass
 
+    def generate_bounded_numbers(self, amount: int, mean: float, standard_deviation: float,
+                                 number_bounds: NumberInterval) -> np.ndarray:
+        return np.array([self.generate_bounded_number(mean, standard_deviation, number_bounds) for _ in range(amount)],
+                        dtype=np.int64)
+
 
 @dataclass
 class NormalizedNumberGenerator(NumberGenerator):
+    rng: Optional[np.random.Generator] = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.rng is None:
+            self.rng = np.random.default_rng()
+
     def _generate_random_normal_distribution_number(self, mean, standard_deviation) -> int:
-        return round(np.random.normal(mean, standard_deviation))
+        return round(self.rng.normal(mean, standard_deviation))
 
     def generate_bounded_number(self, mean: float, standard_deviation: float, number_bounds: NumberInterval) -> int:
         number = self._generate_random_normal_distribution_number(mean, standard_deviation)
@@ -40,6 +62,72 @@ class NormalizedNumberGenerator(NumberGenerator):
         return number
 
 
+@dataclass
+class TruncatedNormalNumberGenerator(NumberGenerator):
+    # Inverse CDF sampling of the normal distribution truncated to the bounds, one uniform draw per number.
+    # Rounded results follow the same distribution as rejection sampling rounded normal numbers.
+    rng: Optional[np.random.Generator] = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.rng is None:
+            self.rng = np.random.default_rng()
+
+    def generate_bounded_number(self, mean: float, standard_deviation: float, number_bounds: NumberInterval) -> int:
+        return int(self.generate_bounded_numbers(1, mean, standard_deviation, number_bounds)[0])
+
+    def generate_bounded_numbers(self, amount: int, mean: float, standard_deviation: float,
+                                 number_bounds: NumberInterval) -> np.ndarray:
+        lowest_number = math.ceil(number_bounds.lower_bound)
+        highest_number = math.floor(number_bounds.upper_bound)
+        if lowest_number > highest_number:
+            raise ValueError(f"No integer between {number_bounds.lower_bound} and {number_bounds.upper_bound}")
+        if standard_deviation <= 0:
+            return np.full(amount, min(max(round(mean), lowest_number), highest_number), dtype=np.int64)
+
+        lower_z = (lowest_number - 0.5 - mean) / standard_deviation
+        upper_z = (highest_number + 0.5 - mean) / standard_deviation
+        numbers = mean + standard_deviation * self._generate_truncated_standard_normal(amount, lower_z, upper_z)
+        return np.clip(np.rint(numbers), lowest_number, highest_number).astype(np.int64)
+
+    def _generate_truncated_standard_normal(self, amount: int, lower_z: float, upper_z: float) -> np.ndarray:
+        # Sampling is done in the lower tail, where the cumulative distribution is precise
+        is_mirrored = lower_z > 0
+        if is_mirrored:
+            lower_z, upper_z = -upper_z, -lower_z
+        lower_probability = self._standard_normal_cdf(lower_z)
+        upper_probability = self._standard_normal_cdf(upper_z)
+
+        if upper_probability > lower_probability:
+            probabilities = self.rng.uniform(lower_probability, upper_probability, amount)
+            probabilities = np.clip(probabilities, np.finfo(float).tiny, 1 - np.finfo(float).eps)
+            numbers = self._standard_normal_inverse_cdf(probabilities)
+        else:
+            # Far in the tail the truncated normal distribution converges to an exponential distribution
+            rate = -upper_z
+            interval_probability = -math.expm1(-rate * (upper_z - lower_z))
+            numbers = upper_z + np.log1p(-self.rng.random(amount) * interval_probability) / rate
+        return -numbers if is_mirrored else numbers
+
+    def _standard_normal_cdf(self, z: float) -> float:
+        return 0.5 * math.erfc(-z / math.sqrt(2))
+
+    def _standard_normal_inverse_cdf(self, probabilities: np.ndarray) -> np.ndarray:
+        # The upper tail is the mirrored lower tail, probabilities must be strictly between 0 and 1
+        tail_probabilities = np.minimum(probabilities, 1 - probabilities)
+        is_tail = tail_probabilities < _LOWER_TAIL_PROBABILITY
+        numbers = np.empty_like(probabilities)
+
+        centered = probabilities[~is_tail] - 0.5
+        squared = centered * centered
+        numbers[~is_tail] = (centered * np.polyval(_CENTRAL_NUMERATOR, squared)
+                             / np.polyval(_CENTRAL_DENOMINATOR, squared))
+
+        tail_scale = np.sqrt(-2 * np.log(tail_probabilities[is_tail]))
+        tail_numbers = np.polyval(_TAIL_NUMERATOR, tail_scale) / np.polyval(_TAIL_DENOMINATOR, tail_scale)
+        numbers[is_tail] = np.where(probabilities[is_tail] < 0.5, tail_numbers, -tail_numbers)
+        return numbers
+
+
 @dataclass
 class NumberIntervalGenerator:
     def __init__(self, mean: float, lower_number_generator: NumberGenerator, standard_deviation: float,
@@ -61,3 +149,11 @@ class NumberIntervalGenerator:
         upper_bound = self._generate_upper_bound(lower_bound)
         logging.info(f"Generated number interval: {lower_bound}, {upper_bound}")
         return NumberInterval(lower_bound=lower_bound, upper_bound=upper_bound)
+
+    def generate_multiple_bounds(self, amount: int) -> list[NumberInterval]:
+        lower_bounds = self.lower_number_generator.generate_bounded_numbers(amount, self.mean, self.standard_deviation,
+                                                                            self.lower_number_bounds)
+        upper_bound_factors = np.log2(np.maximum(2, np.abs(lower_bounds)))
+        upper_bounds = np.rint(lower_bounds + self.min_upper_bound_difference * upper_bound_factors)
+        return [NumberInterval(lower_bound=int(lower_bound), upper_bound=int(upper_bound)) for lower_bound, upper_bound
+                in zip(lower_bounds, upper_bounds)]
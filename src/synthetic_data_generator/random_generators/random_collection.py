@@ -1,7 +1,10 @@
-import random
-from dataclasses import dataclass
+from bisect import bisect
+from dataclasses import dataclass, field
 from enum import Enum
-from random import choices
+from itertools import accumulate
+from typing import Optional
+
+import numpy as np
 
 from src.synthetic_data_generator.random_generators.random_collection_interface import IRandom
 
@@ -11,19 +14,44 @@ class RandomCollection[V](IRandom):
     values: list[V]
     weights: list[float]
     randomization_factor: float = 1.5
+    rng: Optional[np.random.Generator] = field(default=None, repr=False, compare=False)
 
     def __post_init__(self):
+        # Without a generator the weights are randomized differently in every run
+        self._is_reproducible = self.rng is not None or self.randomization_factor == 1
+        if self.rng is None:
+            self.rng = np.random.default_rng()
         self._randomize_weights()
+        self._cumulative_weights = list(accumulate(self.weights))
+        self._value_array = np.fromiter(self.values, dtype=object, count=len(self.values))
+
+    @property
+    def is_reproducible(self) -> bool:
+        return self._is_reproducible
+
+    def get_random_value(self, excluding: list = None, rng: Optional[np.random.Generator] = None) -> V:
+        if excluding:
+            return self.sample(1, excluding=excluding, rng=rng)[0]
+        random_weight = (rng or self.rng).random() * self._cumulative_weights[-1]
+        return self.values[bisect(self._cumulative_weights, random_weight, 0, len(self.values) - 1)]
+
+    def sample(self, amount: int, excluding: list = None, rng: Optional[np.random.Generator] = None) -> list[V]:
+        cumulative_weights = self._get_cumulative_weights(excluding)
+        if amount > 0 and cumulative_weights[-1] <= 0:
+            raise ValueError("No value with a positive weight is left to sample from")
+        random_weights = (rng or self.rng).random(amount) * cumulative_weights[-1]
+        indices = np.searchsorted(cumulative_weights, random_weights, side="right")
+        return self._value_array[indices].tolist()
 
-    def get_random_value(self, excluding: list = None) -> V:
-        excluding = excluding or []
-        result = choices(self.values, weights=self.weights)[0]
-        while result in excluding:
-            result = choices(self.values, weights=self.weights)[0]
-        return result
+    def _get_cumulative_weights(self, excluding: list = None) -> np.ndarray:
+        if not excluding:
+            return np.asarray(self._cumulative_weights)
+        weights = np.asarray(self.weights, dtype=float)
+        weights[[value in excluding for value in self.values]] = 0
+        return np.cumsum(weights)
 
     def _get_random_value_between(self, min_value: float, max_value: float) -> float:
-        return min_value + (max_value - min_value) * random.random()
+        return min_value + (max_value - min_value) * self.rng.random()
 
     def _randomize_weights(self):
         self.weights = [
@@ -31,12 +59,72 @@ class RandomCollection[V](IRandom):
             for weight in self.weights]
 
 
+@dataclass
+class AliasRandomCollection[V](RandomCollection[V]):
+    # Walker/Vose alias method: constant time per draw, independent of the number of values
+    def __post_init__(self):
+        super().__post_init__()
+        self._probabilities, self._aliases = self._build_alias_table()
+        self._probability_array = np.asarray(self._probabilities)
+        self._alias_array = np.asarray(self._aliases)
+
+    def get_random_value(self, excluding: list = None, rng: Optional[np.random.Generator] = None) -> V:
+        if excluding:
+            return super().get_random_value(excluding, rng=rng)
+        # The integer part of one uniform draw selects the column, the fractional part decides for the alias
+        scaled_random_value = (rng or self.rng).random() * len(self.values)
+        index = int(scaled_random_value)
+        if scaled_random_value - index >= self._probabilities[index]:
+            index = self._aliases[index]
+        return self.values[index]
+
+    def sample(self, amount: int, excluding: list = None, rng: Optional[np.random.Generator] = None) -> list[V]:
+        if excluding:
+            return super().sample(amount, excluding=excluding, rng=rng)
+        rng = rng or self.rng
+        indices = rng.integers(0, len(self.values), amount)
+        use_alias = rng.random(amount) >= self._probability_array[indices]
+        indices = np.where(use_alias, self._alias_array[indices], indices)
+        return self._value_array[indices].tolist()
+
+    def _build_alias_table(self) -> tuple[list[float], list[int]]:
+        value_count = len(self.weights)
+        total_weight = sum(self.weights)
+        if total_weight <= 0:
+            raise ValueError("At least one value must have a positive weight")
+        scaled_weights = [weight * value_count / total_weight for weight in self.weights]
+        probabilities = [1.0] * value_count
+        aliases = list(range(value_count))
+        small = [index for index, weight in enumerate(scaled_weights) if weight < 1]
+        large = [index for index, weight in enumerate(scaled_weights) if weight >= 1]
+        while small and large:
+            small_index, large_index = small.pop(), large.pop()
+            probabilities[small_index] = scaled_weights[small_index]
+            aliases[small_index] = large_index
+            scaled_weights[large_index] -= 1 - scaled_weights[small_index]
+            if scaled_weights[large_index] < 1:
+                small.append(large_index)
+            else:
+                large.append(large_index)
+        return probabilities, aliases
+
+
 class RandomCollectionFactory:
+    def __init__(self, alias_method_threshold: int = 1000, seed_sequence: Optional[np.random.SeedSequence] = None):
+        self.alias_method_threshold = alias_method_threshold
+        self.seed_sequence = seed_sequence
+
     def build_from_enum(self, enum_type: type[Enum]):
-        return RandomCollection[enum_type](list(enum_type), [1 for _ in range(len(enum_type))])
+        return self._build(list(enum_type), [1 for _ in range(len(enum_type))])
 
     def build_from_value_weight_dict[V](self, value_weight_dict: dict[V, float]):
-        return RandomCollection[V](list(value_weight_dict.keys()), list(value_weight_dict.values()))
+        return self._build(list(value_weight_dict.keys()), list(value_weight_dict.values()))
 
     def build_from_list_of_values[V](self, values: list[V]):
-        return RandomCollection[V](values, [1 for _ in range(len(values))])
+        return self._build(values, [1 for _ in range(len(values))])
+
+    def _build[V](self, values: list[V], weights: list[float]) -> RandomCollection[V]:
+        rng = np.random.default_rng(self.seed_sequence.spawn(1)[0]) if self.seed_sequence is not None else None
+        if len(values) >= self.alias_method_threshold:
+            return AliasRandomCollection[V](values, weights, rng=rng)
+        return RandomCollection[V](values, weights, rng=rng)
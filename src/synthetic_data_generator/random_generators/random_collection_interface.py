@@ -1,7 +1,15 @@
 import abc
+from typing import Optional
+
+import numpy as np
 
 
 class IRandom[V](abc.ABC):
     @abc.abstractmethod
-    def get_random_value(self, *args, **kwargs) -> V:
+    def get_random_value(self, *args, rng: Optional[np.random.Generator] = None, **kwargs) -> V:
         pass
+
+    @property
+    def is_reproducible(self) -> bool:
+        # Whether an equal generator is built in every run, only then are the values of its nodes memoized
+        return False
@@ -0,0 +1,26 @@
+import hashlib
+from typing import Optional
+
+import numpy as np
+
+
+def get_sample_seed_sequence(seed_sequence: np.random.SeedSequence, sample_index: int) -> np.random.SeedSequence:
+    # Same as the sample_index-th child of seed_sequence.spawn, without spawning all children before it
+    return np.random.SeedSequence(seed_sequence.entropy, spawn_key=(*seed_sequence.spawn_key, sample_index),
+                                  pool_size=seed_sequence.pool_size)
+
+
+def get_sample_rng(seed_sequence: np.random.SeedSequence, sample_index: int) -> np.random.Generator:
+    return np.random.default_rng(get_sample_seed_sequence(seed_sequence, sample_index))
+
+
+def get_node_rng(sample_rng: Optional[np.random.Generator], node_key: str) -> Optional[np.random.Generator]:
+    # Every node draws from its own child stream of the sample, so its values neither depend on the order in which
+    # the nodes of a sample run nor on which other nodes run at all
+    sample_seed_sequence = getattr(sample_rng.bit_generator, "seed_seq", None) if sample_rng is not None else None
+    if not isinstance(sample_seed_sequence, np.random.SeedSequence):
+        return sample_rng
+    node_hash = int.from_bytes(hashlib.sha256(node_key.encode()).digest()[:8], "little")
+    return np.random.default_rng(np.random.SeedSequence(
+        sample_seed_sequence.entropy, spawn_key=(*sample_seed_sequence.spawn_key, node_hash),
+        pool_size=sample_seed_sequence.pool_size))
@@ -1,16 +1,37 @@
+import logging
 from enum import Enum
+from functools import cached_property
+from typing import Optional
 
 from src.synthetic_data_generator.ai_graph.key_value_store import KeyValueStore
 from src.synthetic_data_generator.ai_graph.nodes.executable_node import ExecutableNode
 from src.synthetic_data_generator.random_generators.random_collection_interface import IRandom
+from src.synthetic_data_generator.random_generators.random_streams import get_node_rng
 
 
 class RandomCollectionNode[V: Enum](ExecutableNode):
-    def __init__(self, value_type: type, parents, random_generator: IRandom):
+    def __init__(self, value_type: type, parents, random_generator: IRandom, name: Optional[str] = None):
         self.value_type = value_type
         self.random_generator = random_generator
-        super().__init__(parents)
+        super().__init__(parents, name)
+
+    @property
+    def output_types(self) -> tuple[type, ...]:
+        return self.value_type,
+
+    @property
+    def node_key(self) -> str:
+        if self.name is not None:
+            return self.name
+        return f"{type(self).__name__}:{self.value_type.__qualname__}"
+
+    @cached_property
+    def config_fingerprint(self) -> Optional[str]:
+        if not self.random_generator.is_reproducible:
+            logging.warning(f"Not memoizing {self.node_key}, its generator is not seeded")
+            return None
+        return f"{self.node_key}:{self.random_generator!r}"
 
     async def _execute_node(self, shared_storage: KeyValueStore) -> KeyValueStore:
-        shared_storage.save(self.random_generator.get_random_value())
+        shared_storage.save(self.random_generator.get_random_value(rng=get_node_rng(shared_storage.rng, self.node_key)))
         return shared_storage
@@ -1,9 +1,11 @@
 import abc
 from dataclasses import dataclass, fields
 from enum import Enum
-from typing import get_type_hints
+from typing import Optional, get_type_hints
 
-from src.synthetic_data_generator.random_generators.random_collection import RandomCollectionFactory
+import numpy as np
+
+from src.synthetic_data_generator.random_generators.random_collection import RandomCollection
 
 
 class ComparableEnum(Enum):
@@ -29,8 +31,9 @@ class RandomDescriptionModel(InputModel, ComparableEnum):
         self.descriptions = descriptions
         super().__init__(value)
 
-    def get_description(self):
-        RandomCollectionFactory().build_from_list_of_values(self.descriptions).get_random_value()
+    def get_description(self, rng: Optional[np.random.Generator] = None):
+        # The weights are randomized for every description like in RandomCollectionFactory, reproducibly with rng
+        return RandomCollection(self.descriptions, [1 for _ in self.descriptions], rng=rng).get_random_value()
 
 
 @dataclass
@@ -0,0 +1,134 @@
+import csv
+import json
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterable, Optional, Self
+
+from src.synthetic_data_generator.ai_graph.key_value_store import KeyValueStore
+from src.synthetic_data_generator.sinks.storage_flattener import StorageFlattener
+from synthetic_data_generator.ai_graph.ai.text_stream import wait_for_text_streams
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+SAMPLE_INDEX_COLUMN = "sample_index"
+
+
+class DatasetSink(ABC):
+    # Buffers at most buffer_size flattened rows before they are written to the file
+    def __init__(self, path: str | Path, buffer_size: int = 1000, flattener: Optional[StorageFlattener] = None):
+        if buffer_size <= 0:
+            raise ValueError("buffer_size must be positive")
+        self.path = Path(path)
+        self.buffer_size = buffer_size
+        self.flattener = flattener or StorageFlattener()
+        self.row_count = 0
+        self._buffer: list[dict[str, any]] = []
+        self._closed = False
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def write(self, storage: KeyValueStore, sample_index: Optional[int] = None) -> None:
+        if self._closed:
+            raise ValueError(f"Sink {self.path} is closed")
+        row = self.flattener.flatten(storage)
+        if sample_index is not None:
+            row = {SAMPLE_INDEX_COLUMN: sample_index, **row}
+        self._buffer.append(row)
+        self.row_count += 1
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    async def write_when_complete(self, storage: KeyValueStore, sample_index: Optional[int] = None) -> None:
+        # Lets a sample be handed to the sink while its text streams are still being generated
+        await wait_for_text_streams(storage.storage.values())
+        self.write(storage, sample_index)
+
+    def write_results(self, results: Iterable[tuple[int, KeyValueStore]]) -> None:
+        # Consumes the (sample index, storage) pairs streamed by ShardedGenerationRunner.run
+        for sample_index, storage in results:
+            self.write(storage, sample_index)
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._write_rows(self._buffer)
+            self._buffer = []
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self.flush()
+        self._close_file()
+        self._closed = True
+
+    @abstractmethod
+    def _write_rows(self, rows: list[dict[str, any]]) -> None:
+        pass
+
+    @abstractmethod
+    def _close_file(self) -> None:
+        pass
+
+
+class JsonlSink(DatasetSink):
+    def __init__(self, path: str | Path, buffer_size: int = 1000, flattener: Optional[StorageFlattener] = None):
+        super().__init__(path, buffer_size, flattener)
+        self._file = self.path.open("w", encoding="utf-8")
+
+    def _write_rows(self, rows: list[dict[str, any]]) -> None:
+        self._file.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows))
+        self._file.flush()
+
+    def _close_file(self) -> None:
+        self._file.close()
+
+
+class CsvSink(DatasetSink):
+    # The columns are taken from the first row unless they are given, later rows must not add columns
+    def __init__(self, path: str | Path, buffer_size: int = 1000, flattener: Optional[StorageFlattener] = None,
+                 columns: Optional[list[str]] = None):
+        super().__init__(path, buffer_size, flattener)
+        self.columns = columns
+        self._file = self.path.open("w", encoding="utf-8", newline="")
+        self._writer: Optional[csv.DictWriter] = None
+
+    def _write_rows(self, rows: list[dict[str, any]]) -> None:
+        if self._writer is None:
+            self.columns = self.columns or list(rows[0].keys())
+            self._writer = csv.DictWriter(self._file, fieldnames=self.columns)
+            self._writer.writeheader()
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def _close_file(self) -> None:
+        self._file.close()
+
+
+class ParquetSink(DatasetSink):
+    # Every flush writes one row group, the schema is inferred from the first row group unless it is given
+    def __init__(self, path: str | Path, buffer_size: int = 10000, flattener: Optional[StorageFlattener] = None,
+                 schema: Optional["pyarrow.Schema"] = None, compression: str = "snappy"):
+        if pyarrow is None:
+            raise ImportError("ParquetSink requires pyarrow, install it with 'pip install pyarrow'")
+        super().__init__(path, buffer_size, flattener)
+        self.schema = schema
+        self.compression = compression
+        self._writer: Optional["pyarrow.parquet.ParquetWriter"] = None
+
+    def _write_rows(self, rows: list[dict[str, any]]) -> None:
+        table = pyarrow.Table.from_pylist(rows, schema=self.schema)
+        if self._writer is None:
+            self.schema = table.schema
+            self._writer = pyarrow.parquet.ParquetWriter(self.path, self.schema, compression=self.compression)
+        self._writer.write_table(table, row_group_size=len(rows))
+
+    def _close_file(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
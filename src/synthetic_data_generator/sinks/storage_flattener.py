@@ -0,0 +1,50 @@
+import dataclasses
+from enum import Enum
+from typing import Optional
+
+import pydantic
+
+from src.synthetic_data_generator.ai_graph.key_value_store import BaseKeyValueStore
+from synthetic_data_generator.ai_graph.ai.text_stream import TextStream
+
+
+class StorageFlattener:
+    # Turns a storage into one flat row, nested models become columns named "<storage key>.<field>"
+    def __init__(self, keys: Optional[list[str | type]] = None, separator: str = "."):
+        self.keys = keys
+        self.separator = separator
+
+    def flatten(self, storage: BaseKeyValueStore) -> dict[str, any]:
+        row: dict[str, any] = { }
+        keys = self.keys if self.keys is not None else storage.storage.keys()
+        for key in keys:
+            # TypedKeyValueStore keys are the value types themselves
+            column = key.__name__ if isinstance(key, type) else key
+            self._flatten_value(column, storage.get_by_key(key), row)
+        return row
+
+    def _flatten_value(self, column: str, value: any, row: dict[str, any]) -> None:
+        if isinstance(value, pydantic.BaseModel):
+            value = value.model_dump()
+        elif dataclasses.is_dataclass(value) and not isinstance(value, type):
+            value = {field.name: getattr(value, field.name) for field in dataclasses.fields(value)}
+
+        if isinstance(value, dict):
+            for field_name, field_value in value.items():
+                self._flatten_value(f"{column}{self.separator}{field_name}", field_value, row)
+        elif isinstance(value, Enum):
+            row[column] = value.name
+        elif isinstance(value, TextStream):
+            row[column] = value.get_finished_text()
+        elif isinstance(value, (list, tuple, set)):
+            row[column] = [self._to_scalar(item) for item in value]
+        else:
+            row[column] = self._to_scalar(value)
+
+    @staticmethod
+    def _to_scalar(value: any) -> any:
+        if isinstance(value, Enum):
+            return value.name
+        if value is None or isinstance(value, (str, int, float, bool)):
+            return value
+        return str(value)
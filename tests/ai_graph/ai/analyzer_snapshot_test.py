@@ -0,0 +1,101 @@
+import json
+import multiprocessing
+
+import pytest
+from openai.types import CompletionUsage
+
+from src.synthetic_data_generator.ai_graph.ai.base_ai_analysis import AnalyzerSnapshot, AssistantAnalyzer, \
+    AssistantRun, CostLimitExceededError, IAssistantRun, JobCostLimit, LatencyHistogram, UsageAdapter, calculate_cost
+from src.synthetic_data_generator.ai_graph.ai.base_ai_config import AIModelType, OpenAIModelVersion
+
+
+class FixedAssistantRun(IAssistantRun):
+    def __init__(self, prompt_tokens: int, completion_tokens: int):
+        self.usage = CompletionUsage(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                     total_tokens=prompt_tokens + completion_tokens)
+
+    def get_model(self) -> OpenAIModelVersion:
+        return OpenAIModelVersion(AIModelType.GPT_4o.value)
+
+    def get_usage(self) -> UsageAdapter:
+        return UsageAdapter(usage=self.usage)
+
+
+def create_assistant_run(assistant_name: str, prompt_tokens: int = 1000, completion_tokens: int = 1000):
+    return AssistantRun(assistant_name=assistant_name, run=FixedAssistantRun(prompt_tokens, completion_tokens))
+
+
+def record_worker_runs(job_cost_limit: JobCostLimit, snapshot_queue, assistant_name: str, run_count: int):
+    assistant_analyzer = AssistantAnalyzer()
+    assistant_analyzer.reset()
+    assistant_analyzer.set_job_cost_limit(job_cost_limit)
+    for _ in range(run_count):
+        assistant_analyzer.append_assistant_run(create_assistant_run(assistant_name), latency_seconds=0.3)
+    snapshot_queue.put(assistant_analyzer.snapshot().to_dict())
+
+
+def test_snapshot_merge(chat_assistant_analyzer):
+    chat_assistant_analyzer.append_assistant_run(create_assistant_run("writer"), latency_seconds=0.2)
+    chat_assistant_analyzer.append_cache_hit_run(create_assistant_run("writer"))
+    snapshot = chat_assistant_analyzer.snapshot()
+
+    other_snapshot = AnalyzerSnapshot()
+    other_snapshot.add_run(create_assistant_run("writer"), latency_seconds=3)
+    other_snapshot.add_run(create_assistant_run("classifier"), latency_seconds=0.05)
+    snapshot.merge(other_snapshot)
+
+    run_cost = calculate_cost(1000, 1000, AIModelType.GPT_4o)
+    assert snapshot.total.call_count == 3
+    assert snapshot.total.cost == pytest.approx(3 * run_cost)
+    assert snapshot.assistants["writer"].prompt_tokens == 2000
+    assert snapshot.models[AIModelType.GPT_4o.value].call_count == 3
+    assert snapshot.cache_hit_total.call_count == 1
+    assert snapshot.latencies["writer"].count == 2
+    assert snapshot.latencies["writer"].max_seconds == 3
+    assert chat_assistant_analyzer.total_summary().call_count == 1
+
+
+def test_snapshot_serialization():
+    snapshot = AnalyzerSnapshot()
+    snapshot.add_run(create_assistant_run("writer"), latency_seconds=1.5)
+    snapshot.add_cache_hit(create_assistant_run("writer"))
+
+    assert AnalyzerSnapshot.from_dict(json.loads(json.dumps(snapshot.to_dict()))) == snapshot
+
+
+def test_latency_histogram():
+    latency_histogram = LatencyHistogram()
+    for seconds in [0.05, 0.3, 0.3, 0.7, 100]:
+        latency_histogram.add(seconds)
+
+    assert latency_histogram.count == 5
+    assert latency_histogram.mean_seconds == pytest.approx(101.35 / 5)
+    assert latency_histogram.quantile_upper_bound(0.5) == 0.5
+    assert latency_histogram.quantile_upper_bound(1) == 100
+
+
+def test_merge_worker_snapshots_with_job_cost_limit(chat_assistant_analyzer):
+    run_cost = calculate_cost(1000, 1000, AIModelType.GPT_4o)
+    job_cost_limit = JobCostLimit(error_limit=run_cost * 5.5)
+    snapshot_queue = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=record_worker_runs,
+                                       args=(job_cost_limit, snapshot_queue, f"worker {index}", 3))
+               for index in range(2)]
+    for worker in workers:
+        worker.start()
+    snapshots = [AnalyzerSnapshot.from_dict(snapshot_queue.get(timeout=30)) for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    for snapshot in snapshots:
+        chat_assistant_analyzer.merge_snapshot(snapshot)
+
+    assert chat_assistant_analyzer.total_summary().call_count == 6
+    assert chat_assistant_analyzer.get_latency_for_assistant("worker 1").count == 3
+    assert job_cost_limit.spent_cost == pytest.approx(6 * run_cost)
+    assert job_cost_limit.is_exceeded()
+
+    chat_assistant_analyzer.set_job_cost_limit(job_cost_limit)
+    with pytest.raises(CostLimitExceededError):
+        chat_assistant_analyzer.raise_if_job_cost_limit_exceeded()
+    chat_assistant_analyzer.set_job_cost_limit(None)
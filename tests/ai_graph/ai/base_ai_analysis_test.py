@@ -3,10 +3,21 @@ import logging
 import pytest
 
 from src.synthetic_data_generator.ai_graph.ai.base_ai_analysis import AssistantAnalysisResult, AssistantRun, \
-    AssistantRuns, calculate_cost
+    UsageTotals, calculate_cost
 from src.synthetic_data_generator.ai_graph.ai.base_ai_config import AIModelType, OpenAIModelVersion
 
 
+@pytest.fixture
+def create_mocked_assistant_run(create_mocked_assistant_run):
+    # The analyzer groups the runs by the version of their model
+    def _create_mocked_assistant_run(completion_tokens, prompt_tokens, cost: float):
+        run = create_mocked_assistant_run(completion_tokens, prompt_tokens, cost)
+        run.model = OpenAIModelVersion(AIModelType.GPT_4o_MINI.value)
+        return run
+
+    return _create_mocked_assistant_run
+
+
 @pytest.mark.parametrize("prompt_tokens,completion_tokens,ai_type,expected_cost", [
     (1e6, 2e6, AIModelType.GPT_4o, 35),
     (2e6, 1e6, AIModelType.GPT_4o, 25),
@@ -24,7 +35,9 @@ def test_assistant_run(create_assistant_run, prompt_tokens, completion_tokens, a
 def test_assistant_run_composite(create_mocked_assistant_run):
     assistant_run_1 = create_mocked_assistant_run(1e6, 2e6, 100)
     assistant_run_2 = create_mocked_assistant_run(2e6, 1e6, 200)
-    assistant_runs = AssistantRuns(_runs=[assistant_run_1, assistant_run_2])
+    assistant_runs = UsageTotals()
+    assistant_runs.add(assistant_run_1)
+    assistant_runs.add(assistant_run_2)
     assert assistant_runs.cost == 300
     assert assistant_runs.prompt_tokens == 3e6
     assert assistant_runs.completion_tokens == 3e6
@@ -95,3 +108,34 @@ async def test_chat_assistant_analyzer_get_by_name(create_mocked_assistant, chat
     assert summary2.prompt_tokens == 10
     assert summary2.completion_tokens == 10
     assert summary2.cost == calculate_cost(10, 10, AIModelType.GPT_4o)
+
+
+def test_assistant_analyzer_aggregates_without_storing_runs(create_assistant_run, chat_assistant_analyzer):
+    for _ in range(3):
+        chat_assistant_analyzer.append_assistant_run(
+            create_assistant_run(assistant_name="mini", prompt_tokens=10, completion_tokens=20,
+                                 model=OpenAIModelVersion(AIModelType.GPT_4o_MINI.value)))
+    chat_assistant_analyzer.append_assistant_run(
+        create_assistant_run(assistant_name="large", prompt_tokens=5, completion_tokens=5,
+                             model=OpenAIModelVersion(AIModelType.GPT_4o.value)))
+
+    assert chat_assistant_analyzer.runs == []
+    assert chat_assistant_analyzer.total_summary().call_count == 4
+    assert chat_assistant_analyzer.get_summary_for_assistant("mini").cost == pytest.approx(
+        calculate_cost(30, 60, AIModelType.GPT_4o_MINI))
+    assert chat_assistant_analyzer.get_summary_for_model(AIModelType.GPT_4o.value).prompt_tokens == 5
+    assert chat_assistant_analyzer.get_summary_for_assistant("unknown").call_count == 0
+
+    summaries = {summary.name: summary for summary in chat_assistant_analyzer.generate_assistant_summaries()}
+    assert summaries["large"].total_cost == pytest.approx(chat_assistant_analyzer.total_summary().cost)
+
+
+def test_assistant_analyzer_keeps_bounded_runs(create_mocked_assistant_run, chat_assistant_analyzer):
+    chat_assistant_analyzer.configure(max_stored_runs=2)
+    assistant_runs = [create_mocked_assistant_run(1, 1, cost) for cost in range(5)]
+    for assistant_run in assistant_runs:
+        chat_assistant_analyzer.append_assistant_run(assistant_run)
+
+    assert chat_assistant_analyzer.runs == assistant_runs[-2:]
+    assert chat_assistant_analyzer.total_summary().cost == 10
+    chat_assistant_analyzer.configure(max_stored_runs=0)
@@ -0,0 +1,169 @@
+import asyncio
+import json
+
+import pydantic
+import pytest
+
+from src.synthetic_data_generator.ai_graph.ai.ai_model_generator import AIModelGenerator
+from src.synthetic_data_generator.ai_graph.ai.base_ai_config import AIModelType, OpenAIModelVersion
+from synthetic_data_generator.ai_graph.ai.base_ai_analysis import BATCH_COST_FACTOR, calculate_cost
+from synthetic_data_generator.ai_graph.ai.batch_open_ai_client import BatchOpenAiClient, BatchRequestError, \
+    LocalBatchBackend, create_response_format
+from synthetic_data_generator.ai_graph.ai.model_describer import ModelDescriber
+from synthetic_data_generator.ai_graph.ai.plain_response_ai import PlainResponseAI
+
+
+class City(pydantic.BaseModel):
+    name: str
+
+
+class Country(pydantic.BaseModel):
+    name: str
+
+
+class CityDescriber(ModelDescriber):
+    def generate_description(self, city: City):
+        return city.name
+
+
+def create_response_body(request_body: dict) -> dict:
+    prompt = request_body["messages"][1]["content"]
+    if prompt == "fail":
+        raise ValueError("Invalid request")
+    content = json.dumps({ "name": f"country of {prompt}" }) if "response_format" in request_body else prompt.upper()
+    return {
+        "id": "completion", "object": "chat.completion", "created": 0, "model": request_body["model"],
+        "choices": [{ "index": 0, "finish_reason": "stop", "message": { "role": "assistant", "content": content } }],
+        "usage": { "prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15 }
+    }
+
+
+@pytest.fixture
+def create_batch_client(tmp_path):
+    def _create_batch_client(max_batch_size: int = 1000, flush_delay_seconds: float = 0.01,
+                             max_flush_delay_seconds: float = 60):
+        backend = LocalBatchBackend(create_response_body)
+        return BatchOpenAiClient(backend, tmp_path, max_batch_size=max_batch_size,
+                                 flush_delay_seconds=flush_delay_seconds,
+                                 max_flush_delay_seconds=max_flush_delay_seconds), backend
+
+    return _create_batch_client
+
+
+def create_assistants(client):
+    model = OpenAIModelVersion(AIModelType.GPT_4o_MINI.value)
+    plain_response_ai = PlainResponseAI(assistant_name="plain", client=client, model=model, instructions="upper",
+                                        retry_attempts=1)
+    ai_model_generator = AIModelGenerator[Country](assistant_name="generator", client=client,
+                                                   open_ai_model_version=model, temperature=1, max_tokens=100,
+                                                   instructions="country of city", input_describer=CityDescriber(),
+                                                   retry_attempts=1)
+    return plain_response_ai, ai_model_generator
+
+
+@pytest.mark.asyncio
+async def test_requests_of_many_graph_runs_are_collected_into_one_batch(create_batch_client, tmp_path):
+    client, backend = create_batch_client()
+    plain_response_ai, ai_model_generator = create_assistants(client)
+
+    async def graph_run(index: int):
+        text = await plain_response_ai.get_response_with_retry(f"ticket {index}")
+        country = await ai_model_generator.get_parsed_completion(City(name=f"city {index}"), Country)
+        return text, country
+
+    results = await asyncio.gather(*(graph_run(index) for index in range(20)))
+
+    assert backend.batch_count == 2
+    assert len((tmp_path / "batch_1_input.jsonl").read_text().splitlines()) == 20
+    for index, (text, country) in enumerate(results):
+        assert text == f"TICKET {index}"
+        assert isinstance(country, Country) and country.name == f"country of city {index}"
+
+
+@pytest.mark.asyncio
+async def test_batch_is_submitted_when_full(create_batch_client):
+    client, backend = create_batch_client(max_batch_size=5)
+    plain_response_ai, _ = create_assistants(client)
+
+    await asyncio.gather(*(plain_response_ai.get_response_with_retry(f"ticket {index}") for index in range(12)))
+
+    assert backend.batch_count == 3
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_request_raises_error(create_batch_client):
+    client, _ = create_batch_client()
+    plain_response_ai, _ = create_assistants(client)
+
+    results = await asyncio.gather(plain_response_ai.get_response_with_retry("ticket"),
+                                   plain_response_ai.get_response_with_retry("fail"), return_exceptions=True)
+
+    assert results[0] == "TICKET"
+    assert isinstance(results[1], BatchRequestError)
+
+
+@pytest.mark.asyncio
+async def test_trickle_of_requests_is_flushed_at_the_deadline(create_batch_client):
+    client, backend = create_batch_client(flush_delay_seconds=0.05, max_flush_delay_seconds=0.1)
+    plain_response_ai, _ = create_assistants(client)
+
+    async def trickle_requests() -> list[str]:
+        tasks = []
+        for index in range(10):
+            tasks.append(asyncio.create_task(plain_response_ai.get_response_with_retry(f"ticket {index}")))
+            await asyncio.sleep(0.02)
+        return await asyncio.gather(*tasks)
+
+    first_response = asyncio.create_task(plain_response_ai.get_response_with_retry("first"))
+    trickle_task = asyncio.create_task(trickle_requests())
+
+    assert await asyncio.wait_for(first_response, timeout=0.18) == "FIRST"
+    assert len(await trickle_task) == 10
+    assert backend.batch_count >= 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_flush_fails_its_requests(create_batch_client):
+    client, backend = create_batch_client()
+    plain_response_ai, _ = create_assistants(client)
+
+    async def run_batch_forever(input_path, output_path):
+        await asyncio.Event().wait()
+
+    backend.run_batch = run_batch_forever
+    response = asyncio.create_task(plain_response_ai.get_response_with_retry("ticket"))
+    while not client._flush_tasks:
+        await asyncio.sleep(0.01)
+    next(iter(client._flush_tasks)).cancel()
+
+    with pytest.raises(BatchRequestError):
+        await asyncio.wait_for(response, timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_batch_completions_are_priced_at_the_batch_discount(create_batch_client, analyzer):
+    client, _ = create_batch_client()
+    plain_response_ai, _ = create_assistants(client)
+
+    await plain_response_ai.get_response_with_retry("ticket")
+
+    assert analyzer.total_summary().cost == pytest.approx(
+        calculate_cost(10, 5, AIModelType.GPT_4o_MINI) * BATCH_COST_FACTOR)
+
+
+def test_response_format_is_a_strict_json_schema():
+    class Address(pydantic.BaseModel):
+        city: str
+
+    class Customer(pydantic.BaseModel):
+        address: Address = pydantic.Field(description="Billing address")
+        note: str | None = None
+
+    response_format = create_response_format(Customer)
+
+    schema = response_format["json_schema"]["schema"]
+    assert response_format["type"] == "json_schema" and response_format["json_schema"]["strict"]
+    assert schema["required"] == ["address", "note"] and schema["additionalProperties"] is False
+    assert schema["properties"]["address"]["description"] == "Billing address"
+    assert schema["properties"]["address"]["required"] == ["city"]
+    assert schema["$defs"]["Address"]["additionalProperties"] is False
@@ -0,0 +1,99 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from openai.types.chat import ChatCompletion
+
+from src.synthetic_data_generator.ai_graph.ai.base_ai_config import AIModelType, OpenAIModelVersion
+from synthetic_data_generator.ai_graph.ai.base_ai_analysis import calculate_cost
+from synthetic_data_generator.ai_graph.ai.budget_controller import BudgetController, BudgetExceededError, \
+    BudgetPolicy
+from synthetic_data_generator.ai_graph.ai.open_ai_client import OpenAiClient
+from synthetic_data_generator.ai_graph.ai.plain_response_ai import PlainResponseAI
+
+MAX_TOKENS = 100
+RUN_COST = calculate_cost(10, 20, AIModelType.GPT_4o_MINI)
+
+
+class SlowCompletions:
+    def __init__(self, latency: float = 0.01):
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(self, model, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.latency)
+        self.in_flight -= 1
+        return ChatCompletion.model_validate({
+            "id": "completion", "object": "chat.completion", "created": 0, "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "answer"}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 20, "total_tokens": 30}
+        })
+
+
+@pytest.fixture
+def create_budgeted_assistant():
+    def _create_budgeted_assistant(budget_controller: BudgetController):
+        completions = SlowCompletions()
+        async_open_ai = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        assistant = PlainResponseAI(assistant_name="Budgeted", client=OpenAiClient(async_open_ai),
+                                    model=OpenAIModelVersion(AIModelType.GPT_4o_MINI.value), max_tokens=MAX_TOKENS,
+                                    instructions="instruction", retry_wait_min=0, retry_wait_max=0, retry_attempts=1,
+                                    budget_controller=budget_controller)
+        return assistant, completions
+
+    return _create_budgeted_assistant
+
+
+def test_estimate_cost_assumes_max_tokens_completion():
+    budget_controller = BudgetController(budget=1.0, characters_per_token=1)
+    estimated_cost = budget_controller.estimate_cost("prompt", "instruction",
+                                                     OpenAIModelVersion(AIModelType.GPT_4o_MINI.value), MAX_TOKENS)
+    assert estimated_cost == pytest.approx(calculate_cost(17, MAX_TOKENS, AIModelType.GPT_4o_MINI))
+
+
+@pytest.mark.asyncio
+async def test_stop_policy_rejects_calls_exceeding_the_budget(analyzer, create_budgeted_assistant):
+    budget_controller = BudgetController(budget=1e-4, policy=BudgetPolicy.STOP, analyzer=analyzer)
+    assistant, _ = create_budgeted_assistant(budget_controller)
+
+    results = await asyncio.gather(*(assistant.get_response_with_retry("prompt") for _ in range(5)),
+                                   return_exceptions=True)
+
+    assert results.count("answer") == 1
+    assert all(isinstance(result, BudgetExceededError) for result in results if result != "answer")
+    assert analyzer.total_summary().cost == pytest.approx(RUN_COST)
+    assert budget_controller.reserved_cost == 0
+
+
+@pytest.mark.asyncio
+async def test_wait_policy_runs_calls_until_the_budget_is_spent(analyzer, create_budgeted_assistant):
+    budget_controller = BudgetController(budget=1e-4, policy=BudgetPolicy.WAIT, analyzer=analyzer)
+    assistant, completions = create_budgeted_assistant(budget_controller)
+
+    results = await asyncio.gather(*(assistant.get_response_with_retry("prompt") for _ in range(5)),
+                                   return_exceptions=True)
+
+    assert results.count("answer") == 3
+    assert completions.max_in_flight == 1
+    assert analyzer.total_summary().cost <= budget_controller.budget
+    assert budget_controller.reserved_cost == 0
+
+
+@pytest.mark.asyncio
+async def test_budget_is_not_limiting_cheap_calls(analyzer, create_budgeted_assistant):
+    budget_controller = BudgetController(budget=1.0, analyzer=analyzer)
+    assistant, completions = create_budgeted_assistant(budget_controller)
+
+    results = await asyncio.gather(*(assistant.get_response_with_retry("prompt") for _ in range(10)))
+
+    assert results == ["answer"] * 10
+    assert completions.max_in_flight == 10
+    assert budget_controller.remaining_budget == pytest.approx(1.0 - 10 * RUN_COST)
+
+
+def test_budget_must_be_positive():
+    with pytest.raises(ValueError):
+        BudgetController(budget=0)
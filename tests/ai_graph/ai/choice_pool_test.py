@@ -0,0 +1,157 @@
+import asyncio
+
+import pydantic
+import pytest
+
+from src.synthetic_data_generator.ai_graph.ai.ai_model_generator import AIModelGenerator
+from src.synthetic_data_generator.ai_graph.ai.base_ai_config import AIModelType, OpenAIModelVersion
+from synthetic_data_generator.ai_graph.ai.choice_pool import ChoicePool
+from synthetic_data_generator.ai_graph.ai.fake_open_ai import ConstantLatency, FakeAsyncOpenAI
+from synthetic_data_generator.ai_graph.ai.model_describer import ModelDescriber
+from synthetic_data_generator.ai_graph.ai.open_ai_client import OpenAiClient
+from synthetic_data_generator.ai_graph.ai.plain_response_ai import PlainResponseAI
+
+
+class Customer(pydantic.BaseModel):
+    segment: str
+
+
+class Ticket(pydantic.BaseModel):
+    subject: str
+
+
+class CustomerDescriber(ModelDescriber):
+    def generate_description(self, customer: Customer):
+        return f"Write a ticket of a {customer.segment} customer"
+
+
+def create_assistant(fake_open_ai: FakeAsyncOpenAI, choices_per_request: int) -> PlainResponseAI:
+    return PlainResponseAI(assistant_name="Choice Test", client=OpenAiClient(fake_open_ai),
+                           model=OpenAIModelVersion(AIModelType.GPT_4o_MINI.value), instructions="instruction",
+                           retry_wait_min=0, retry_wait_max=0, retry_attempts=5,
+                           choices_per_request=choices_per_request)
+
+
+@pytest.mark.asyncio
+async def test_waiting_requests_share_the_choices_of_one_request():
+    choice_pool = ChoicePool()
+    request_count = 0
+
+    async def request_choices() -> list[int]:
+        nonlocal request_count
+        request_count += 1
+        await asyncio.sleep(0.01)
+        return [request_count * 10 + index for index in range(3)]
+
+    choices = await asyncio.gather(*(choice_pool.take("prompt", request_choices) for _ in range(5)))
+
+    assert request_count == 2
+    assert sorted(choices) == [10, 11, 12, 20, 21]
+    assert choice_pool.unused_choice_count("prompt") == 1
+
+
+@pytest.mark.asyncio
+async def test_waiters_of_a_failed_request_send_their_own():
+    choice_pool = ChoicePool()
+    attempts = []
+
+    async def request_choices() -> list[str]:
+        attempts.append(len(attempts))
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise ValueError("Request failed")
+        return ["first", "second"]
+
+    results = await asyncio.gather(*(choice_pool.take("prompt", request_choices) for _ in range(3)),
+                                   return_exceptions=True)
+
+    assert isinstance(results[0], ValueError)
+    assert sorted(results[1:]) == ["first", "second"]
+    assert len(attempts) == 2
+
+
+async def request_two_choices() -> list[str]:
+    return ["first", "second"]
+
+
+@pytest.mark.asyncio
+async def test_unused_choices_expire():
+    choice_pool = ChoicePool(max_age_seconds=0.01)
+    await choice_pool.take("prompt", request_two_choices)
+    assert choice_pool.unused_choice_count("prompt") == 1
+
+    await asyncio.sleep(0.02)
+
+    assert choice_pool.unused_choice_count("prompt") == 0
+    assert await choice_pool.take("prompt", request_two_choices) == "first"
+
+
+@pytest.mark.asyncio
+async def test_oldest_unused_choices_are_dropped_above_the_fingerprint_limit():
+    choice_pool = ChoicePool(max_fingerprints=2)
+
+    for fingerprint in ["first prompt", "second prompt", "third prompt"]:
+        await choice_pool.take(fingerprint, request_two_choices)
+
+    assert [choice_pool.unused_choice_count(fingerprint)
+            for fingerprint in ["first prompt", "second prompt", "third prompt"]] == [0, 1, 1]
+
+
+@pytest.mark.asyncio
+async def test_clear_drops_all_unused_choices():
+    choice_pool = ChoicePool()
+    await choice_pool.take("prompt", request_two_choices)
+
+    choice_pool.clear()
+
+    assert choice_pool.unused_choice_count("prompt") == 0
+
+
+@pytest.mark.asyncio
+async def test_plain_response_ai_amortizes_requests_over_samples(analyzer):
+    fake_open_ai = FakeAsyncOpenAI(latency=ConstantLatency(0.01))
+    assistant = create_assistant(fake_open_ai, choices_per_request=4)
+
+    responses = await asyncio.gather(*(assistant.get_response_with_retry("Write a ticket") for _ in range(8)),
+                                     assistant.get_response_with_retry("Write an answer"))
+
+    assert responses[0].endswith("Write a ticket")
+    assert responses[-1].endswith("Write an answer")
+    assert fake_open_ai.call_count == 3
+    totals = analyzer.get_summary_for_assistant("Choice Test")
+    assert totals.call_count == 3
+    assert totals.sample_count == 9
+    assert totals.cost_per_sample == pytest.approx(totals.cost / 9)
+
+
+@pytest.mark.asyncio
+async def test_multi_choice_requests_pay_the_prompt_once(analyzer):
+    single_choice_assistant = create_assistant(FakeAsyncOpenAI(), choices_per_request=1)
+    await asyncio.gather(*(single_choice_assistant.get_response_with_retry("Write a ticket") for _ in range(4)))
+    single_choice_totals = analyzer.snapshot().total
+    analyzer.reset()
+
+    multi_choice_assistant = create_assistant(FakeAsyncOpenAI(), choices_per_request=4)
+    await asyncio.gather(*(multi_choice_assistant.get_response_with_retry("Write a ticket") for _ in range(4)))
+    multi_choice_totals = analyzer.snapshot().total
+
+    assert multi_choice_totals.prompt_tokens * 4 == single_choice_totals.prompt_tokens
+    assert multi_choice_totals.completion_tokens == single_choice_totals.completion_tokens
+    assert multi_choice_totals.cost_per_sample < single_choice_totals.cost_per_sample
+
+
+@pytest.mark.asyncio
+async def test_ai_model_generator_hands_out_parsed_choices(analyzer):
+    fake_open_ai = FakeAsyncOpenAI(latency=ConstantLatency(0.01))
+    ai_model_generator = AIModelGenerator[Ticket](
+        assistant_name="Ticket Writer", client=OpenAiClient(fake_open_ai), temperature=1, max_tokens=100,
+        instructions="instruction", open_ai_model_version=OpenAIModelVersion(AIModelType.GPT_4o_MINI.value),
+        input_describer=CustomerDescriber(), retry_wait_min=0, retry_wait_max=0, retry_attempts=1,
+        choices_per_request=3)
+
+    tickets = await asyncio.gather(*(ai_model_generator.get_parsed_completion(Customer(segment=segment), Ticket)
+                                     for segment in ["private"] * 3 + ["business"] * 3))
+
+    assert tickets == [Ticket(subject="text")] * 6
+    assert fake_open_ai.call_count == 2
+    assert analyzer.get_summary_for_assistant("Ticket Writer").sample_count == 6
@@ -0,0 +1,92 @@
+import asyncio
+from enum import Enum
+from typing import Optional
+
+import openai
+import pydantic
+import pytest
+
+from src.synthetic_data_generator.ai_graph.ai.base_ai_config import AIModelType, OpenAIModelVersion
+from synthetic_data_generator.ai_graph.ai.fake_open_ai import ConstantLatency, FakeAsyncOpenAI, LogNormalLatency
+from synthetic_data_generator.ai_graph.ai.open_ai_client import OpenAiClient
+from synthetic_data_generator.ai_graph.ai.plain_response_ai import PlainResponseAI
+
+
+class Priority(Enum):
+    LOW = "low"
+    HIGH = "high"
+
+
+class Ticket(pydantic.BaseModel):
+    subject: str
+    priority: Priority
+    tags: list[str]
+    answer: Optional[str]
+
+
+def get_chat_completion(client: OpenAiClient, prompt: str = "Write a ticket", max_tokens: int = 100):
+    return client.get_chat_completion(prompt=prompt, instruction="You write tickets", model_version="gpt-4o-mini",
+                                      temperature=1, max_tokens=max_tokens)
+
+
+@pytest.mark.asyncio
+async def test_fake_chat_completion_has_usage():
+    chat_completion = await get_chat_completion(OpenAiClient(FakeAsyncOpenAI()))
+
+    assert chat_completion.choices[0].message.content == "Fake response to: You write tickets\nWrite a ticket"
+    assert chat_completion.usage.prompt_tokens == 16
+    assert chat_completion.usage.completion_tokens == 12
+
+
+@pytest.mark.asyncio
+async def test_fake_chat_completion_respects_max_tokens():
+    chat_completion = await get_chat_completion(OpenAiClient(FakeAsyncOpenAI()), max_tokens=5)
+
+    assert chat_completion.usage.completion_tokens == 5
+    assert chat_completion.choices[0].finish_reason == "length"
+
+
+@pytest.mark.asyncio
+async def test_fake_parsed_chat_completion_creates_valid_response_format():
+    client = OpenAiClient(FakeAsyncOpenAI())
+    chat_completion = await client.get_parsed_chat_completion(prompt="prompt", instruction="instruction",
+                                                              model_version="gpt-4o-mini", temperature=1,
+                                                              max_tokens=100, response_format=Ticket)
+
+    assert chat_completion.choices[0].message.parsed == Ticket(subject="text", priority=Priority.LOW, tags=[],
+                                                               answer="text")
+
+
+@pytest.mark.asyncio
+async def test_fake_errors_are_injected_deterministically():
+    async def count_errors(seed: int) -> list[str]:
+        client = OpenAiClient(FakeAsyncOpenAI(rate_limit_error_rate=0.2, timeout_error_rate=0.1, seed=seed))
+        results = await asyncio.gather(*(get_chat_completion(client) for _ in range(500)), return_exceptions=True)
+        return [type(result).__name__ for result in results]
+
+    error_names = await count_errors(seed=1)
+
+    assert error_names == await count_errors(seed=1)
+    assert 50 < error_names.count(openai.RateLimitError.__name__) < 150
+    assert 20 < error_names.count(openai.APITimeoutError.__name__) < 80
+
+
+@pytest.mark.asyncio
+async def test_fake_client_handles_thousands_of_concurrent_calls(analyzer):
+    fake_open_ai = FakeAsyncOpenAI(latency=LogNormalLatency(median_seconds=0.05), rate_limit_error_rate=0.05)
+    assistant = PlainResponseAI(assistant_name="Load Test", client=OpenAiClient(fake_open_ai),
+                                model=OpenAIModelVersion(AIModelType.GPT_4o_MINI.value), retry_wait_min=0,
+                                retry_wait_max=0, retry_attempts=10)
+
+    responses = await asyncio.gather(*(assistant.get_response_with_retry(f"prompt {index}") for index in range(2000)))
+
+    assert len(responses) == 2000
+    assert fake_open_ai.max_in_flight > 1000
+    assert analyzer.total_summary().call_count == 2000
+    assert fake_open_ai.call_count == 2000 + fake_open_ai.rate_limit_error_count
+
+
+def test_constant_latency_is_default():
+    assert isinstance(FakeAsyncOpenAI().latency, ConstantLatency)
+    with pytest.raises(ValueError):
+        FakeAsyncOpenAI(rate_limit_error_rate=0.8, timeout_error_rate=0.3)
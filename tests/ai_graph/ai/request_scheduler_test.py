@@ -0,0 +1,146 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pydantic
+import pytest
+
+from synthetic_data_generator.ai_graph.ai.open_ai_client import OpenAiClient
+from synthetic_data_generator.ai_graph.ai.request_scheduler import RequestScheduler, TokenBucket
+
+
+class FakeCompletions:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.call_count = 0
+
+    async def _complete(self, **kwargs):
+        self.call_count += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.latency)
+        self.in_flight -= 1
+        return kwargs
+
+    async def create(self, **kwargs):
+        return await self._complete(**kwargs)
+
+    async def parse(self, **kwargs):
+        return await self._complete(**kwargs)
+
+
+class FakeAsyncOpenAI:
+    def __init__(self, latency: float = 0.01):
+        self.completions = FakeCompletions(latency)
+        self.chat = SimpleNamespace(completions=self.completions)
+        self.beta = SimpleNamespace(chat=SimpleNamespace(completions=self.completions))
+
+
+class Answer(pydantic.BaseModel):
+    text: str
+
+
+async def get_completions(client: OpenAiClient, amount: int, parsed: bool = False):
+    if parsed:
+        return await asyncio.gather(*(
+            client.get_parsed_chat_completion(prompt="prompt", instruction="instruction", model_version="gpt-4o-mini",
+                                              temperature=1, max_tokens=10, response_format=Answer)
+            for _ in range(amount)))
+    return await asyncio.gather(*(
+        client.get_chat_completion(prompt="prompt", instruction="instruction", model_version="gpt-4o-mini",
+                                   temperature=1, max_tokens=10)
+        for _ in range(amount)))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("parsed", [False, True])
+async def test_scheduler_limits_requests_in_flight(parsed):
+    fake_open_ai = FakeAsyncOpenAI()
+    client = OpenAiClient(fake_open_ai, scheduler=RequestScheduler(max_concurrent_requests=3))
+
+    await get_completions(client, 20, parsed=parsed)
+
+    assert fake_open_ai.completions.call_count == 20
+    assert fake_open_ai.completions.max_in_flight == 3
+
+
+@pytest.mark.asyncio
+async def test_client_without_scheduler_does_not_limit_requests():
+    fake_open_ai = FakeAsyncOpenAI()
+
+    await get_completions(OpenAiClient(fake_open_ai), 20)
+
+    assert fake_open_ai.completions.max_in_flight == 20
+
+
+@pytest.mark.asyncio
+async def test_scheduler_requests_per_minute():
+    fake_open_ai = FakeAsyncOpenAI(latency=0)
+    client = OpenAiClient(fake_open_ai, scheduler=RequestScheduler(requests_per_minute=600))
+
+    start = time.monotonic()
+    await get_completions(client, 602)
+
+    assert time.monotonic() - start >= 0.15
+
+
+@pytest.mark.asyncio
+async def test_scheduler_tokens_per_minute():
+    fake_open_ai = FakeAsyncOpenAI(latency=0)
+    scheduler = RequestScheduler(tokens_per_minute=6000, characters_per_token=4)
+    client = OpenAiClient(fake_open_ai, scheduler=scheduler)
+    estimated_tokens = scheduler.estimate_tokens("prompt", "instruction", 10)
+
+    start = time.monotonic()
+    await get_completions(client, 6000 // estimated_tokens + 2)
+
+    assert time.monotonic() - start >= estimated_tokens / 100 * 0.9
+
+
+def test_estimate_tokens():
+    assert RequestScheduler(characters_per_token=4).estimate_tokens("a" * 40, "b" * 20, 100) == 115
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_waits_for_refill():
+    token_bucket = TokenBucket(capacity=2, refill_rate_per_second=20)
+
+    start = time.monotonic()
+    for _ in range(4):
+        await token_bucket.acquire()
+
+    assert 0.09 <= time.monotonic() - start < 1
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_amount_larger_than_capacity():
+    token_bucket = TokenBucket(capacity=2, refill_rate_per_second=1000)
+    await token_bucket.acquire(10)
+    await token_bucket.acquire(10)
+
+
+def test_scheduler_can_be_used_by_several_event_loops():
+    scheduler = RequestScheduler(max_concurrent_requests=2, requests_per_minute=60_000)
+    for _ in range(2):
+        fake_open_ai = FakeAsyncOpenAI()
+        asyncio.run(get_completions(OpenAiClient(fake_open_ai, scheduler=scheduler), 10))
+
+        assert fake_open_ai.completions.max_in_flight == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_token_bucket_waiter_returns_its_tokens():
+    token_bucket = TokenBucket(capacity=1, refill_rate_per_second=10)
+    await token_bucket.acquire()
+    waiter = asyncio.create_task(token_bucket.acquire())
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    start = time.monotonic()
+    await token_bucket.acquire()
+
+    assert time.monotonic() - start < 0.15
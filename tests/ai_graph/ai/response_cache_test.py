@@ -0,0 +1,179 @@
+import asyncio
+from types import SimpleNamespace
+
+import pydantic
+import pytest
+from openai.types.chat import ChatCompletion, ParsedChatCompletion
+
+from src.synthetic_data_generator.ai_graph.ai.base_ai_config import AIModelType, OpenAIModelVersion
+from src.synthetic_data_generator.ai_graph.tracing import set_current_sample_index
+from synthetic_data_generator.ai_graph.ai.base_ai_analysis import AssistantAnalyzer
+from synthetic_data_generator.ai_graph.ai.fake_open_ai import FakeAsyncOpenAI
+from synthetic_data_generator.ai_graph.ai.open_ai_client import OpenAiClient
+from synthetic_data_generator.ai_graph.ai.plain_response_ai import PlainResponseAI
+from synthetic_data_generator.ai_graph.ai.response_cache import CachedOpenAiClient, ResponseCache
+
+
+class Answer(pydantic.BaseModel):
+    text: str
+
+
+class CountingCompletions:
+    def __init__(self):
+        self.call_count = 0
+
+    def _create_completion_data(self, model):
+        self.call_count += 1
+        return {
+            "id": f"completion-{self.call_count}", "object": "chat.completion", "created": 0, "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": f'{{"text": "answer {self.call_count}"}}'}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 20, "total_tokens": 30}
+        }
+
+    async def create(self, model, **kwargs):
+        return ChatCompletion.model_validate(self._create_completion_data(model))
+
+    async def parse(self, model, response_format, **kwargs):
+        completion_data = self._create_completion_data(model)
+        message = completion_data["choices"][0]["message"]
+        message["parsed"] = response_format.model_validate_json(message["content"])
+        return ParsedChatCompletion[response_format].model_validate(completion_data)
+
+
+class CountingAsyncOpenAI:
+    def __init__(self):
+        self.completions = CountingCompletions()
+        self.chat = SimpleNamespace(completions=self.completions)
+        self.beta = SimpleNamespace(chat=SimpleNamespace(completions=self.completions))
+
+
+@pytest.fixture
+def create_cached_client(tmp_path):
+    def _create_cached_client(max_size_bytes: int = 1024 ** 2):
+        async_open_ai = CountingAsyncOpenAI()
+        cache = ResponseCache(tmp_path / "responses.sqlite", max_size_bytes=max_size_bytes)
+        return CachedOpenAiClient(OpenAiClient(async_open_ai), cache), async_open_ai.completions
+
+    return _create_cached_client
+
+
+async def get_chat_completion(client: OpenAiClient, prompt: str = "prompt", temperature: float = 1.0):
+    return await client.get_chat_completion(prompt=prompt, instruction="instruction", model_version="gpt-4o-mini",
+                                            temperature=temperature, max_tokens=100)
+
+
+@pytest.mark.asyncio
+async def test_cached_chat_completion(create_cached_client):
+    client, completions = create_cached_client()
+    chat_completion = await get_chat_completion(client)
+
+    resumed_client, resumed_completions = create_cached_client()
+    cached_chat_completion = await get_chat_completion(resumed_client)
+
+    assert completions.call_count == 1 and resumed_completions.call_count == 0
+    assert cached_chat_completion == chat_completion
+
+
+@pytest.mark.asyncio
+async def test_cached_parsed_chat_completion(create_cached_client):
+    async def get_parsed_chat_completion(client: OpenAiClient):
+        return await client.get_parsed_chat_completion(prompt="prompt", instruction="instruction",
+                                                       model_version="gpt-4o-mini", temperature=1.0, max_tokens=100,
+                                                       response_format=Answer)
+
+    client, _ = create_cached_client()
+    parsed_answer = (await get_parsed_chat_completion(client)).choices[0].message.parsed
+
+    resumed_client, resumed_completions = create_cached_client()
+    cached_parsed_answer = (await get_parsed_chat_completion(resumed_client)).choices[0].message.parsed
+
+    assert resumed_completions.call_count == 0
+    assert isinstance(cached_parsed_answer, Answer)
+    assert cached_parsed_answer == parsed_answer
+
+
+@pytest.mark.asyncio
+async def test_repeated_requests_are_cached_separately(create_cached_client):
+    client, completions = create_cached_client()
+    answers = [(await get_chat_completion(client)).choices[0].message.content for _ in range(3)]
+
+    resumed_client, resumed_completions = create_cached_client()
+    cached_answers = [(await get_chat_completion(resumed_client)).choices[0].message.content for _ in range(3)]
+
+    assert completions.call_count == 3 and len(set(answers)) == 3
+    assert resumed_completions.call_count == 0
+    assert cached_answers == answers
+
+
+@pytest.mark.asyncio
+async def test_changed_request_is_not_cached(create_cached_client):
+    client, _ = create_cached_client()
+    await get_chat_completion(client)
+
+    resumed_client, resumed_completions = create_cached_client()
+    await get_chat_completion(resumed_client, temperature=0.5)
+    await get_chat_completion(resumed_client, prompt="other prompt")
+
+    assert resumed_completions.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_cache_evicts_least_recently_used_responses(create_cached_client):
+    client, _ = create_cached_client(max_size_bytes=2000)
+    for index in range(20):
+        await get_chat_completion(client, prompt=f"prompt {index}")
+
+    assert 0 < len(client._cache) < 20
+    assert client._cache.size_bytes() <= 2000
+
+    resumed_client, resumed_completions = create_cached_client(max_size_bytes=2000)
+    await get_chat_completion(resumed_client, prompt="prompt 19")
+    await get_chat_completion(resumed_client, prompt="prompt 0")
+    assert resumed_completions.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_hits_are_recorded_separately(create_cached_client):
+    assistant_analyzer = AssistantAnalyzer()
+    assistant_analyzer.reset()
+
+    def create_assistant(client):
+        return PlainResponseAI(assistant_name="cached", client=client,
+                               model=OpenAIModelVersion(AIModelType.GPT_4o_MINI.value), instructions="instruction")
+
+    client, _ = create_cached_client()
+    await create_assistant(client).get_response_with_retry("prompt")
+    resumed_client, _ = create_cached_client()
+    await create_assistant(resumed_client).get_response_with_retry("prompt")
+
+    assert assistant_analyzer.total_summary().prompt_tokens == 10
+    assert assistant_analyzer.cache_hit_summary().prompt_tokens == 10
+    assert assistant_analyzer.get_cache_hit_summary_for_assistant("cached").completion_tokens == 20
+    assistant_analyzer.reset()
+
+
+@pytest.mark.asyncio
+async def test_failed_requests_do_not_change_the_cache_keys(tmp_path, analyzer):
+    async def generate(fake_open_ai: FakeAsyncOpenAI, sample_indices: list[int]) -> None:
+        client = CachedOpenAiClient(OpenAiClient(fake_open_ai), ResponseCache(tmp_path / "responses.sqlite"))
+        assistant = PlainResponseAI(assistant_name="cached", client=client,
+                                    model=OpenAIModelVersion(AIModelType.GPT_4o_MINI.value), instructions="instruction",
+                                    retry_wait_min=0, retry_wait_max=0, retry_attempts=20)
+
+        async def generate_sample(sample_index: int) -> None:
+            set_current_sample_index(sample_index)
+            for _ in range(3):
+                await assistant.get_response_with_retry("prompt")
+
+        await asyncio.gather(*(generate_sample(sample_index) for sample_index in sample_indices))
+
+    failing_open_ai = FakeAsyncOpenAI(rate_limit_error_rate=0.5, seed=3)
+    await generate(failing_open_ai, list(range(5)))
+    analyzer.reset()
+    resumed_open_ai = FakeAsyncOpenAI()
+    await generate(resumed_open_ai, list(reversed(range(5))))
+
+    assert failing_open_ai.rate_limit_error_count > 0
+    assert resumed_open_ai.call_count == 0
+    assert analyzer.cache_hit_summary().call_count == 15 and analyzer.total_summary().call_count == 0
@@ -0,0 +1,176 @@
+import asyncio
+import pickle
+from dataclasses import dataclass
+
+import pytest
+
+from src.synthetic_data_generator.ai_graph.graph_compiler import GraphCompiler
+from src.synthetic_data_generator.ai_graph.key_value_store import KeyValueStore
+from src.synthetic_data_generator.ai_graph.nodes.executable_node import ExecutableNode
+from src.synthetic_data_generator.ai_graph.ai.base_ai_config import AIModelType, OpenAIModelVersion
+from synthetic_data_generator.ai_graph.ai.fake_open_ai import ConstantLatency, FakeAsyncOpenAI
+from synthetic_data_generator.ai_graph.ai.open_ai_client import OpenAiClient
+from synthetic_data_generator.ai_graph.ai.plain_response_ai import PlainResponseAI
+from synthetic_data_generator.ai_graph.ai.text_stream import TextStream
+
+
+@dataclass
+class Summary:
+    text: str
+
+
+@dataclass
+class Translation:
+    text: str
+
+
+class StreamingNode(ExecutableNode):
+    async def _execute_node(self, shared_storage: KeyValueStore) -> KeyValueStore:
+        text_stream = TextStream()
+
+        async def produce():
+            for delta in ["Hello", " world"]:
+                await asyncio.sleep(0.01)
+                text_stream.append(delta)
+            text_stream.finish()
+
+        text_stream.producer_task = asyncio.create_task(produce())
+        shared_storage.save(text_stream)
+        return shared_storage
+
+
+class StreamConsumerNode(ExecutableNode):
+    def __init__(self, parents, output_type: type):
+        self.output_type = output_type
+        self.read_unfinished_stream = False
+        super().__init__(parents)
+
+    async def _execute_node(self, shared_storage: KeyValueStore) -> KeyValueStore:
+        text_stream = shared_storage.get(TextStream)
+        async for _ in text_stream:
+            self.read_unfinished_stream = not text_stream.done
+            break
+        shared_storage.save(self.output_type(await text_stream.text()))
+        return shared_storage
+
+
+class JoinNode(ExecutableNode):
+    async def _execute_node(self, shared_storage: KeyValueStore) -> KeyValueStore:
+        return shared_storage
+
+
+def create_assistant(fake_open_ai: FakeAsyncOpenAI, retry_attempts: int = 5,
+                     stream_idle_timeout_seconds: float = 60) -> PlainResponseAI:
+    return PlainResponseAI(assistant_name="Stream Test", client=OpenAiClient(fake_open_ai),
+                           model=OpenAIModelVersion(AIModelType.GPT_4o_MINI.value), instructions="instruction",
+                           retry_wait_min=0, retry_wait_max=0, retry_attempts=retry_attempts,
+                           stream_idle_timeout_seconds=stream_idle_timeout_seconds)
+
+
+@pytest.mark.asyncio
+async def test_consumers_receive_all_deltas():
+    text_stream = TextStream()
+
+    async def collect() -> list[str]:
+        return [delta async for delta in text_stream]
+
+    early_consumer = asyncio.create_task(collect())
+    text_stream.append("Hello")
+    await asyncio.sleep(0)
+    text_stream.append(" world")
+    late_consumer = asyncio.create_task(collect())
+    text_stream.finish()
+
+    assert await early_consumer == await late_consumer == ["Hello", " world"]
+    assert await text_stream.text() == "Hello world"
+
+
+@pytest.mark.asyncio
+async def test_failed_stream_raises_in_consumers():
+    text_stream = TextStream()
+    text_stream.append("partial")
+    text_stream.fail(ValueError("connection lost"))
+
+    with pytest.raises(ValueError):
+        await text_stream.text()
+    with pytest.raises(ValueError):
+        text_stream.get_finished_text()
+
+
+def test_finished_stream_is_pickled_as_text():
+    text_stream = pickle.loads(pickle.dumps(TextStream.from_text("ticket body")))
+
+    assert text_stream.get_finished_text() == "ticket body"
+    with pytest.raises(TypeError):
+        pickle.dumps(TextStream())
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("compiled", [True, False])
+async def test_unfinished_stream_is_shared_with_forked_consumers(compiled: bool):
+    streaming_node = StreamingNode([])
+    consumers = [StreamConsumerNode([streaming_node], Summary), StreamConsumerNode([streaming_node], Translation)]
+    sink = JoinNode(consumers)
+
+    if compiled:
+        storage = await GraphCompiler().compile(sink).execute(KeyValueStore())
+    else:
+        storage = await sink.execute(KeyValueStore())
+
+    assert all(consumer.read_unfinished_stream for consumer in consumers)
+    assert storage.get(Summary) == Summary("Hello world")
+    assert storage.get(Translation) == Translation("Hello world")
+
+
+@pytest.mark.asyncio
+async def test_streamed_response_records_usage(analyzer):
+    fake_open_ai = FakeAsyncOpenAI()
+    expected_completion = await OpenAiClient(FakeAsyncOpenAI()).get_chat_completion(
+        prompt="Write a ticket", instruction="instruction", model_version="gpt-4o-mini", temperature=1,
+        max_tokens=4000)
+
+    text_stream = create_assistant(fake_open_ai).stream_response_with_retry("Write a ticket")
+    deltas = [delta async for delta in text_stream]
+
+    assert len(deltas) > 1
+    assert "".join(deltas) == expected_completion.choices[0].message.content
+    assert text_stream.usage.completion_tokens == expected_completion.usage.completion_tokens
+    assert analyzer.total_summary().call_count == 1
+    assert analyzer.total_summary().completion_tokens == expected_completion.usage.completion_tokens
+
+
+@pytest.mark.asyncio
+async def test_stream_is_retried_before_the_first_delta(analyzer):
+    fake_open_ai = FakeAsyncOpenAI(rate_limit_error_rate=0.5, seed=3)
+
+    text_streams = [create_assistant(fake_open_ai, retry_attempts=20).stream_response_with_retry(f"prompt {index}")
+                    for index in range(20)]
+    texts = await asyncio.gather(*(text_stream.text() for text_stream in text_streams))
+
+    assert all(text.startswith("Fake response to:") for text in texts)
+    assert fake_open_ai.rate_limit_error_count > 0
+    assert analyzer.total_summary().call_count == 20
+
+
+@pytest.mark.asyncio
+async def test_idle_stream_fails_after_the_first_delta(analyzer):
+    fake_open_ai = FakeAsyncOpenAI(chunk_latency=ConstantLatency(1))
+
+    text_stream = create_assistant(fake_open_ai, stream_idle_timeout_seconds=0.05).stream_response_with_retry(
+        "prompt")
+
+    with pytest.raises(TimeoutError):
+        await text_stream.text()
+    assert text_stream.partial_text == "Fake"
+    assert fake_open_ai.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_fake_stream_ends_with_usage_chunk():
+    client = OpenAiClient(FakeAsyncOpenAI())
+    chunks = [chunk async for chunk in client.stream_chat_completion(
+        prompt="prompt", instruction="instruction", model_version="gpt-4o-mini", temperature=1, max_tokens=3)]
+
+    assert chunks[-1].choices == []
+    assert chunks[-1].usage.completion_tokens == 3
+    assert chunks[-2].choices[0].finish_reason == "length"
@@ -0,0 +1,121 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from src.synthetic_data_generator.ai_graph.generation_checkpoint import GenerationCheckpoint
+from src.synthetic_data_generator.ai_graph.graph_compiler import GraphCompiler
+from src.synthetic_data_generator.ai_graph.key_value_store import KeyValueStore
+from src.synthetic_data_generator.ai_graph.nodes.executable_node import ExecutableNode
+from src.synthetic_data_generator.ai_graph.sharded_generation_runner import ShardedGenerationRunner
+from src.synthetic_data_generator.random_generators.random_collection import RandomCollectionFactory
+from src.synthetic_data_generator.random_nodes.random_collection_node import RandomCollectionNode
+from tests.conftest import BigEnum, KeyEnum, ValueEnum
+
+
+class ExpensiveNode(ExecutableNode):
+    checkpoint_outputs = True
+
+    def __init__(self, parents, name=None):
+        self.execute_count = 0
+        super().__init__(parents, name)
+
+    @property
+    def output_types(self) -> tuple[type, ...]:
+        return ValueEnum,
+
+    async def _execute_node(self, shared_storage: KeyValueStore) -> KeyValueStore:
+        self.execute_count += 1
+        shared_storage.save(ValueEnum.V3 if shared_storage.get(KeyEnum) == KeyEnum.K1 else ValueEnum.V1)
+        return shared_storage
+
+
+def create_random_graph():
+    collection_factory = RandomCollectionFactory(seed_sequence=np.random.SeedSequence(0))
+    key_node = RandomCollectionNode(KeyEnum, [], collection_factory.build_from_list_of_values(list(KeyEnum)))
+    expensive_node = ExpensiveNode([key_node])
+    return RandomCollectionNode(BigEnum, [expensive_node], collection_factory.build_from_list_of_values(list(BigEnum)))
+
+
+def test_checkpoint_stores_samples_and_seeds(tmp_path):
+    checkpoint = GenerationCheckpoint(tmp_path / "checkpoint.sqlite")
+    seed_sequence = np.random.SeedSequence(2 ** 100 + 3, spawn_key=(4,))
+
+    checkpoint.save_node_output(1, "0:ExpensiveNode", {"KeyEnum": KeyEnum.K2})
+    checkpoint.save_sample(1, seed_sequence, KeyValueStore(KeyEnum.K2, ValueEnum.V1))
+
+    assert checkpoint.completed_sample_indices() == {1}
+    assert [(sample_index, storage.get(ValueEnum)) for sample_index, storage in checkpoint.load_samples()] == [
+        (1, ValueEnum.V1)]
+    assert checkpoint.load_sample_seed_sequence(1).generate_state(4).tolist() == seed_sequence.generate_state(
+        4).tolist()
+    assert checkpoint.load_node_output(1, "0:ExpensiveNode") is None
+
+
+def test_checkpoint_keeps_the_seed_of_the_first_run(tmp_path):
+    checkpoint = GenerationCheckpoint(tmp_path / "checkpoint.sqlite")
+    seed_sequence = checkpoint.resolve_run_seed_sequence(np.random.SeedSequence(11))
+
+    assert checkpoint.resolve_run_seed_sequence().entropy == seed_sequence.entropy == 11
+    with pytest.raises(ValueError):
+        checkpoint.resolve_run_seed_sequence(np.random.SeedSequence(12))
+
+
+def test_compiled_graph_reuses_checkpointed_node_outputs(tmp_path):
+    checkpoint = GenerationCheckpoint(tmp_path / "checkpoint.sqlite")
+    sink = create_random_graph()
+    compiled_graph = GraphCompiler().compile(sink)
+    compiled_graph.node_output_store = checkpoint
+    expensive_node = sink.parents[0]
+
+    def execute_sample(sample_index: int) -> KeyValueStore:
+        return asyncio.run(compiled_graph.execute(KeyValueStore(rng=np.random.default_rng(sample_index)),
+                                                  sample_index))
+
+    first_storages = [execute_sample(sample_index) for sample_index in range(5)]
+    second_storages = [execute_sample(sample_index) for sample_index in range(5)]
+
+    assert expensive_node.execute_count == 5
+    assert [storage.storage for storage in first_storages] == [storage.storage for storage in second_storages]
+
+
+def test_checkpointed_node_outputs_are_reused_by_pruned_graphs(tmp_path):
+    checkpoint = GenerationCheckpoint(tmp_path / "checkpoint.sqlite")
+    collection_factory = RandomCollectionFactory(seed_sequence=np.random.SeedSequence(0))
+    big_node = RandomCollectionNode(BigEnum, [], collection_factory.build_from_list_of_values(list(BigEnum)))
+    key_node = RandomCollectionNode(KeyEnum, [], collection_factory.build_from_list_of_values(list(KeyEnum)))
+    expensive_node = ExpensiveNode([key_node])
+
+    def execute_batch(*sinks, requested_types=None) -> list[ValueEnum]:
+        compiled_graph = GraphCompiler().compile(*sinks, requested_types=requested_types)
+        compiled_graph.node_output_store = checkpoint
+        storages = asyncio.run(compiled_graph.execute_batch(5, seed_sequence=np.random.SeedSequence(3)))
+        return [storage.get(ValueEnum) for storage in storages]
+
+    values = execute_batch(big_node, expensive_node)
+
+    assert execute_batch(big_node, expensive_node, requested_types=[ValueEnum]) == values
+    assert expensive_node.execute_count == 5
+
+
+def test_checkpointed_nodes_need_distinct_keys():
+    key_node = RandomCollectionNode(KeyEnum, [], RandomCollectionFactory().build_from_list_of_values(list(KeyEnum)))
+
+    with pytest.raises(ValueError):
+        GraphCompiler().compile(ExpensiveNode([key_node]), ExpensiveNode([key_node]))
+    GraphCompiler().compile(ExpensiveNode([key_node], name="first"), ExpensiveNode([key_node], name="second"))
+
+
+def test_runner_resumes_from_checkpoint(tmp_path):
+    def generate(sample_count: int, checkpoint_path=None):
+        runner = ShardedGenerationRunner(create_random_graph, worker_count=2, chunk_size=8,
+                                         checkpoint_path=checkpoint_path)
+        return [(sample_index, storage.storage) for sample_index, storage in
+                runner.run(sample_count, np.random.SeedSequence(21))]
+
+    checkpoint_path = tmp_path / "checkpoint.sqlite"
+    generate(20, checkpoint_path)
+    resumed_results = generate(40, checkpoint_path)
+
+    assert resumed_results == generate(40)
+    assert GenerationCheckpoint(checkpoint_path).completed_sample_indices() == set(range(40))
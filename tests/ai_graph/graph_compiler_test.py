@@ -0,0 +1,168 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from src.synthetic_data_generator.ai_graph.graph_compiler import GraphCompiler, GraphCycleError
+from src.synthetic_data_generator.ai_graph.key_value_store import KeyValueStore, inject_storage_objects
+from src.synthetic_data_generator.ai_graph.nodes.executable_node import ExecutableNode
+from src.synthetic_data_generator.random_generators.random_collection import RandomCollectionFactory
+from src.synthetic_data_generator.random_nodes.random_collection_node import RandomCollectionNode
+from tests.conftest import BigEnum, KeyEnum, ValueEnum
+
+
+class CountingNode(ExecutableNode):
+    def __init__(self, parents, value=None, latency: float = 0):
+        self.value = value
+        self.latency = latency
+        self.execute_count = 0
+        super().__init__(parents)
+
+    @property
+    def output_types(self) -> tuple[type, ...]:
+        return (type(self.value),) if self.value is not None else ()
+
+    async def _execute_node(self, shared_storage: KeyValueStore) -> KeyValueStore:
+        self.execute_count += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.value is not None:
+            shared_storage.save(self.value)
+        return shared_storage
+
+
+def test_compile_builds_topological_waves():
+    root = CountingNode([])
+    left = CountingNode([root])
+    right = CountingNode([root])
+    sink = CountingNode([left, right, root])
+
+    compiled_graph = GraphCompiler().compile(sink)
+
+    assert compiled_graph.waves == [[root], [left, right], [sink]]
+
+
+def test_compile_detects_cycles():
+    root = CountingNode([])
+    middle = CountingNode([root])
+    sink = CountingNode([middle])
+    root._parents.append(sink)
+
+    with pytest.raises(GraphCycleError):
+        GraphCompiler().compile(sink)
+
+
+def test_execute_diamond_runs_every_node_once():
+    root = CountingNode([], KeyEnum.K1)
+    left = CountingNode([root], ValueEnum.V2)
+    right = CountingNode([root], BigEnum.B3)
+    sink = CountingNode([left, right])
+
+    storage = asyncio.run(GraphCompiler().compile(sink).execute())
+
+    assert storage.get(KeyEnum) == KeyEnum.K1
+    assert storage.get(ValueEnum) == ValueEnum.V2
+    assert storage.get(BigEnum) == BigEnum.B3
+    assert root.execute_count == left.execute_count == right.execute_count == sink.execute_count == 1
+
+
+def test_execute_multiple_sinks_merges_their_outputs():
+    root = CountingNode([], KeyEnum.K2)
+    first_sink = CountingNode([root], ValueEnum.V1)
+    second_sink = CountingNode([root], BigEnum.B1)
+
+    storage = asyncio.run(GraphCompiler().compile(first_sink, second_sink).execute())
+
+    assert storage.get(ValueEnum) == ValueEnum.V1
+    assert storage.get(BigEnum) == BigEnum.B1
+    assert root.execute_count == 1
+
+
+def test_execute_runs_nodes_of_a_wave_concurrently():
+    root = CountingNode([])
+    sink = CountingNode([CountingNode([root], latency=0.1) for _ in range(10)])
+
+    start = time.perf_counter()
+    asyncio.run(GraphCompiler().compile(sink).execute())
+
+    assert time.perf_counter() - start < 0.5
+
+
+def test_execute_deep_diamond():
+    node = CountingNode([])
+    for _ in range(200):
+        node = CountingNode([CountingNode([node]), CountingNode([node])])
+
+    compiled_graph = GraphCompiler().compile(node)
+    asyncio.run(compiled_graph.execute(KeyValueStore(copy_on_write=True)))
+
+    assert len(compiled_graph.waves) == 401
+    assert all(compiled_node.execute_count == 1 for compiled_node in compiled_graph.nodes)
+
+
+def test_execute_batch_is_reproducible(create_random_collection_node):
+    random_collection_node = create_random_collection_node({ValueEnum.V1: 1, ValueEnum.V2: 1, ValueEnum.V3: 1})
+    compiled_graph = GraphCompiler().compile(CountingNode([random_collection_node]))
+
+    def execute_batch(seed: int) -> list:
+        storages = asyncio.run(compiled_graph.execute_batch(50, seed_sequence=np.random.SeedSequence(seed)))
+        return [storage.get(ValueEnum) for storage in storages]
+
+    assert execute_batch(3) == execute_batch(3)
+    assert execute_batch(3) != execute_batch(4)
+    assert not random_collection_node._executions
+
+
+def test_random_values_do_not_depend_on_the_node_order():
+    collection_factory = RandomCollectionFactory(seed_sequence=np.random.SeedSequence(0))
+    key_node = RandomCollectionNode(KeyEnum, [], collection_factory.build_from_list_of_values(list(KeyEnum)))
+    big_node = RandomCollectionNode(BigEnum, [], collection_factory.build_from_list_of_values(list(BigEnum)))
+
+    def execute_batch(*sinks) -> list:
+        storages = asyncio.run(GraphCompiler().compile(*sinks).execute_batch(
+            30, seed_sequence=np.random.SeedSequence(5)))
+        return [(storage.get(KeyEnum) if KeyEnum in storage else None, storage.get(BigEnum)) for storage in storages]
+
+    samples = execute_batch(key_node, big_node)
+    assert execute_batch(big_node, key_node) == samples
+    assert execute_batch(big_node) == [(None, big_value) for _, big_value in samples]
+    storages = asyncio.run(CountingNode([big_node, key_node]).execute_batch(
+        30, seed_sequence=np.random.SeedSequence(5)))
+    assert [(storage.get(KeyEnum), storage.get(BigEnum)) for storage in storages] == samples
+
+
+def test_compile_with_requested_types_skips_unneeded_nodes():
+    root = CountingNode([], KeyEnum.K1)
+    needed = CountingNode([root], ValueEnum.V1)
+    enrichment = CountingNode([root], BigEnum.B2)
+    sink = CountingNode([needed, enrichment])
+
+    compiled_graph = GraphCompiler().compile(sink, requested_types=[ValueEnum])
+    storage = asyncio.run(compiled_graph.execute())
+
+    assert storage.get(ValueEnum) == ValueEnum.V1
+    assert storage.get(KeyEnum) == KeyEnum.K1
+    assert enrichment.execute_count == sink.execute_count == 0
+    assert compiled_graph.nodes == [root, needed]
+
+
+def test_compile_with_injected_types_of_consumer():
+    class Consumer:
+        @inject_storage_objects(KeyEnum, ValueEnum)
+        def consume(self, shared_storage, key, value):
+            return key, value
+
+    root = CountingNode([], KeyEnum.K2)
+    sink = CountingNode([CountingNode([root], ValueEnum.V2), CountingNode([root], BigEnum.B1)])
+
+    compiled_graph = GraphCompiler().compile(sink, requested_types=Consumer.consume.injected_types)
+    storage = asyncio.run(compiled_graph.execute())
+
+    assert Consumer().consume(storage) == (KeyEnum.K2, ValueEnum.V2)
+    assert len(compiled_graph.nodes) == 2
+
+
+def test_compile_with_requested_type_without_producer():
+    with pytest.raises(ValueError):
+        GraphCompiler().compile(CountingNode([], KeyEnum.K1), requested_types=[ValueEnum])
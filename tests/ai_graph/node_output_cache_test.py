@@ -0,0 +1,116 @@
+import asyncio
+from typing import Optional
+
+import numpy as np
+
+from src.synthetic_data_generator.ai_graph.graph_compiler import GraphCompiler
+from src.synthetic_data_generator.ai_graph.key_value_store import KeyValueStore
+from src.synthetic_data_generator.ai_graph.node_output_cache import NodeOutputCache
+from src.synthetic_data_generator.ai_graph.nodes.executable_node import ExecutableNode
+from src.synthetic_data_generator.random_generators.random_collection import RandomCollectionFactory
+from src.synthetic_data_generator.random_nodes.random_collection_node import RandomCollectionNode
+from tests.conftest import BigEnum, KeyEnum, ValueEnum
+
+
+class CountingRandomCollectionNode(RandomCollectionNode):
+    def __init__(self, value_type, parents, random_generator):
+        self.execute_count = 0
+        super().__init__(value_type, parents, random_generator)
+
+    async def _execute_node(self, shared_storage: KeyValueStore) -> KeyValueStore:
+        self.execute_count += 1
+        return await super()._execute_node(shared_storage)
+
+
+class InstructedNode(ExecutableNode):
+    def __init__(self, parents, instructions: str):
+        self.instructions = instructions
+        self.execute_count = 0
+        super().__init__(parents)
+
+    @property
+    def config_fingerprint(self) -> str:
+        return f"InstructedNode:{self.instructions}"
+
+    async def _execute_node(self, shared_storage: KeyValueStore) -> KeyValueStore:
+        self.execute_count += 1
+        shared_storage.save(ValueEnum.V1 if self.instructions == "first" else ValueEnum.V2)
+        return shared_storage
+
+
+def create_graph(instructions: str = "first", seeded: bool = True):
+    collection_factory = RandomCollectionFactory(seed_sequence=np.random.SeedSequence(0) if seeded else None)
+    key_node = CountingRandomCollectionNode(KeyEnum, [],
+                                            collection_factory.build_from_list_of_values(list(KeyEnum)))
+    instructed_node = InstructedNode([key_node], instructions)
+    sink = CountingRandomCollectionNode(BigEnum, [instructed_node],
+                                        collection_factory.build_from_list_of_values(list(BigEnum)))
+    return key_node, instructed_node, sink
+
+
+def run_graph(sink, node_output_cache: Optional[NodeOutputCache], seed: int = 5) -> list[tuple]:
+    compiled_graph = GraphCompiler().compile(sink)
+    compiled_graph.node_output_cache = node_output_cache
+    storages = asyncio.run(compiled_graph.execute_batch(20, seed_sequence=np.random.SeedSequence(seed)))
+    return [(storage.get(KeyEnum), storage.get(ValueEnum), storage.get(BigEnum)) for storage in storages]
+
+
+def test_rerun_reuses_all_memoized_outputs(tmp_path):
+    node_output_cache = NodeOutputCache(tmp_path / "cache.sqlite")
+    first_samples = run_graph(create_graph()[2], node_output_cache)
+
+    key_node, instructed_node, sink = create_graph()
+    assert run_graph(sink, node_output_cache) == first_samples
+    assert key_node.execute_count == instructed_node.execute_count == sink.execute_count == 0
+    assert len(node_output_cache) == 60
+
+
+def test_changed_node_reruns_with_its_descendants_only(tmp_path):
+    node_output_cache = NodeOutputCache(tmp_path / "cache.sqlite")
+    first_samples = run_graph(create_graph("first")[2], node_output_cache)
+
+    key_node, instructed_node, sink = create_graph("second")
+    samples = run_graph(sink, node_output_cache)
+
+    assert key_node.execute_count == 0
+    assert instructed_node.execute_count == sink.execute_count == 20
+    assert [key for key, _, _ in samples] == [key for key, _, _ in first_samples]
+    assert {value for _, value, _ in samples} == {ValueEnum.V2}
+
+
+def test_reused_nodes_do_not_change_the_values_of_rerun_nodes(tmp_path):
+    node_output_cache = NodeOutputCache(tmp_path / "cache.sqlite")
+    run_graph(create_graph("first")[2], node_output_cache)
+
+    assert run_graph(create_graph("second")[2], node_output_cache) == run_graph(create_graph("second")[2], None)
+
+
+def test_different_seed_does_not_reuse_outputs(tmp_path):
+    node_output_cache = NodeOutputCache(tmp_path / "cache.sqlite")
+    run_graph(create_graph()[2], node_output_cache, seed=5)
+
+    key_node, instructed_node, sink = create_graph()
+    run_graph(sink, node_output_cache, seed=6)
+
+    assert key_node.execute_count == instructed_node.execute_count == sink.execute_count == 20
+
+
+def test_nodes_with_unseeded_generators_are_not_memoized(tmp_path, caplog):
+    node_output_cache = NodeOutputCache(tmp_path / "cache.sqlite")
+    run_graph(create_graph(seeded=False)[2], node_output_cache)
+
+    key_node, instructed_node, sink = create_graph(seeded=False)
+    run_graph(sink, node_output_cache)
+
+    assert key_node.execute_count == sink.execute_count == 20
+    assert "Not memoizing CountingRandomCollectionNode:KeyEnum, its generator is not seeded" in caplog.text
+
+
+def test_cache_persists_across_connections(tmp_path):
+    node_output_cache = NodeOutputCache(tmp_path / "cache.sqlite")
+    node_output_cache.save("fingerprint", {"KeyEnum": KeyEnum.K1})
+    node_output_cache.close()
+
+    node_output_cache = NodeOutputCache(tmp_path / "cache.sqlite")
+    assert node_output_cache.load("fingerprint") == {"KeyEnum": KeyEnum.K1}
+    assert node_output_cache.load("other") is None
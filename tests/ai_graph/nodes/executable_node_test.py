@@ -1,4 +1,5 @@
 import asyncio
+import time
 
 from src.synthetic_data_generator.ai_graph.key_value_store import KeyValueStore, inject_storage_objects
 from src.synthetic_data_generator.ai_graph.nodes.executable_node import ExecutableNode
@@ -58,3 +59,118 @@ def test_inject_storage_decorator():
             assert value_enum == ValueEnum.V1
 
     return TestClass().decorated_func(shared_storage)
+
+
+class FailingExecutableNode(ExecutableNode):
+    def __init__(self, parents):
+        self.execute_count = 0
+        super().__init__(parents)
+
+    async def _execute_node(self, shared_storage: KeyValueStore) -> KeyValueStore:
+        self.execute_count += 1
+        raise RuntimeError("Node failed")
+
+
+def test_execute_diamond_executes_shared_parent_once(create_enum_save_node):
+    shared_parent = create_enum_save_node(KeyEnum.K1)
+    left = MyExecutableNode([shared_parent])
+    right = MyExecutableNode([shared_parent])
+    node = MyExecutableNode([left, right])
+
+    storage: KeyValueStore = asyncio.run(node.execute())
+
+    assert storage.get(KeyEnum) == KeyEnum.K1
+    assert left.execute_count == right.execute_count == node.execute_count == 1
+
+
+def test_execute_deep_diamond_does_not_poll():
+    node = MyExecutableNode([])
+    for _ in range(20):
+        node = MyExecutableNode([MyExecutableNode([node]), MyExecutableNode([node])])
+
+    start = time.perf_counter()
+    asyncio.run(node.execute())
+
+    assert time.perf_counter() - start < 0.5
+
+
+def test_execute_parent_exception_reaches_every_waiter():
+    failing_parent = FailingExecutableNode([])
+    left = MyExecutableNode([failing_parent])
+    right = MyExecutableNode([failing_parent])
+
+    async def execute_children():
+        return await asyncio.gather(left.execute(), right.execute(), return_exceptions=True)
+
+    results = asyncio.run(execute_children())
+
+    assert failing_parent.execute_count == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+class SlowExecutableNode(MyExecutableNode):
+    async def _execute_node(self, shared_storage: KeyValueStore) -> KeyValueStore:
+        await asyncio.sleep(0.05)
+        return await super()._execute_node(shared_storage)
+
+
+def test_cancelled_caller_does_not_cancel_the_execution_of_other_callers():
+    node = SlowExecutableNode([])
+
+    async def execute_twice():
+        first_execution = asyncio.create_task(node.execute())
+        second_execution = asyncio.create_task(node.execute())
+        await asyncio.sleep(0.01)
+        first_execution.cancel()
+        return await second_execution
+
+    storage: KeyValueStore = asyncio.run(execute_twice())
+
+    assert storage.get(ValueEnum) == ValueEnum.V1
+    assert node.execute_count == 1
+
+
+def test_execute_copy_on_write_storage(create_enum_save_node):
+    shared_parent = create_enum_save_node(KeyEnum.K1)
+    node = MyExecutableNode([MyExecutableNode([shared_parent]), MyExecutableNode([shared_parent])])
+
+    storage: KeyValueStore = asyncio.run(node.execute(KeyValueStore(copy_on_write=True)))
+
+    assert storage.copy_on_write
+    assert storage.get(KeyEnum) == KeyEnum.K1
+    assert storage.get(ValueEnum) == ValueEnum.V1
+
+
+def test_execute_batch_executes_every_node_once_per_sample(create_enum_save_node):
+    shared_parent = MyExecutableNode([create_enum_save_node(KeyEnum.K2)])
+    node = MyExecutableNode([MyExecutableNode([shared_parent]), MyExecutableNode([shared_parent])])
+
+    storages = asyncio.run(node.execute_batch(25, max_concurrent_samples=10))
+
+    assert len(storages) == 25
+    assert all(storage.get(KeyEnum) == KeyEnum.K2 for storage in storages)
+    assert len({id(storage) for storage in storages}) == 25
+    assert shared_parent.execute_count == node.execute_count == 25
+
+
+def test_execute_batch_releases_sample_state():
+    parent = MyExecutableNode([])
+    node = MyExecutableNode([parent])
+
+    asyncio.run(node.execute_batch(3))
+
+    assert not parent._executions and not node._executions
+
+
+def test_execute_batch_does_not_reuse_other_executions():
+    parent = MyExecutableNode([])
+    node = MyExecutableNode([parent])
+
+    async def execute_twice_and_batches():
+        await node.execute()
+        await asyncio.gather(node.execute_batch(3), node.execute_batch(3))
+        await node.execute()
+
+    asyncio.run(execute_twice_and_batches())
+
+    assert parent.execute_count == node.execute_count == 7
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from src.synthetic_data_generator.ai_graph.key_value_store import KeyValueStore
+from src.synthetic_data_generator.ai_graph.nodes.executable_node import ExecutableNode
+from src.synthetic_data_generator.ai_graph.sharded_generation_runner import ShardedGenerationError, \
+    ShardedGenerationRunner
+from src.synthetic_data_generator.random_generators.random_collection import RandomCollectionFactory
+from src.synthetic_data_generator.random_nodes.random_collection_node import RandomCollectionNode
+from tests.conftest import BigEnum, KeyEnum
+
+
+class FailingNode(ExecutableNode):
+    async def _execute_node(self, shared_storage: KeyValueStore) -> KeyValueStore:
+        raise RuntimeError("Node failed")
+
+
+def create_random_graph():
+    collection_factory = RandomCollectionFactory(seed_sequence=np.random.SeedSequence(0))
+    key_node = RandomCollectionNode(KeyEnum, [], collection_factory.build_from_list_of_values(list(KeyEnum)))
+    return RandomCollectionNode(BigEnum, [key_node], collection_factory.build_from_list_of_values(list(BigEnum)))
+
+
+def generate(worker_count: int, sample_count: int = 100, ordered: bool = True, seed: int = 5):
+    runner = ShardedGenerationRunner(create_random_graph, worker_count=worker_count, chunk_size=16)
+    return [(sample_index, storage.get(KeyEnum), storage.get(BigEnum))
+            for sample_index, storage in runner.run(sample_count, np.random.SeedSequence(seed), ordered=ordered)]
+
+
+def test_run_streams_samples_in_order():
+    results = generate(worker_count=3)
+
+    assert [sample_index for sample_index, _, _ in results] == list(range(100))
+    assert {big_value for _, _, big_value in results} == set(BigEnum)
+
+
+def test_run_does_not_depend_on_worker_count():
+    assert generate(worker_count=1) == generate(worker_count=3)
+    assert generate(worker_count=2) != generate(worker_count=2, seed=6)
+
+
+def test_run_unordered_returns_every_sample():
+    results = generate(worker_count=3, ordered=False)
+
+    assert sorted(results) == generate(worker_count=1)
+
+
+def test_run_raises_worker_errors():
+    runner = ShardedGenerationRunner(lambda: FailingNode([]), worker_count=2, chunk_size=4)
+
+    with pytest.raises(ShardedGenerationError, match="Node failed"):
+        list(runner.run(10))
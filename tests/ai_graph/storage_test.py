@@ -1,7 +1,13 @@
+import asyncio
+from enum import Enum
+
+import numpy as np
 import pytest
 
-from src.synthetic_data_generator.ai_graph.key_value_store import KeyValueStore
-from tests.conftest import KeyEnum, ValueEnum
+from src.synthetic_data_generator.ai_graph.graph_compiler import GraphCompiler
+from src.synthetic_data_generator.ai_graph.key_value_store import BaseKeyValueStore, KeyValueStore, \
+    TypedKeyValueStore, inject_storage_objects
+from tests.conftest import BigEnum, KeyEnum, ValueEnum
 
 
 def test_enum_name():
@@ -84,3 +90,161 @@ def test_storage_contains():
     storage.save(KeyEnum.K1)
 
     assert KeyEnum in storage
+
+
+def test_merge_equal_values():
+    storage1 = KeyValueStore(KeyEnum.K1)
+    storage2 = KeyValueStore(KeyEnum.K1, ValueEnum.V1)
+
+    storage1.merge(storage2)
+
+    assert storage1.get(KeyEnum) == KeyEnum.K1
+    assert storage1.get(ValueEnum) == ValueEnum.V1
+
+
+def test_merge_conflicting_values_raises_error():
+    storage1 = KeyValueStore(KeyEnum.K1)
+    storage2 = KeyValueStore(KeyEnum.K2)
+
+    with pytest.raises(ValueError):
+        storage1.merge(storage2)
+
+
+@pytest.mark.parametrize("copy_on_write", [False, True])
+def test_fork_is_independent(copy_on_write):
+    storage = KeyValueStore(KeyEnum.K1, copy_on_write=copy_on_write)
+    forked_storage = storage.fork()
+
+    forked_storage.save(ValueEnum.V1)
+    storage.save(BigEnum.B1)
+
+    assert forked_storage.get(KeyEnum) == KeyEnum.K1
+    assert ValueEnum in forked_storage and BigEnum not in forked_storage
+    assert BigEnum in storage and ValueEnum not in storage
+    assert forked_storage.copy_on_write == copy_on_write
+
+
+def test_copy_on_write_fork_shares_values():
+    value = [1, 2]
+    storage = KeyValueStore(copy_on_write=True)
+    storage.save_by_key("key1", value)
+
+    forked_storage = storage.fork()
+
+    assert forked_storage.get_by_key("key1") is value
+
+
+def test_merge_lists_does_not_mutate_merged_values():
+    list1, list2 = [1, 2], [2, 3]
+    storage1 = KeyValueStore(copy_on_write=True)
+    storage1.save_by_key("key1", list1)
+    storage2 = KeyValueStore(copy_on_write=True)
+    storage2.save_by_key("key1", list2)
+
+    forked_storage = storage1.fork()
+    forked_storage.merge(storage2)
+
+    assert forked_storage.get_by_key("key1") == [1, 2, 2, 3]
+    assert storage1.get_by_key("key1") == list1 == [1, 2]
+    assert list2 == [2, 3]
+
+
+@pytest.mark.parametrize("copy_on_write", [False, True])
+def test_merge_diamond_keeps_inherited_list_once(copy_on_write):
+    storage = KeyValueStore(copy_on_write=copy_on_write)
+    storage.save_by_key("key1", [KeyEnum.K1])
+    left_storage, right_storage = storage.fork(), storage.fork()
+    left_storage.save_by_key("key2", [ValueEnum.V1])
+    right_storage.save_by_key("key2", [ValueEnum.V2])
+
+    left_storage.merge(right_storage)
+
+    assert left_storage.get_by_key("key1") == [KeyEnum.K1]
+    assert left_storage.get_by_key("key2") == [ValueEnum.V1, ValueEnum.V2]
+
+
+def test_merge_independent_equal_lists_concatenates():
+    storage1 = KeyValueStore()
+    storage2 = KeyValueStore()
+    storage1.save_by_key("key1", [KeyEnum.K1])
+    storage2.save_by_key("key1", [KeyEnum.K1])
+
+    storage1.merge(storage2)
+
+    assert storage1.get_by_key("key1") == [KeyEnum.K1, KeyEnum.K1]
+
+
+def test_restored_values_keep_their_origin():
+    storage = KeyValueStore()
+    storage.save_by_key("key1", [KeyEnum.K1])
+    restored_storage = storage.fork()
+    restored_storage.restore({"key1": [KeyEnum.K1], "key2": [ValueEnum.V1]})
+
+    storage.merge(restored_storage)
+
+    assert storage.get_by_key("key1") == [KeyEnum.K1]
+    assert storage.get_by_key("key2") == [ValueEnum.V1]
+
+
+@pytest.mark.parametrize("copy_on_write", [False, True])
+def test_fork_shares_rng(copy_on_write):
+    rng = np.random.default_rng(0)
+    storage = KeyValueStore(copy_on_write=copy_on_write, rng=rng)
+
+    assert storage.fork().rng is rng
+
+
+def test_typed_storage_separates_types_with_the_same_name():
+    first_color = Enum("Color", ["RED"])
+    second_color = Enum("Color", ["RED"])
+    storage = TypedKeyValueStore(first_color.RED)
+
+    storage.save(second_color.RED)
+
+    assert storage.get(first_color) is first_color.RED
+    assert storage.get(second_color) is second_color.RED
+    with pytest.raises(ValueError):
+        KeyValueStore(first_color.RED, second_color.RED)
+
+
+def test_typed_storage_has_no_instance_dict():
+    storage = TypedKeyValueStore(ValueEnum.V1)
+
+    assert not hasattr(storage, "__dict__")
+    assert ValueEnum in storage and KeyEnum not in storage
+
+
+def test_base_storage_requires_a_key_function():
+    with pytest.raises(TypeError):
+        BaseKeyValueStore()
+
+
+@pytest.mark.parametrize("copy_on_write", [False, True])
+def test_typed_storage_fork_and_merge(copy_on_write):
+    storage = TypedKeyValueStore(KeyEnum.K1, copy_on_write=copy_on_write)
+    left_storage = storage.fork()
+    right_storage = storage.fork()
+    left_storage.save(ValueEnum.V2)
+    right_storage.save(BigEnum.B5)
+
+    storage.merge(left_storage, right_storage)
+
+    assert isinstance(left_storage, TypedKeyValueStore)
+    assert [storage.get(KeyEnum), storage.get(ValueEnum), storage.get(BigEnum)] == [KeyEnum.K1, ValueEnum.V2,
+                                                                                   BigEnum.B5]
+
+
+def test_typed_storage_in_graph(create_random_table_node):
+    class ValueReader:
+        @inject_storage_objects(KeyEnum, ValueEnum)
+        def read(self, _shared_storage, key_enum: KeyEnum, value_enum: ValueEnum):
+            return key_enum, value_enum
+
+    random_table_node = create_random_table_node(KeyEnum.K2, {KeyEnum.K1: {ValueEnum.V1: 1, ValueEnum.V2: 0,
+                                                                           ValueEnum.V3: 0},
+                                                              KeyEnum.K2: {ValueEnum.V1: 0, ValueEnum.V2: 0,
+                                                                           ValueEnum.V3: 1}})
+    storage = asyncio.run(GraphCompiler().compile(random_table_node).execute(TypedKeyValueStore()))
+
+    assert isinstance(storage, TypedKeyValueStore)
+    assert ValueReader().read(storage) == (KeyEnum.K2, ValueEnum.V3)
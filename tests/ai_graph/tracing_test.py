@@ -0,0 +1,100 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+from openai.types.chat import ChatCompletion
+
+from src.synthetic_data_generator.ai_graph.ai.base_ai_config import AIModelType, OpenAIModelVersion
+from src.synthetic_data_generator.ai_graph.graph_compiler import GraphCompiler
+from src.synthetic_data_generator.ai_graph.key_value_store import KeyValueStore
+from src.synthetic_data_generator.ai_graph.nodes.executable_node import ExecutableNode
+from src.synthetic_data_generator.ai_graph.tracing import Tracer, get_tracer, set_tracer
+from synthetic_data_generator.ai_graph.ai.base_ai_analysis import AssistantAnalyzer
+from synthetic_data_generator.ai_graph.ai.open_ai_client import OpenAiClient
+from synthetic_data_generator.ai_graph.ai.plain_response_ai import PlainResponseAI
+
+
+class SleepingNode(ExecutableNode):
+    def __init__(self, parents, latency: float = 0):
+        self.latency = latency
+        super().__init__(parents)
+
+    async def _execute_node(self, shared_storage: KeyValueStore) -> KeyValueStore:
+        await asyncio.sleep(self.latency)
+        return shared_storage
+
+
+class FlakyCompletions:
+    def __init__(self, failure_count: int):
+        self.failure_count = failure_count
+
+    async def create(self, model, **kwargs):
+        if self.failure_count > 0:
+            self.failure_count -= 1
+            raise openai.APITimeoutError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+        return ChatCompletion.model_validate({
+            "id": "completion", "object": "chat.completion", "created": 0, "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "answer"}}],
+            "usage": {"prompt_tokens": 12, "completion_tokens": 34, "total_tokens": 46}
+        })
+
+
+@pytest.fixture
+def tracer():
+    tracer = Tracer()
+    set_tracer(tracer)
+    yield tracer
+    set_tracer(None)
+    AssistantAnalyzer().reset()
+
+
+def test_tracing_is_disabled_by_default():
+    assert get_tracer() is None
+    asyncio.run(GraphCompiler().compile(SleepingNode([SleepingNode([])])).execute())
+
+
+def test_compiled_graph_records_node_spans(tracer):
+    slow_node = SleepingNode([], latency=0.05)
+    fast_node = SleepingNode([])
+    sink = SleepingNode([slow_node, SleepingNode([fast_node])])
+
+    asyncio.run(GraphCompiler().compile(sink).execute_batch(2))
+
+    node_spans = [span for span in tracer.spans if span.category == "node"]
+    assert len(node_spans) == 8
+    assert {span.sample_index for span in node_spans} == {0, 1}
+    waiting_spans = [span for span in node_spans if span.attributes["queue_wait_seconds"] > 0.03]
+    assert len(waiting_spans) == 2
+
+
+def test_executable_node_records_parent_wait(tracer):
+    sink = SleepingNode([SleepingNode([], latency=0.05)])
+
+    asyncio.run(sink.execute(sample_index=3))
+
+    sink_span = next(span for span in tracer.spans if span.attributes["parent_wait_seconds"] > 0.03)
+    assert sink_span.sample_index == 3
+    assert len(tracer.spans) == 2
+
+
+def test_ai_model_records_tokens_and_retries(tracer, tmp_path):
+    async_open_ai = SimpleNamespace(chat=SimpleNamespace(completions=FlakyCompletions(failure_count=2)))
+    assistant = PlainResponseAI(assistant_name="Ticket Writer", client=OpenAiClient(async_open_ai),
+                                model=OpenAIModelVersion(AIModelType.GPT_4o_MINI.value), retry_wait_min=0,
+                                retry_wait_max=0, retry_attempts=3)
+
+    assert asyncio.run(assistant.get_response_with_retry("prompt")) == "answer"
+
+    ai_spans = [span for span in tracer.spans if span.category == "ai"]
+    assert len(ai_spans) == 3
+    assert ai_spans[-1].attributes["prompt_tokens"] == 12
+    assert ai_spans[-1].attributes["completion_tokens"] == 34
+    assert [event.attributes["attempt_number"] for event in tracer.instant_events] == [1, 2]
+
+    trace_path = tmp_path / "trace.json"
+    tracer.export_chrome_trace(trace_path)
+    trace_events = json.loads(trace_path.read_text())["traceEvents"]
+    assert {trace_event["ph"] for trace_event in trace_events} == {"X", "i"}
@@ -21,6 +21,7 @@ from src.synthetic_data_generator.random_generators.random_collection_table impo
 from src.synthetic_data_generator.random_nodes.random_collection_node import RandomCollectionNode
 from src.synthetic_data_generator.random_nodes.random_table_node import RandomTableNode
 from src.synthetic_data_generator.random_nodes.ticket_field import ComparableEnum
+from synthetic_data_generator.ai_graph.ai.base_ai_analysis import AssistantAnalyzer as AIModelAnalyzer
 from synthetic_data_generator.ai_graph.ai.open_ai_client import OpenAiClient
 from synthetic_data_generator.ai_graph.ai.plain_response_ai import PlainResponseAI
 
@@ -135,6 +136,14 @@ def chat_assistant_analyzer():
     AssistantAnalyzer().reset()
 
 
+@pytest.fixture
+def analyzer():
+    # The analyzer the AI models record their runs in, imported without the src prefix like the models import it
+    AIModelAnalyzer().reset()
+    yield AIModelAnalyzer()
+    AIModelAnalyzer().reset()
+
+
 @pytest.fixture
 def create_enum_save_node():
     def _create_enum_save_node(key_enum_value: KeyEnum):
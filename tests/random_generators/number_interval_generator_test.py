@@ -0,0 +1,63 @@
+from statistics import NormalDist
+
+import numpy as np
+import pytest
+
+from src.synthetic_data_generator.random_generators.number_interval_generator import NumberInterval, \
+    NumberIntervalGenerator, TruncatedNormalNumberGenerator
+
+
+@pytest.mark.parametrize("mean,standard_deviation,lower_bound,upper_bound", [
+    (10, 5, 0, 1e40),
+    (0, 1, 40, 45),
+    (0, 1, -1e6, -1e6 + 3),
+    (100, 30, 90, 90),
+    (5, 0, 0, 3),
+])
+def test_truncated_normal_numbers_in_bounds(mean, standard_deviation, lower_bound, upper_bound):
+    number_bounds = NumberInterval(lower_bound, upper_bound)
+    numbers = TruncatedNormalNumberGenerator().generate_bounded_numbers(1000, mean, standard_deviation, number_bounds)
+
+    assert len(numbers) == 1000
+    assert all(number in number_bounds for number in numbers)
+
+
+def test_truncated_normal_number_distribution(normalized_number_generator):
+    number_bounds = NumberInterval(8, 14)
+    numbers = TruncatedNormalNumberGenerator().generate_bounded_numbers(20_000, 10, 3, number_bounds)
+    rejection_sampled_numbers = [normalized_number_generator.generate_bounded_number(10, 3, number_bounds) for _ in
+                                 range(20_000)]
+
+    for number in range(8, 15):
+        assert np.mean(numbers == number) == pytest.approx(rejection_sampled_numbers.count(number) / 20_000, abs=0.02)
+
+
+def test_standard_normal_inverse_cdf():
+    probabilities = np.concatenate([np.geomspace(np.finfo(float).tiny, 0.5, 200), np.linspace(0.01, 0.99, 99),
+                                    1 - np.geomspace(1e-15, 0.5, 200)])
+
+    numbers = TruncatedNormalNumberGenerator()._standard_normal_inverse_cdf(probabilities)
+
+    expected_numbers = [NormalDist().inv_cdf(probability) for probability in probabilities]
+    assert numbers == pytest.approx(expected_numbers, rel=1e-8, abs=1e-9)
+
+
+def test_truncated_normal_number_far_tail():
+    numbers = TruncatedNormalNumberGenerator().generate_bounded_numbers(1000, 0, 1, NumberInterval(100, 200))
+    assert np.mean(numbers == 100) > 0.99
+
+
+def test_truncated_normal_number_without_integer_in_bounds():
+    with pytest.raises(ValueError):
+        TruncatedNormalNumberGenerator().generate_bounded_number(0, 1, NumberInterval(0.2, 0.8))
+
+
+def test_generate_multiple_bounds():
+    number_interval_generator = NumberIntervalGenerator(mean=100, standard_deviation=20, min_upper_bound_difference=10,
+                                                        lower_number_generator=TruncatedNormalNumberGenerator())
+    intervals = number_interval_generator.generate_multiple_bounds(100)
+
+    assert len(intervals) == 100
+    for interval in intervals:
+        assert interval.lower_bound >= 0
+        assert interval.upper_bound == number_interval_generator._generate_upper_bound(interval.lower_bound)
@@ -1,4 +1,8 @@
-from src.synthetic_data_generator.random_generators.random_collection import RandomCollection, RandomCollectionFactory
+import numpy as np
+import pytest
+
+from src.synthetic_data_generator.random_generators.random_collection import AliasRandomCollection, RandomCollection, \
+    RandomCollectionFactory
 from src.synthetic_data_generator.random_generators.random_collection_interface import IRandom
 from src.synthetic_data_generator.random_generators.random_collection_table import RandomTableBuilder
 from tests.conftest import BigEnum, KeyEnum, ValueEnum
@@ -54,3 +58,96 @@ def test_build_table_from_dict():
     random_table = RandomTableBuilder().build_from_dict(KeyEnum, ValueEnum, value_weight_dict)
     assert random_table.get_random_value(KeyEnum.K1) is ValueEnum.V3
     assert random_table.get_random_value(KeyEnum.K2) is ValueEnum.V1
+
+
+def test_random_collection_sample():
+    VALUES = [ValueEnum.V1, ValueEnum.V2, ValueEnum.V3]
+    WEIGHTS = [0.1, 0.3, 0.6]
+
+    random_values = RandomCollection(VALUES, WEIGHTS, randomization_factor=1).sample(10_000)
+
+    assert len(random_values) == 10_000
+    for value, weight in zip(VALUES, WEIGHTS):
+        assert abs(random_values.count(value) / len(random_values) - weight) < 0.05
+
+
+def test_random_collection_sample_excluding_renormalizes():
+    VALUES = [ValueEnum.V1, ValueEnum.V2, ValueEnum.V3]
+    WEIGHTS = [1e-9, 1, 3]
+
+    random_values = RandomCollection(VALUES, WEIGHTS, randomization_factor=1).sample(10_000,
+                                                                                     excluding=[ValueEnum.V2,
+                                                                                                ValueEnum.V3])
+
+    assert set(random_values) == {ValueEnum.V1}
+
+
+def test_random_collection_excluding_all_values():
+    random_collection = RandomCollection([ValueEnum.V1, ValueEnum.V2], [1, 1])
+
+    with pytest.raises(ValueError):
+        random_collection.get_random_value(excluding=[ValueEnum.V1, ValueEnum.V2])
+
+
+def test_random_collection_get_random_value_excluding():
+    random_collection = RandomCollectionFactory().build_from_enum(ValueEnum)
+    for _ in range(100):
+        assert random_collection.get_random_value(excluding=[ValueEnum.V1]) in [ValueEnum.V2, ValueEnum.V3]
+
+
+def test_alias_random_collection():
+    VALUES = [ValueEnum.V1, ValueEnum.V2, ValueEnum.V3]
+    WEIGHTS = [0.1, 0.3, 0.6]
+    random_collection = AliasRandomCollection(VALUES, WEIGHTS, randomization_factor=1)
+
+    random_values = [random_collection.get_random_value() for _ in range(10_000)]
+    sampled_values = random_collection.sample(10_000)
+
+    for value, weight in zip(VALUES, WEIGHTS):
+        assert abs(random_values.count(value) / len(random_values) - weight) < 0.05
+        assert abs(sampled_values.count(value) / len(sampled_values) - weight) < 0.05
+
+
+def test_alias_random_collection_excluding():
+    random_collection = AliasRandomCollection([ValueEnum.V1, ValueEnum.V2, ValueEnum.V3], [1, 1, 1])
+    assert set(random_collection.sample(1000, excluding=[ValueEnum.V1])) == {ValueEnum.V2, ValueEnum.V3}
+
+
+def test_factory_builds_alias_collection_above_threshold():
+    factory = RandomCollectionFactory(alias_method_threshold=3)
+    assert type(factory.build_from_list_of_values([1, 2])) is RandomCollection
+    assert type(factory.build_from_list_of_values([1, 2, 3])) is AliasRandomCollection
+    assert type(factory.build_from_enum(ValueEnum)) is AliasRandomCollection
+
+
+def test_build_alias_table_from_dict():
+    value_weight_dict = {
+        KeyEnum.K1: {ValueEnum.V1: 0, ValueEnum.V2: 0, ValueEnum.V3: 1},
+        KeyEnum.K2: {ValueEnum.V1: 1, ValueEnum.V2: 0, ValueEnum.V3: 0}
+    }
+
+    random_table = RandomTableBuilder(RandomCollectionFactory(alias_method_threshold=1)).build_from_dict(
+        KeyEnum, ValueEnum, value_weight_dict)
+    for _ in range(100):
+        assert random_table.get_random_value(KeyEnum.K1) is ValueEnum.V3
+        assert random_table.get_random_value(KeyEnum.K2) is ValueEnum.V1
+
+
+def test_random_collection_factory_seed_sequence_is_reproducible():
+    def sample_values(seed: int) -> list:
+        factory = RandomCollectionFactory(seed_sequence=np.random.SeedSequence(seed))
+        return factory.build_from_list_of_values(list(range(100))).sample(50)
+
+    assert sample_values(1) == sample_values(1)
+    assert sample_values(1) != sample_values(2)
+
+
+@pytest.mark.parametrize("collection_type", [RandomCollection, AliasRandomCollection])
+def test_random_collection_uses_passed_rng(collection_type):
+    random_collection = collection_type(list(range(100)), [1 for _ in range(100)])
+
+    random_values = [random_collection.get_random_value(rng=np.random.default_rng(3)) for _ in range(10)]
+
+    assert len(set(random_values)) == 1
+    assert random_collection.sample(20, rng=np.random.default_rng(3)) == random_collection.sample(
+        20, rng=np.random.default_rng(3))
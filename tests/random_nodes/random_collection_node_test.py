@@ -1,5 +1,7 @@
 import asyncio
 
+import numpy as np
+
 from tests.conftest import ValueEnum
 
 
@@ -13,3 +15,20 @@ def test_random_collection_node_multiple_times(create_random_collection_node):
     random_value = asyncio.run(random_collection_node.execute()).get(ValueEnum)
     for _ in range(10):
         assert asyncio.run(random_collection_node.execute()).get(ValueEnum) == random_value
+
+
+def test_random_collection_node_batch(create_random_collection_node):
+    random_collection_node = create_random_collection_node({ ValueEnum.V1: 1, ValueEnum.V2: 1, ValueEnum.V3: 1 })
+    storages = asyncio.run(random_collection_node.execute_batch(100))
+    assert { storage.get(ValueEnum) for storage in storages } == { ValueEnum.V1, ValueEnum.V2, ValueEnum.V3 }
+
+
+def test_random_collection_node_batch_is_reproducible(create_random_collection_node):
+    random_collection_node = create_random_collection_node({ ValueEnum.V1: 1, ValueEnum.V2: 1, ValueEnum.V3: 1 })
+
+    def execute_batch(seed: int) -> list:
+        storages = asyncio.run(random_collection_node.execute_batch(50, seed_sequence=np.random.SeedSequence(seed)))
+        return [storage.get(ValueEnum) for storage in storages]
+
+    assert execute_batch(7) == execute_batch(7)
+    assert execute_batch(7) != execute_batch(8)
@@ -0,0 +1,23 @@
+import numpy as np
+
+from src.synthetic_data_generator.random_generators.random_collection import RandomCollection, RandomCollectionFactory
+from src.synthetic_data_generator.random_nodes.ticket_field import RandomDescriptionModel
+
+
+class Priority(RandomDescriptionModel):
+    LOW = 1, ["not urgent", "can wait"]
+    HIGH = 2, ["urgent", "critical"]
+
+
+def test_random_description_model_get_description():
+    assert Priority.LOW.get_description() in ["not urgent", "can wait"]
+    assert Priority.HIGH.get_description(rng=np.random.default_rng(1)) == Priority.HIGH.get_description(
+        rng=np.random.default_rng(1))
+
+
+def test_random_description_model_randomizes_the_weights_like_the_factory():
+    factory_collection = RandomCollectionFactory().build_from_list_of_values(Priority.HIGH.descriptions)
+    collection = RandomCollection(Priority.HIGH.descriptions, [1, 1], rng=np.random.default_rng(1))
+
+    assert collection.randomization_factor == factory_collection.randomization_factor == 1.5
+    assert Priority.HIGH.get_description(rng=np.random.default_rng(1)) == collection.get_random_value()
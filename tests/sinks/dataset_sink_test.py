@@ -0,0 +1,72 @@
+import asyncio
+import csv
+import json
+
+import pytest
+
+from src.synthetic_data_generator.ai_graph.key_value_store import KeyValueStore
+from src.synthetic_data_generator.sinks.dataset_sink import CsvSink, JsonlSink, ParquetSink
+from synthetic_data_generator.ai_graph.ai.text_stream import TextStream
+from tests.conftest import KeyEnum, ValueEnum
+
+
+def create_storages(amount: int) -> list[KeyValueStore]:
+    return [KeyValueStore(list(KeyEnum)[index % 2], list(ValueEnum)[index % 3]) for index in range(amount)]
+
+
+def test_jsonl_sink_writes_buffered_rows(tmp_path):
+    path = tmp_path / "samples.jsonl"
+    with JsonlSink(path, buffer_size=4) as sink:
+        for storage in create_storages(10):
+            sink.write(storage)
+        assert len(path.read_text().splitlines()) == 8
+
+    rows = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(rows) == sink.row_count == 10
+    assert rows[4] == {"KeyEnum": "K1", "ValueEnum": "V2"}
+
+
+def test_csv_sink_writes_header_and_sample_index(tmp_path):
+    path = tmp_path / "samples.csv"
+    with CsvSink(path, buffer_size=3) as sink:
+        sink.write_results(enumerate(create_storages(5)))
+
+    with path.open(newline="") as file:
+        rows = list(csv.DictReader(file))
+    assert [row["sample_index"] for row in rows] == ["0", "1", "2", "3", "4"]
+    assert rows[1] == {"sample_index": "1", "KeyEnum": "K2", "ValueEnum": "V2"}
+
+
+def test_sink_rejects_writes_after_close(tmp_path):
+    sink = JsonlSink(tmp_path / "samples.jsonl")
+    sink.close()
+
+    with pytest.raises(ValueError):
+        sink.write(KeyValueStore(KeyEnum.K1))
+
+
+def test_parquet_sink_writes_row_groups(tmp_path):
+    pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "samples.parquet"
+    with ParquetSink(path, buffer_size=4) as sink:
+        sink.write_results(enumerate(create_storages(10)))
+
+    parquet_file = pyarrow_parquet.ParquetFile(path)
+    assert parquet_file.metadata.num_row_groups == 3
+    assert parquet_file.read().column("ValueEnum").to_pylist()[:3] == ["V1", "V2", "V3"]
+
+
+@pytest.mark.asyncio
+async def test_sink_waits_for_text_streams(tmp_path):
+    path = tmp_path / "samples.jsonl"
+    text_stream = TextStream()
+    with JsonlSink(path, buffer_size=1) as sink:
+        write = asyncio.create_task(sink.write_when_complete(KeyValueStore(KeyEnum.K1, text_stream), 0))
+        text_stream.append("Ticket ")
+        await asyncio.sleep(0)
+        assert sink.row_count == 0
+        text_stream.append("body")
+        text_stream.finish()
+        await write
+
+    assert json.loads(path.read_text()) == {"sample_index": 0, "KeyEnum": "K1", "TextStream": "Ticket body"}
@@ -0,0 +1,43 @@
+from dataclasses import dataclass
+
+import pydantic
+
+from src.synthetic_data_generator.ai_graph.key_value_store import KeyValueStore
+from src.synthetic_data_generator.random_nodes.ticket_field import OutputDataclassModel
+from src.synthetic_data_generator.sinks.storage_flattener import StorageFlattener
+from tests.conftest import BigEnum, KeyEnum, ValueEnum
+
+
+@dataclass
+class TicketText(OutputDataclassModel):
+    subject: str
+    priority: ValueEnum
+
+
+class TicketAnswer(pydantic.BaseModel):
+    body: str
+    tags: list[str]
+
+
+def test_flatten_enums_by_name():
+    row = StorageFlattener().flatten(KeyValueStore(KeyEnum.K1, ValueEnum.V3))
+
+    assert row == {"KeyEnum": "K1", "ValueEnum": "V3"}
+
+
+def test_flatten_dataclass_and_pydantic_values_into_prefixed_columns():
+    storage = KeyValueStore(TicketText(subject="Login fails", priority=ValueEnum.V2),
+                            TicketAnswer(body="Reset the password", tags=["login", "password"]))
+
+    row = StorageFlattener().flatten(storage)
+
+    assert row == {"TicketText.subject": "Login fails", "TicketText.priority": "V2",
+                   "TicketAnswer.body": "Reset the password", "TicketAnswer.tags": ["login", "password"]}
+
+
+def test_flatten_selected_keys():
+    storage = KeyValueStore(KeyEnum.K2, ValueEnum.V1, BigEnum.B4)
+
+    row = StorageFlattener(keys=["BigEnum", "KeyEnum"]).flatten(storage)
+
+    assert row == {"BigEnum": "B4", "KeyEnum": "K2"}